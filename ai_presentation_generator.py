@@ -3,7 +3,6 @@ import re
 import json
 import logging
 import base64
-import openai
 from datetime import datetime
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -11,6 +10,12 @@ from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
 from PIL import Image
+from deck_template import (
+    TEACHER_TOKEN, TITLE_TOKEN, TOPIC_TOKEN, DeckTemplate, add_layout_placeholder, deck_output, draw_on_layout,
+    saved_deck
+)
+from pptx_stream_writer import StreamingDeckWriter, paragraph_xml, placeholder_shape_xml, slide_xml
+from text_layout import lines_height, wrap_lines
 
 
 # Set up logging
@@ -30,14 +35,31 @@ HEADER_RED = RGBColor(252, 5, 5)
 HEADER_YELLOW = RGBColor(255, 255, 0)
 IMAGE1_PATH = "logo.jpg"  # Change this to your actual logo image path
 HEADER_RCB_RED = RGBColor(252, 5, 5)
-MAX_TEXT_WIDTH = 700  # Define maximum width for text wrapping
+MAX_TEXT_WIDTH = Inches(11.8).pt  # Content box width minus its 0.1" side margins, in points
 LINE_SPACING = Pt(8)
+POINT_SPACING = Pt(12)  # Space after each point
+BULLET = "➤ "
+
+# Placeholder indexes of the points slide layout
+MAIN_TITLE_IDX = 10
+CONTENT_IDX = 11
 
 class AIPresentationGenerator:
-    def __init__(self):
+    def __init__(self, use_slide_master=True, streaming=False, in_memory=False):
+        """
+        :param use_slide_master: Render slides from a cached deck layout that holds the
+            nav bar, logo and text styles once, instead of drawing them on every slide
+        :param streaming: Write the slide XML straight into the .pptx zip one slide at a time
+            instead of building the deck with python-pptx (for very large decks; uses the deck layout)
+        :param in_memory: Return decks as BytesIO buffers named final_presentation_<timestamp>.pptx
+            instead of saving files
+        """
         self.prs = Presentation()
         self.prs.slide_width = Inches(14)
         self.prs.slide_height = Inches(7.5)
+        self.use_slide_master = use_slide_master
+        self.streaming = streaming
+        self.in_memory = in_memory
 
     def add_navigation_bar(self, slide, title, topic, teacher_name):
         """Add the navigation bar with title, logo, and name."""
@@ -79,26 +101,8 @@ class AIPresentationGenerator:
         nav_right.text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
 
     def wrap_text_to_fit(self, text, max_width=MAX_TEXT_WIDTH):
-        """Wrap text to fit within specified width."""
-        words = text.split()
-        lines = []
-        current_line = []
-        current_length = 0
-        
-        for word in words:
-            word_length = len(word)
-            if current_length + word_length <= 60:  # Approximate characters per line
-                current_line.append(word)
-                current_length += word_length + 1
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-                current_length = word_length + 1
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return '\n'.join(lines)
+        """Wrap text to fit within specified width (points), using the font's glyph widths."""
+        return '\n'.join(wrap_lines(text, FONT_NAME, CONTENT_FONT_SIZE.pt, max_width))
 
     def add_main_title(self, slide, title_text):
         """Adds a title to the slide."""
@@ -129,19 +133,117 @@ class AIPresentationGenerator:
         text_frame.word_wrap = True
         return text_frame
 
-    def add_point_to_textbox(self, text_frame, point,available_height):
-        """Adds a bullet point to the given text frame while checking if it fits."""
-        wrapped_text, overflow_text = self.split_text_to_fit(text_frame, point, available_height)
-        
+    def add_content_slide(self, prs, layout, title, topic, teacher_name, title_text):
+        """
+        Adds a slide with the nav bar, the title (if any) and an empty content box.
+
+        :return: (slide, text frame for the points)
+        """
+        slide = prs.slides.add_slide(layout)
+        if self.use_slide_master:
+            # Nav bar, logo and background come from the layout
+            main_title = slide.placeholders[MAIN_TITLE_IDX]
+            if title_text:
+                main_title.text_frame.text = title_text
+            else:
+                main_title._element.getparent().remove(main_title._element)
+            return slide, slide.placeholders[CONTENT_IDX].text_frame
+
+        slide.background.fill.solid()
+        slide.background.fill.fore_color.rgb = RGBColor(0, 0, 0)
+
+        # Add navigation and title
+        self.add_navigation_bar(slide, title, topic, teacher_name)
+        if title_text:
+            self.add_main_title(slide, title_text)
+
+        # Add content box
+        return slide, self.add_content_textbox(slide)
+
+    def point_text(self, point, available_height):
+        """
+        Returns the bullet text of the part of a point that fits in available_height,
+        or None if not even one line fits, and the text that didn't fit.
+        """
+        wrapped_text, overflow_text = self.split_text_to_fit(None, BULLET + point, available_height)
+        return wrapped_text or None, overflow_text
+
+    def add_paragraph_to_textbox(self, text_frame, text):
+        """Adds a bullet point paragraph to the given text frame."""
         p = text_frame.add_paragraph()
-        p.text = f"➤ {wrapped_text}"  # ✅ Set text first before applying font styles
+        p.text = text  # ✅ Set text first before applying font styles
+        if self.use_slide_master:
+            return  # Font and spacing are inherited from the layout placeholder
         p.font.size = CONTENT_FONT_SIZE
-        p.space_after = Pt(12)  # Consistent spacing between points
+        p.space_after = POINT_SPACING  # Consistent spacing between points
         p.font.name = FONT_NAME
         p.font.color.rgb = RGBColor(255, 255, 0)
 
+    def add_point_to_textbox(self, text_frame, point,available_height):
+        """Adds a bullet point to the given text frame while checking if it fits."""
+        text, overflow_text = self.point_text(point, available_height)
+        self.add_paragraph_to_textbox(text_frame, text)
         return overflow_text  # ✅ Return any text that didn't fit
 
+    def paginate(self, extracted_data):
+        """
+        Splits the points over slides by their measured height. Each title starts
+        a new slide, and a point that doesn't fit continues on the next slide.
+
+        :return: Generator of (slide title, list of bullet texts) per slide
+        """
+        max_textbox_height = Inches(5)  # Max content height per slide
+        available_height = max_textbox_height
+        current_slide = None
+
+        for i, content in enumerate(extracted_data):
+            title_text = content.get("title", "")
+            points = content.get("points", [])
+
+            if not points:
+                print(f"⚠️ No points found for slide {i + 1}, skipping.")
+                continue
+
+            if current_slide is not None:
+                yield current_slide
+                current_slide = None
+
+            for point in points:
+                remaining_text = point
+                while remaining_text:
+                    # ✅ If no slide exists, create one
+                    if current_slide is None:
+                        current_slide = (title_text, [])
+                        available_height = max_textbox_height
+
+                    text, remaining_text = self.point_text(remaining_text, available_height)
+                    if text is None:
+                        # ✅ Not even one line fits, move on to a new slide
+                        yield current_slide
+                        current_slide = None
+                        continue
+
+                    current_slide[1].append(text)
+                    available_height -= self.estimate_text_height(text) + POINT_SPACING  # Reduce available space
+                    if remaining_text:
+                        # ✅ The rest of the point continues on a new slide
+                        yield current_slide
+                        current_slide = None
+
+        if current_slide is not None:
+            yield current_slide
+
+    def slide_xml(self, title_text, texts):
+        """
+        Slide XML of a points slide, identical to what add_content_slide and
+        add_paragraph_to_textbox produce with the deck layout.
+        """
+        shapes = []
+        if title_text:
+            shapes.append(placeholder_shape_xml(1, MAIN_TITLE_IDX, [paragraph_xml(title_text)]))
+        shapes.append(placeholder_shape_xml(2, CONTENT_IDX, [paragraph_xml("")] + [paragraph_xml(text) for text in texts]))
+        return slide_xml(shapes)
+
     # def create_presentation(self, extracted_data, title, topic, teacher_name):
     #     """Generate a PowerPoint presentation with optimal text splitting and full slide utilization."""
     #     print("📢 Generating Fully Optimized PPT...")
@@ -204,7 +306,7 @@ class AIPresentationGenerator:
     #         print("❌ No valid slides created. Cannot save an empty presentation.")
     #         return None
 
-    #     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    #     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     #     filename = f"final_presentation_{timestamp}.pptx"
     #     prs.save(filename)
 
@@ -215,17 +317,6 @@ class AIPresentationGenerator:
         """Generate a PowerPoint presentation with proper slide utilization."""
         print("📢 Generating Fully Optimized PPT...")
 
-        prs = Presentation()
-        prs.slide_width = Inches(14)
-        prs.slide_height = Inches(7.5)
-
-        slide_count = 0
-        max_textbox_height = Inches(5)  # Max content height per slide
-
-        current_slide = None
-        current_text_frame = None
-        available_height = max_textbox_height  # Reset available space per slide
-
         print(f"📢 Received Extracted Data Type: {type(extracted_data)} - {extracted_data}")
 
         # ✅ Check if extracted_data is a string
@@ -236,108 +327,84 @@ class AIPresentationGenerator:
             print(f"❌ Invalid extracted_data format! Expected a list but got: {type(extracted_data)}")
             return None 
 
-        for i, content in enumerate(extracted_data):
-            title_text = content.get("title", "")
-            points = content.get("points", [])
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"final_presentation_{timestamp}.pptx"
 
-            if not points:
-                print(f"⚠️ No points found for slide {i + 1}, skipping.")
-                continue
+        if self.streaming:
+            slides = (self.slide_xml(title_text, texts) for title_text, texts in self.paginate(extracted_data))
+            output = deck_output(filename, self.in_memory)
+            slide_count = POINTS_DECK_WRITER.write(output, slides, title, topic, teacher_name)
+            if slide_count == 0:
+                if not self.in_memory:
+                    os.remove(filename)
+                print("❌ No valid slides created. Cannot save an empty presentation.")
+                return None
+            print(f"✅ Presentation saved as {filename}")
+            return saved_deck(output)
+
+        if self.use_slide_master:
+            # Copy of the cached prototype, with the nav bar filled in once for the whole deck
+            prs, layout = POINTS_DECK_TEMPLATE.new_deck(title, topic, teacher_name)
+        else:
+            prs = Presentation()
+            prs.slide_width = Inches(14)
+            prs.slide_height = Inches(7.5)
+            layout = prs.slide_layouts[6]
 
-            for point in points:
-                wrapped_text = self.wrap_text_to_fit(point)
-                point_height = self.estimate_text_height(wrapped_text) + Inches(0.2)  # Extra spacing
-
-                # ✅ If no slide exists, create one
-                if current_slide is None:
-                    current_slide = prs.slides.add_slide(prs.slide_layouts[6])
-                    current_slide.background.fill.solid()
-                    current_slide.background.fill.fore_color.rgb = RGBColor(0, 0, 0)
-
-                    # Add navigation and title
-                    self.add_navigation_bar(current_slide, title, topic, teacher_name)
-                    if title_text:
-                        self.add_main_title(current_slide, title_text)
-
-                    # Add content box
-                    current_text_frame = self.add_content_textbox(current_slide)
-                    available_height = max_textbox_height  # Reset available height
-                    slide_count += 1
-
-                # ✅ If the point fits, add it to the current slide
-                if available_height >= point_height:
-                    self.add_point_to_textbox(current_text_frame, wrapped_text,available_height)
-                    available_height -= point_height  # Reduce available space
-                else:
-                    # ✅ If it doesn't fit, create a new slide and then add it
-                    current_slide = prs.slides.add_slide(prs.slide_layouts[6])
-                    current_slide.background.fill.solid()
-                    current_slide.background.fill.fore_color.rgb = RGBColor(0, 0, 0)
-
-                    # Add navigation and title
-                    self.add_navigation_bar(current_slide, title, topic, teacher_name)
-                    if title_text:
-                        self.add_main_title(current_slide, title_text)
-
-                    # Add content box
-                    current_text_frame = self.add_content_textbox(current_slide)
-                    available_height = max_textbox_height  # Reset available height
-                    slide_count += 1
-
-                    # Now add the point
-                    self.add_point_to_textbox(current_text_frame, wrapped_text,available_height)
-                    available_height -= point_height  # Reduce available space
+        slide_count = 0
+        for title_text, texts in self.paginate(extracted_data):
+            current_slide, current_text_frame = self.add_content_slide(
+                prs, layout, title, topic, teacher_name, title_text
+            )
+            for text in texts:
+                self.add_paragraph_to_textbox(current_text_frame, text)
+            slide_count += 1
 
         if slide_count == 0:
             print("❌ No valid slides created. Cannot save an empty presentation.")
             return None
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"final_presentation_{timestamp}.pptx"
-        prs.save(filename)
+        output = deck_output(filename, self.in_memory)
+        prs.save(output)
 
         print(f"✅ Presentation saved as {filename}")
-        return filename
+        return saved_deck(output)
 
     def split_text_to_fit(self, text_frame, text, available_height):
         """Splits text so that as much as possible remains in the slide, and overflow moves to the next slide."""
-        words = text.split()
-        fitted_text = ""
-        remaining_text = ""
-        estimated_height = 0
-        max_line_length = 50  # Approximate max characters per line
-
-        wrapped_lines = []
-        current_line = []
-
-        for word in words:
-            if len(" ".join(current_line) + " " + word) <= max_line_length:
-                current_line.append(word)
-            else:
-                wrapped_lines.append(" ".join(current_line))
-                current_line = [word]
-
-        if current_line:
-            wrapped_lines.append(" ".join(current_line))
-
-        for line in wrapped_lines:
-            line_height = Pt(28) / 72  # Approximate line height in inches
-            if estimated_height + line_height > available_height:
-                remaining_text += line + " "
-            else:
-                fitted_text += line + " "
-                estimated_height += line_height
+        wrapped_lines = self.wrap_text_to_fit(text).split("\n")
+        line_height = Pt(lines_height(1, CONTENT_FONT_SIZE.pt))
+        fitting_lines = max(0, int(available_height // line_height))
 
+        fitted_text = " ".join(wrapped_lines[:fitting_lines])
+        remaining_text = " ".join(wrapped_lines[fitting_lines:])
         return fitted_text.strip(), remaining_text.strip()
 
     def estimate_text_height(self, text):
-        """More accurate estimation of text height in PowerPoint slides."""
-        words_per_line = 50  # Approximate max characters per line
-        line_height = Pt(28) / 72  # Line height in inches
-
-        # Ensure accurate line count based on real wrapping
-        lines = (len(text) // words_per_line) + 1
-        return Inches(lines * line_height)
+        """Height (EMU) of the text in the content box, from its measured line wrapping."""
+        lines = self.wrap_text_to_fit(text).count("\n") + 1
+        return Pt(lines_height(lines, CONTENT_FONT_SIZE.pt))
+
+
+def build_points_layout(prs, layout):
+    """
+    Adds the nav bar, logo and the title and content placeholders to the points slide layout.
+    """
+    draw_on_layout(prs, layout, lambda slide: AIPresentationGenerator(use_slide_master=False).add_navigation_bar(
+        slide, TITLE_TOKEN, TOPIC_TOKEN, TEACHER_TOKEN
+    ))
+    add_layout_placeholder(
+        layout, MAIN_TITLE_IDX, "Main Title", Inches(1), Inches(0.75), Inches(12), Inches(0.8),
+        FONT_NAME, Pt(32), RGBColor(255, 255, 255), bold=True, align="ctr", wrap="none"
+    )
+    add_layout_placeholder(
+        layout, CONTENT_IDX, "Content", Inches(1), Inches(1.75), Inches(12), Inches(5.5),
+        FONT_NAME, CONTENT_FONT_SIZE, RGBColor(255, 255, 0), space_after=Pt(12)
+    )
+
+
+POINTS_DECK_TEMPLATE = DeckTemplate(build_points_layout, background=BACKGROUND_COLOR)
+POINTS_DECK_WRITER = StreamingDeckWriter(POINTS_DECK_TEMPLATE)
 
 
 if __name__ == "__main__":
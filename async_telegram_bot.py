@@ -0,0 +1,478 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import telebot
+from telebot.async_telebot import AsyncTeleBot
+from ocr import OCRHandler
+from config import BOT_TOKEN, GROUP_CHAT_ID
+from ppt_generator import PPTHandler
+from ai_presentation_generator import AIPresentationGenerator
+from ocr_points_handler import OCRPointsHandler
+from session_store import SessionStore
+from hedging import get_vision_hedger
+from circuit_breaker import CircuitOpenError, breaker_summary, get_breaker
+from llm_client import get_async_llm_client
+from ocr_base import EXTRACTION_UNAVAILABLE
+from telegram_files import TELEGRAM_READ_TIMEOUT, configure_telegram_timeouts
+from incremental_deck import finalise_deck, update_deck
+from render_service import RenderService
+from deck_archive import archive_deck
+from media_groups import AsyncMediaGroupBuffer, album_file, media_group_key
+
+# Concurrency limits for the asyncio bot
+MAX_CONCURRENT_JOBS = 8  # Images processed at the same time across all chats
+CPU_WORKERS = os.cpu_count() or 2  # Threads for cv2 preprocessing, local OCR and deck rendering
+
+SETTING_PROMPTS = {
+    "title": "Please enter the presentation title:",
+    "topic": "Please enter the topic name:",
+    "teacher_name": "Please enter the teacher's name:",
+    "ppt_type": "Please enter the ppt's type(mcq or points):",
+}
+
+SETTING_CONFIRMATIONS = {
+    "title": "✅ Title set successfully: {}",
+    "topic": "✅ Topic set successfully: {}",
+    "teacher_name": "✅ Teacher's name set successfully: {}",
+    "ppt_type": "✅ PPT type set successfully: {}",
+}
+
+
+class AsyncTelegramBot:
+    def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS, cpu_workers=CPU_WORKERS,
+                 ocr_engine="openai", stream_responses=False, hedge_requests=False, incremental_decks=True,
+                 render_pool=False, in_memory_decks=True):
+        """
+        Initializes the asyncio Telegram bot.
+
+        Network stages (Telegram downloads, Vision API and structuring requests)
+        are awaited on the event loop through asyncio clients, and CPU stages
+        (image preprocessing, local OCR, deck rendering) run on a CPU thread pool.
+        A semaphore bounds the number of in-flight jobs.
+
+        :param max_concurrent_jobs: Maximum number of images processed at once
+        :param cpu_workers: Size of the thread pool used for CPU-bound stages
+        :param ocr_engine: "openai" for the Vision API or "local" for offline easyocr
+        :param stream_responses: Stream Vision API replies and add each question as soon as it is complete
+        :param hedge_requests: Duplicate Vision API requests that are slower than usual
+        :param incremental_decks: Render slides in the background as data arrives, so "nextlevel" only writes the file
+        :param render_pool: Render full decks on a process pool instead of CPU-pool threads, so decks of
+            different chats do not queue on the GIL. Only applies with incremental_decks=False; combining
+            it with incremental decks raises ValueError
+        :param in_memory_decks: Build decks in memory and upload them without writing files
+            (archived by content hash when DECK_ARCHIVE_DIR is set)
+        """
+        if render_pool and incremental_decks:
+            raise ValueError("render_pool only applies to full renders (incremental_decks=False)")
+        self.bot = AsyncTeleBot(BOT_TOKEN)
+
+        # The OCR handlers send their error reports through a synchronous client of their own
+        configure_telegram_timeouts()
+        sync_bot = telebot.TeleBot(BOT_TOKEN)
+        hedger = get_vision_hedger() if hedge_requests else None
+        self.ocr_handler = OCRHandler(sync_bot, GROUP_CHAT_ID, engine=ocr_engine, hedger=hedger)  # MCQ Handler
+        self.ocr_points_handler = OCRPointsHandler(sync_bot, GROUP_CHAT_ID, engine=ocr_engine, hedger=hedger)  # Points Handler
+        self.ppt_handler = PPTHandler(in_memory=in_memory_decks)
+        self.bullet_points = AIPresentationGenerator(in_memory=in_memory_decks)
+        self.stream_responses = stream_responses
+        self.incremental_decks = incremental_decks
+        self.in_memory_decks = in_memory_decks
+        self.render_service = RenderService(in_memory=in_memory_decks) if render_pool else None
+
+        self.sessions = SessionStore()
+        self.media_groups = AsyncMediaGroupBuffer(self.process_album)  # Albums use batched extraction
+        self.job_semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="bot-cpu")
+        self.register_handlers()
+
+    async def run_cpu(self, func, *args):
+        """
+        Runs a CPU-bound call on the CPU pool and awaits its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_executor, func, *args)
+
+    def _render_presentation(self, session):
+        """
+        Renders the deck for a chat session. Runs on the CPU pool.
+        """
+        if self.incremental_decks:
+            return finalise_deck(session, self.in_memory_decks)
+
+        settings = session.presentation_settings
+        with session.lock:
+            # Render a copy: the event loop takes the chat's lock to append records,
+            # so it must not be held for the whole render
+            question_data = {key: list(values) for key, values in session.question_data.items()}
+
+        if self.render_service is not None:
+            ppt_type = settings["ppt_type"]
+            data = question_data if ppt_type == "mcq" else question_data.get("Points", [])
+            return self.render_service.render(
+                ppt_type, data, settings["title"], settings["topic"], settings["teacher_name"]
+            )
+        if settings["ppt_type"] == "mcq":
+            return self.ppt_handler.create_custom_presentation(
+                data=question_data,
+                title=settings["title"],
+                topic=settings["topic"],
+                teacher_name=settings["teacher_name"],
+            )
+        return self.bullet_points.create_presentation(
+            extracted_data=question_data.get("Points", []),
+            title=settings["title"],
+            topic=settings["topic"],
+            teacher_name=settings["teacher_name"]
+        )
+
+    async def generate_ppt(self, chat_id):
+        """
+        Generates a PowerPoint presentation from the chat's accumulated data and sends it to the user.
+        """
+        session = self.sessions.get(chat_id)
+        try:
+            if session.presentation_settings["ppt_type"] not in ("mcq", "points"):
+                await self.bot.send_message(chat_id, "No data available to generate the presentation.")
+                return
+
+            async with self.job_semaphore:
+                output_file = await self.run_cpu(self._render_presentation, session)
+
+            if not output_file:
+                await self.bot.send_message(chat_id, "No data available to generate the presentation.")
+                return
+
+            # Send the generated presentation to the user
+            await self.send_deck(chat_id, output_file)
+
+            # Clear this chat's data after generating the presentation
+            session.reset()
+            await self.bot.send_message(chat_id, "Presentation generated and sent successfully!")
+
+        except Exception as e:
+            await self.bot.send_message(chat_id, f"Error generating the presentation: {str(e)}")
+
+    async def send_deck(self, chat_id, output_file):
+        """
+        Sends a deck given as a file name, or as an in-memory buffer which is
+        uploaded directly and then hashed and archived on the CPU pool.
+        """
+        if isinstance(output_file, str):
+            with open(output_file, "rb") as f:
+                await self.bot.send_document(chat_id, f)
+            return
+        await self.bot.send_document(chat_id, output_file)
+        await self.run_cpu(archive_deck, output_file)
+
+    async def download_image(self, file_id):
+        """
+        Downloads a Telegram file into memory on the event loop.
+        Each request is bounded by TELEGRAM_READ_TIMEOUT and goes through the
+        "telegram" circuit breaker.
+        """
+        breaker = get_breaker("telegram")
+        breaker.before_call()
+        try:
+            file_info = await asyncio.wait_for(self.bot.get_file(file_id), TELEGRAM_READ_TIMEOUT)
+            if not file_info or not file_info.file_path:
+                raise ValueError("File information could not be retrieved.")
+            image_bytes = await asyncio.wait_for(self.bot.download_file(file_info.file_path), TELEGRAM_READ_TIMEOUT)
+        except Exception as e:
+            breaker.record_error(e)
+            raise
+        except BaseException:
+            # Cancelled (handler timeout, shutdown): no verdict on Telegram, but a
+            # half-open trial must not stay reserved or the breaker never closes
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+        return image_bytes
+
+    async def extract_image(self, handler, file_id, file_unique_id):
+        """
+        Returns the extracted text of an image, skipping the download on an exact cache hit.
+        Preprocessing runs on the CPU pool and the Vision API request is awaited.
+        """
+        extracted_data = handler.cached_text(file_unique_id)
+        if extracted_data:
+            return extracted_data
+        image_bytes = await self.download_image(file_id)
+        if handler.engine == "local":
+            # easyocr preprocessing and inference are CPU-bound end to end
+            return await self.run_cpu(handler.extract_text_from_bytes, image_bytes, file_unique_id)
+        fingerprint, processed_image = await self.run_cpu(handler.prepare_image, image_bytes)
+        return await handler.async_extract_text_from_bytes(image_bytes, file_unique_id, processed_image, fingerprint)
+
+    async def stream_image(self, chat_id, session, handler, accumulator, item, file_id, file_unique_id):
+        """
+        Streams one image through the Vision API. Records are added to the
+        accumulator as they complete, and the user hears back at the first one.
+        Exact cache hits and the local engine go through the normal path.
+        """
+        accumulate = self._accumulate_questions if item == "question" else self._accumulate_points
+        extracted_data = handler.cached_text(file_unique_id)
+        if extracted_data:
+            await accumulate(session, extracted_data)
+            return
+
+        image_bytes = await self.download_image(file_id)
+        if handler.engine == "local":
+            # easyocr text arrives in one piece and is structured as a whole
+            await accumulate(session, await self.run_cpu(handler.extract_text_from_bytes, image_bytes, file_unique_id))
+            return
+        fingerprint, processed_image = await self.run_cpu(handler.prepare_image, image_bytes)
+
+        notification = None
+
+        def on_record(count):
+            nonlocal notification
+            self.update_deck(session)
+            if notification is None:
+                notification = asyncio.create_task(
+                    self.bot.send_message(chat_id, f"First {item} extracted, reading the rest of the image...")
+                )
+
+        await handler.async_stream_records_from_bytes(
+            image_bytes, accumulator, file_unique_id, session.lock, on_record, processed_image, fingerprint
+        )
+        self.update_deck(session)  # Records added without on_record (content-hash cache hits)
+        if notification is not None:
+            await notification
+
+    async def process_image(self, chat_id, file_id, file_unique_id=None):
+        """
+        Extracts data from one image and adds it to the chat's accumulator.
+        Waits for a free slot when the maximum number of jobs is already running.
+        """
+        session = self.sessions.get(chat_id)
+        ppt_type = session.presentation_settings["ppt_type"]
+
+        async with self.job_semaphore:
+            if ppt_type == "mcq":
+                if self.stream_responses:
+                    await self.stream_image(chat_id, session, self.ocr_handler, session.question_data,
+                                            "question", file_id, file_unique_id)
+                else:
+                    extracted_data = await self.extract_image(self.ocr_handler, file_id, file_unique_id)
+                    await self._accumulate_questions(session, extracted_data)
+                return f"Data extracted and added to the presentation. Total questions: {len(session.question_data['Question'])}"
+
+            if ppt_type == "points":
+                if self.stream_responses:
+                    await self.stream_image(chat_id, session, self.ocr_points_handler, session.question_data["Points"],
+                                            "slide", file_id, file_unique_id)
+                else:
+                    extracted_data = await self.extract_image(self.ocr_points_handler, file_id, file_unique_id)
+                    await self._accumulate_points(session, extracted_data)
+                return f"Data extracted and added to the presentation. Total points: {len(session.question_data['Points'])}"
+
+        return "No text detected in the image. Please try another image."
+
+    async def process_album(self, messages):
+        """
+        Extracts the images of an album together in one job: exact cache hits skip
+        the download, the rest are downloaded concurrently, preprocessed on the CPU
+        pool and sent through the handler's batched extraction, whose requests are
+        awaited. Replies once.
+        """
+        chat_id = messages[0].chat.id
+        session = self.sessions.get(chat_id)
+        try:
+            ppt_type = session.presentation_settings["ppt_type"]
+            handler = {"mcq": self.ocr_handler, "points": self.ocr_points_handler}.get(ppt_type)
+            if handler is None:
+                await self.bot.send_message(chat_id, "No text detected in the image. Please try another image.")
+                return
+            await self.bot.send_message(chat_id, f"Received {len(messages)} images. Processing...")
+
+            async with self.job_semaphore:
+                extracted_texts, pending = [], []
+                for message in messages:
+                    album_image = album_file(message)
+                    cached = handler.cached_text(album_image.file_unique_id)
+                    if cached:
+                        extracted_texts.append(cached)
+                    else:
+                        pending.append(album_image)
+
+                if pending:
+                    images_bytes = await asyncio.gather(*(self.download_image(image.file_id) for image in pending))
+                    file_unique_ids = [image.file_unique_id for image in pending]
+                    if handler.engine == "local":
+                        extracted_texts.extend(
+                            await self.run_cpu(handler.extract_texts_from_bytes, images_bytes, file_unique_ids)
+                        )
+                    else:
+                        prepared = await asyncio.gather(
+                            *(self.run_cpu(handler.prepare_image, image_bytes) for image_bytes in images_bytes)
+                        )
+                        fingerprints = [fingerprint for fingerprint, _ in prepared]
+                        processed_images = [processed_image for _, processed_image in prepared]
+                        extracted_texts.extend(await handler.async_extract_texts_with_openai(
+                            images_bytes, file_unique_ids, processed_images, fingerprints
+                        ))
+
+                accumulate = self._accumulate_questions if ppt_type == "mcq" else self._accumulate_points
+                for extracted_text in extracted_texts:
+                    if extracted_text:
+                        await accumulate(session, extracted_text)
+
+            if ppt_type == "mcq":
+                await self.bot.send_message(chat_id, f"All images processed. Total questions: {len(session.question_data['Question'])}")
+            else:
+                await self.bot.send_message(chat_id, f"All images processed. Total points: {len(session.question_data['Points'])}")
+        except CircuitOpenError:
+            await self.bot.send_message(chat_id, EXTRACTION_UNAVAILABLE)
+        except Exception as e:
+            await self.bot.send_message(chat_id, f"Error processing images: {str(e)}")
+
+    async def _accumulate_questions(self, session, extracted_data):
+        # The structuring request is awaited outside the chat's lock; it is only taken for the update
+        await self.ocr_handler.async_accumulate_text(extracted_data, session.question_data, session.lock)
+        self.update_deck(session)
+
+    async def _accumulate_points(self, session, extracted_data):
+        await self.ocr_points_handler.async_accumulate_text(
+            extracted_data, session.question_data["Points"], session.lock
+        )
+        self.update_deck(session)
+
+    def awaiting_setting(self, chat_id):
+        """
+        True when the chat's next text message is the value of a setting.
+        Uses peek, so other text messages neither create sessions nor count as hits.
+        """
+        session = self.sessions.peek(chat_id)
+        return session is not None and session.pending_input is not None
+
+    def update_deck(self, session):
+        """
+        Renders the slides for newly accumulated data in the background.
+        """
+        if self.incremental_decks:
+            update_deck(session)
+
+    def register_handlers(self):
+        """
+        Registers message handlers for the asyncio Telegram bot.
+        """
+        @self.bot.message_handler(commands=['start'])
+        async def handle_start(message):
+            welcome_text = (
+                "Welcome to the PPT Generator Bot!\n\n"
+                "Commands available:\n"
+                "/set_title - Set the presentation title\n"
+                "/set_topic - Set the topic\n"
+                "/set_teacher - Set the teacher's name\n"
+                "/set_type -Set the ppt type(Bullet points or MCQ)\n"
+                "/status - Check current settings and question count\n"
+                "Send images to add questions\n"
+                "Send 'nextlevel' to generate the presentation"
+            )
+            await self.bot.reply_to(message, welcome_text)
+
+        @self.bot.message_handler(commands=['set_title', 'set_topic', 'set_teacher', 'set_type'])
+        async def handle_set_setting(message):
+            command = message.text.split()[0].lstrip("/").split("@")[0]
+            setting = {
+                "set_title": "title",
+                "set_topic": "topic",
+                "set_teacher": "teacher_name",
+                "set_type": "ppt_type",
+            }[command]
+            self.sessions.get(message.chat.id).pending_input = setting
+            await self.bot.send_message(message.chat.id, SETTING_PROMPTS[setting])
+
+        @self.bot.message_handler(commands=['status'])
+        async def handle_status(message):
+            session = self.sessions.get(message.chat.id)
+            settings = session.presentation_settings
+            status = (
+                "Current Settings:\n"
+                f"Title: {settings['title']}\n"
+                f"Topic: {settings['topic']}\n"
+                f"Teacher: {settings['teacher_name']}\n"
+                f"Type: {settings['ppt_type']}\n\n"
+                f"Questions added: {len(session.question_data['Question'])}\n\n"
+                f"Services: {breaker_summary()}"
+            )
+            await self.bot.reply_to(message, status)
+
+        @self.bot.message_handler(
+            content_types=['text'],
+            func=lambda msg: self.awaiting_setting(msg.chat.id)
+        )
+        async def handle_setting_value(message):
+            session = self.sessions.get(message.chat.id)
+            setting = session.pending_input
+            session.pending_input = None
+            value = message.text.strip()
+            if setting == "ppt_type":
+                value = value.lower()
+            session.presentation_settings[setting] = value
+            shown = value.upper() if setting == "ppt_type" else value
+            await self.bot.send_message(message.chat.id, SETTING_CONFIRMATIONS[setting].format(shown))
+
+        @self.bot.message_handler(content_types=['photo'])
+        async def handle_single_image(message):
+            """
+            Handles image messages without blocking other chats while the image is processed.
+            """
+            if media_group_key(message) is not None:
+                self.media_groups.add(message)
+                return
+            try:
+                photo = message.photo[-1]
+                await self.bot.send_message(message.chat.id, "Image received. Processing it now...")
+                reply = await self.process_image(message.chat.id, photo.file_id, photo.file_unique_id)
+                await self.bot.send_message(message.chat.id, reply)
+            except CircuitOpenError:
+                await self.bot.send_message(message.chat.id, EXTRACTION_UNAVAILABLE)
+            except Exception as e:
+                await self.bot.send_message(message.chat.id, f"Error processing image: {str(e)}")
+
+        @self.bot.message_handler(content_types=['document'])
+        async def handle_document_image(message):
+            """
+            Handles images sent as files. Albums arrive as one message per file and
+            are collected and extracted together.
+            """
+            if media_group_key(message) is not None:
+                self.media_groups.add(message)
+                return
+            try:
+                await self.bot.send_message(message.chat.id, "Image received. Processing it now...")
+                document = message.document
+                reply = await self.process_image(message.chat.id, document.file_id, document.file_unique_id)
+                await self.bot.send_message(message.chat.id, reply)
+            except CircuitOpenError:
+                await self.bot.send_message(message.chat.id, EXTRACTION_UNAVAILABLE)
+            except Exception as e:
+                await self.bot.send_message(message.chat.id, f"Error processing images: {str(e)}")
+
+        @self.bot.message_handler(func=lambda msg: msg.text and msg.text.lower() == "nextlevel")
+        async def handle_nextlevel(message):
+            """
+            Handles the 'nextlevel' command to generate and send the PowerPoint presentation.
+            """
+            await self.generate_ppt(message.chat.id)
+
+    async def poll(self):
+        """
+        Polls for updates and closes the pooled OpenAI session when polling stops.
+        """
+        try:
+            await self.bot.polling(non_stop=True)
+        finally:
+            await get_async_llm_client().close()
+
+    def start(self):
+        """
+        Starts polling for Telegram bot updates on an asyncio event loop.
+        """
+        try:
+            asyncio.run(self.poll())
+        finally:
+            self.cpu_executor.shutdown(wait=False)
+            if self.render_service is not None:
+                self.render_service.shutdown(wait=False)
@@ -0,0 +1,186 @@
+import time
+import threading
+from rate_limiter import error_status
+
+# Breaker defaults
+FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+RECOVERY_TIMEOUT_SECONDS = 30.0  # Time the circuit stays open before a trial call
+
+DEPENDENCIES = ("openai", "telegram")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_ERROR_NAMES = {
+    "Timeout", "ConnectTimeout", "ReadTimeout", "ConnectionError", "APITimeoutError", "APIConnectionError",
+    "ClientConnectionError", "ServerDisconnectedError", "TimeoutError",
+}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a dependency whose circuit is open.
+    """
+
+
+def is_dependency_failure(error):
+    """
+    True for errors that say the dependency itself is unhealthy: timeouts,
+    connection failures and 5xx responses. Client errors (4xx) and throttling
+    (429, handled by the rate limiter) do not count.
+    """
+    status = error_status(error)
+    if status is not None:
+        return status >= 500 or status == 408
+    return type(error).__name__ in FAILURE_ERROR_NAMES
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, recovery_timeout=RECOVERY_TIMEOUT_SECONDS,
+                 clock=time.monotonic):
+        """
+        Circuit breaker for one outbound dependency.
+
+        After failure_threshold consecutive failures the circuit opens and calls
+        fail immediately with CircuitOpenError. After recovery_timeout one trial
+        call is let through (half-open); its outcome closes or reopens the circuit.
+
+        :param name: Dependency name shown in logs and status
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param recovery_timeout: Seconds before a trial call is allowed
+        :param clock: Monotonic time source
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self.opened_at >= self.recovery_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def is_closed(self):
+        return self.state == CLOSED
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError when the call should not be made.
+        In the half-open state only one trial call is let through at a time.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and self.clock() - self.opened_at >= self.recovery_timeout:
+                self._state = HALF_OPEN
+                self.trial_running = False
+            if self._state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def ensure_available(self):
+        """
+        Raises CircuitOpenError while the circuit is open, without taking the
+        half-open trial slot. Lets callers skip work whose result needs the dependency.
+        """
+        if self.state == OPEN:
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def release_trial(self):
+        """
+        Frees the half-open trial slot of a call that ended without an outcome,
+        e.g. because the caller was cancelled, so the next call can be the trial.
+        """
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"🟢 {self.name} circuit closed")
+            self._state = CLOSED
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                print(f"🔴 {self.name} circuit opened after {self.failures} failures")
+                self._state = OPEN
+                self.opened_at = self.clock()
+
+    def record_error(self, error):
+        """
+        Records the outcome of a call that raised `error`.
+        Errors that are not the dependency's fault count as a healthy response.
+        """
+        if is_dependency_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls func through the breaker, failing fast while the circuit is open.
+        """
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_error(e)
+            raise
+        except BaseException:
+            self.release_trial()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {"state": state, "failures": self.failures, "rejected": self.rejected}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """
+    Returns the process-wide breaker for a dependency ("openai", "telegram"), creating it on first use.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states():
+    """
+    Current state of every breaker, e.g. {"openai": "closed", "telegram": "open"}.
+    """
+    with _breakers_lock:
+        names = list(dict.fromkeys(DEPENDENCIES + tuple(_breakers)))
+    return {name: get_breaker(name).state for name in names}
+
+
+def breaker_summary():
+    """
+    One-line breaker status for the /status command.
+    """
+    return ", ".join(f"{name}: {state}" for name, state in breaker_states().items())
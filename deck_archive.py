@@ -0,0 +1,57 @@
+import os
+import hashlib
+import logging
+import tempfile
+
+# Directory in-memory decks are archived to after upload; unset disables archiving
+DECK_ARCHIVE_DIR = os.environ.get("DECK_ARCHIVE_DIR")
+
+logger = logging.getLogger(__name__)
+
+
+def deck_digest(deck):
+    """
+    SHA-256 hex digest of a deck given as bytes or a BytesIO.
+    """
+    data = deck if isinstance(deck, bytes) else deck.getvalue()
+    return hashlib.sha256(data).hexdigest()
+
+
+def archive_path(digest, directory=DECK_ARCHIVE_DIR):
+    """
+    Content-addressed path of a deck: <directory>/<first two hex digits>/<digest>.pptx
+    """
+    return os.path.join(directory, digest[:2], f"{digest}.pptx")
+
+
+def archive_deck(deck, directory=DECK_ARCHIVE_DIR):
+    """
+    Stores a deck under its content hash. A deck already in the archive is not
+    written again, and the file is written to a temporary name and renamed so
+    concurrent chats never see a partial deck. Failures are reported, not raised,
+    so archiving never stops a deck from being sent.
+
+    :param deck: Deck as bytes or a BytesIO (its position is left unchanged)
+    :param directory: Archive directory, or None to skip archiving
+    :return: Path of the archived deck, or None if archiving is disabled or failed
+    """
+    if not directory:
+        return None
+    try:
+        data = deck if isinstance(deck, bytes) else deck.getvalue()
+        path = archive_path(deck_digest(data), directory)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return path
+    except OSError as e:
+        logger.warning("Could not archive deck: %s", e)
+        return None
@@ -0,0 +1,189 @@
+import io
+import threading
+from pptx import Presentation
+from pptx.util import Inches
+from pptx.oxml import parse_xml
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+# Deck geometry shared by both generators
+SLIDE_WIDTH = Inches(14)
+SLIDE_HEIGHT = Inches(7.5)
+BLANK_LAYOUT_INDEX = 6
+
+# Tokens drawn into the layout's nav bar and replaced with the real values once per deck
+TITLE_TOKEN = "{title}"
+TOPIC_TOKEN = "{topic}"
+TEACHER_TOKEN = "{teacher_name}"
+
+NAMESPACES = (
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+)
+R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+DEFAULT_MARGINS = (Inches(0.1), Inches(0.05), Inches(0.1), Inches(0.05))  # left, top, right, bottom
+
+
+def placeholder_xml(shape_id, name, idx, left, top, width, height, font_name, font_size, color,
+                    bold=False, align="l", fill=None, anchor="t", wrap="square", margins=DEFAULT_MARGINS,
+                    line_spacing=None, space_after=None):
+    """
+    XML of a body placeholder for a slide layout. The text style lives in the
+    placeholder's list style, so slides created from the layout inherit it and
+    only store their own text.
+
+    :param color: RGBColor of the text
+    :param fill: RGBColor of the shape fill, or None for no fill
+    :param line_spacing: Line spacing as a multiple (1.2 = 120%)
+    :param space_after: Pt after each paragraph
+    """
+    left_margin, top_margin, right_margin, bottom_margin = margins
+    fill_xml = f'<a:solidFill><a:srgbClr val="{fill}"/></a:solidFill>' if fill is not None else ""
+    line_spacing_xml = (
+        f'<a:lnSpc><a:spcPct val="{int(line_spacing * 100000)}"/></a:lnSpc>' if line_spacing else ""
+    )
+    space_after_xml = (
+        f'<a:spcAft><a:spcPts val="{int(space_after.pt * 100)}"/></a:spcAft>' if space_after is not None else ""
+    )
+    return (
+        f'<p:sp {NAMESPACES}>'
+        f'<p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/>'
+        f'<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+        f'<p:nvPr><p:ph type="body" sz="quarter" idx="{idx}"/></p:nvPr></p:nvSpPr>'
+        f'<p:spPr><a:xfrm><a:off x="{int(left)}" y="{int(top)}"/><a:ext cx="{int(width)}" cy="{int(height)}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"><a:avLst/></a:prstGeom>{fill_xml}</p:spPr>'
+        f'<p:txBody><a:bodyPr wrap="{wrap}" lIns="{int(left_margin)}" tIns="{int(top_margin)}" '
+        f'rIns="{int(right_margin)}" bIns="{int(bottom_margin)}" anchor="{anchor}"><a:noAutofit/></a:bodyPr>'
+        f'<a:lstStyle><a:lvl1pPr marL="0" indent="0" algn="{align}">'
+        f'{line_spacing_xml}<a:spcBef><a:spcPts val="0"/></a:spcBef>{space_after_xml}<a:buNone/>'
+        f'<a:defRPr sz="{int(font_size.pt * 100)}" b="{1 if bold else 0}">'
+        f'<a:solidFill><a:srgbClr val="{color}"/></a:solidFill>'
+        f'<a:latin typeface="{font_name}"/><a:cs typeface="{font_name}"/></a:defRPr>'
+        f'</a:lvl1pPr></a:lstStyle><a:p><a:endParaRPr lang="en-US"/></a:p></p:txBody></p:sp>'
+    )
+
+
+def _next_shape_id(sp_tree):
+    ids = [int(element.get("id")) for element in sp_tree.iter() if element.tag.endswith("}cNvPr")]
+    return max(ids, default=0) + 1
+
+
+def draw_on_layout(prs, layout, draw):
+    """
+    Runs draw(slide) on a temporary slide and moves the shapes it adds into the
+    layout, so they are stored once and shown on every slide using the layout.
+    Pictures are re-linked to the layout part; the temporary slide is removed.
+    """
+    slide = prs.slides.add_slide(layout)
+    draw(slide)
+
+    sp_tree = layout.shapes._spTree
+    for element in list(slide.shapes._spTree)[2:]:  # Skip nvGrpSpPr and grpSpPr
+        for blip in element.iter("{http://schemas.openxmlformats.org/drawingml/2006/main}blip"):
+            image_part = slide.part.related_part(blip.get(R_EMBED))
+            blip.set(R_EMBED, layout.part.relate_to(image_part, RT.IMAGE))
+        element.find(".//{http://schemas.openxmlformats.org/presentationml/2006/main}cNvPr").set(
+            "id", str(_next_shape_id(sp_tree))
+        )
+        sp_tree.append(element)
+
+    slide_ids = prs.slides._sldIdLst
+    slide_id = slide_ids[-1]
+    prs.part.drop_rel(slide_id.rId)
+    slide_ids.remove(slide_id)
+
+
+def add_layout_placeholder(layout, idx, name, left, top, width, height, font_name, font_size, color, **style):
+    """
+    Adds a styled body placeholder with index `idx` to the layout (see placeholder_xml).
+    """
+    sp_tree = layout.shapes._spTree
+    sp_tree.append(parse_xml(placeholder_xml(
+        _next_shape_id(sp_tree), name, idx, left, top, width, height, font_name, font_size, color, **style
+    )))
+
+
+def replace_layout_text(layout, replacements):
+    """
+    Replaces tokens in the runs of the layout's shapes, keeping their formatting.
+    """
+    for shape in layout.shapes:
+        if not shape.has_text_frame or shape.is_placeholder:
+            continue
+        for paragraph in shape.text_frame.paragraphs:
+            for run in paragraph.runs:
+                for token, value in replacements.items():
+                    if token in run.text:
+                        run.text = run.text.replace(token, value)
+
+
+class DeckTemplate:
+    def __init__(self, build_layout, background=None):
+        """
+        Cached prototype deck with a custom slide layout.
+
+        The prototype (slide size, layout with nav bar, logo, background and
+        placeholders) is built once per process and kept as .pptx bytes; each
+        deck is a copy of it with the nav bar text filled in once.
+
+        :param build_layout: Callable(prs, layout) adding the shared shapes and placeholders
+        :param background: RGBColor of the layout background, or None
+        """
+        self.build_layout = build_layout
+        self.background = background
+        self._prototype = None
+        self._lock = threading.Lock()
+
+    def prototype_bytes(self):
+        with self._lock:
+            if self._prototype is None:
+                prs = Presentation()
+                prs.slide_width = SLIDE_WIDTH
+                prs.slide_height = SLIDE_HEIGHT
+                layout = prs.slide_layouts[BLANK_LAYOUT_INDEX]
+                if self.background is not None:
+                    layout.background.fill.solid()
+                    layout.background.fill.fore_color.rgb = self.background
+                self.build_layout(prs, layout)
+                buffer = io.BytesIO()
+                prs.save(buffer)
+                self._prototype = buffer.getvalue()
+            return self._prototype
+
+    def new_deck(self, title, topic, teacher_name):
+        """
+        Returns (presentation, layout) for a new deck with the nav bar filled in.
+        """
+        prs = Presentation(io.BytesIO(self.prototype_bytes()))
+        layout = prs.slide_layouts[BLANK_LAYOUT_INDEX]
+        replace_layout_text(layout, {TITLE_TOKEN: title, TOPIC_TOKEN: topic, TEACHER_TOKEN: teacher_name})
+        return prs, layout
+
+
+def deck_output(filename, in_memory=False):
+    """
+    Where a deck is saved: `filename` in the working directory, or an empty
+    BytesIO named `filename` (send_document uses the name as the document's file name).
+    """
+    if not in_memory:
+        return filename
+    buffer = io.BytesIO()
+    buffer.name = filename
+    return buffer
+
+
+def saved_deck(output):
+    """
+    Returns a deck saved to deck_output, rewound to the start if it is in memory.
+    """
+    if isinstance(output, io.BytesIO):
+        output.seek(0)
+    return output
+
+
+def set_geometry(shape, left, top, width, height):
+    """
+    Overrides a placeholder's position and size on one slide. All four values
+    are written, since a partial override is not valid for placeholders.
+    """
+    shape.left, shape.top, shape.width, shape.height = int(left), int(top), int(width), int(height)
@@ -0,0 +1,239 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+import cv2
+from image_preprocessing import decode_image
+
+# Defaults for the persistent extraction cache
+CACHE_PATH = os.environ.get("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3")
+MAX_ENTRIES = 5000  # Entries kept before the least recently used ones are evicted
+HAMMING_THRESHOLD = None  # Max differing dHash bits for a near-duplicate (0 or 1); None disables the lookup
+MAX_HAMMING_THRESHOLD = 1  # Wider thresholds match different pages of the same layout
+
+# Keys an image is cached under: SHA-256 of the bytes, and the dHash when near-duplicate lookups are enabled
+ImageFingerprint = namedtuple("ImageFingerprint", ["content_hash", "phash"])
+
+
+def content_hash(image_bytes):
+    """
+    SHA-256 hex digest of the encoded image.
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """
+    Computes a 64-bit difference hash (dHash) of an encoded image.
+    Re-compressed or slightly resized copies of the same screenshot hash to the
+    same or a very close value.
+    """
+    img = decode_image(image_bytes)
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | int(small[row, col] > small[row, col + 1])
+    return bits
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+class ExtractionCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, hamming_threshold=HAMMING_THRESHOLD):
+        """
+        SQLite-backed cache of OCR/vision extraction results.
+
+        Entries are found by exact Telegram file_unique_id first, then by the
+        SHA-256 of the image bytes. Matching by perceptual hash is opt-in and only
+        accepts (almost) identical hashes; those hashes are kept in memory so
+        near-duplicate lookups do not hit the database.
+
+        :param path: SQLite database file (":memory:" for a non-persistent cache)
+        :param max_entries: Maximum number of entries before LRU eviction
+        :param hamming_threshold: Maximum hash distance accepted as a near-duplicate
+            (0 or 1), or None to match exact content only
+        """
+        if hamming_threshold is not None and not 0 <= hamming_threshold <= MAX_HAMMING_THRESHOLD:
+            raise ValueError(f"hamming_threshold must be None or between 0 and {MAX_HAMMING_THRESHOLD}")
+        self.max_entries = max_entries
+        self.hamming_threshold = hamming_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " file_unique_id TEXT,"
+            " phash TEXT,"
+            " text TEXT NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " content_hash TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")]
+        if "content_hash" not in columns:
+            # Older caches were keyed by a loose perceptual match and stored unvalidated replies
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.execute("ALTER TABLE extractions ADD COLUMN content_hash TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_uid ON extractions (kind, file_unique_id)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_content ON extractions (kind, content_hash)"
+        )
+        self._conn.commit()
+
+        # kind -> {row id: hash} for near-duplicate search
+        self._hashes = {}
+        if hamming_threshold is not None:
+            for row_id, kind, phash in self._conn.execute(
+                "SELECT id, kind, phash FROM extractions WHERE phash IS NOT NULL"
+            ):
+                self._hashes.setdefault(kind, {})[row_id] = int(phash, 16)
+
+        self.exact_hits = 0
+        self.content_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup_by_file_id(self, kind, file_unique_id):
+        """
+        Returns the cached text for an exact file_unique_id match, or None.
+        Does not count a miss, since a content-hash lookup usually follows.
+        """
+        if not file_unique_id:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, text FROM extractions WHERE kind = ? AND file_unique_id = ?",
+                (kind, file_unique_id)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(row[0])
+            self.exact_hits += 1
+            return row[1]
+
+    def fingerprint(self, image_bytes):
+        """
+        Computes the keys an image is looked up and stored under.
+        """
+        phash = perceptual_hash(image_bytes) if self.hamming_threshold is not None else None
+        return ImageFingerprint(content_hash(image_bytes), phash)
+
+    def lookup(self, kind, file_unique_id=None, image_bytes=None, fingerprint=None):
+        """
+        Returns (cached text or None, ImageFingerprint of the image or None).
+        The fingerprint is returned so the caller can store the result on a miss
+        without hashing the image twice.
+        """
+        text = self.lookup_by_file_id(kind, file_unique_id)
+        if text is not None:
+            return text, fingerprint
+
+        if fingerprint is None and image_bytes is not None:
+            fingerprint = self.fingerprint(image_bytes)
+
+        with self._lock:
+            if fingerprint is not None:
+                row = self._conn.execute(
+                    "SELECT id, text FROM extractions WHERE kind = ? AND content_hash = ?",
+                    (kind, fingerprint.content_hash)
+                ).fetchone()
+                if row is not None:
+                    self._touch(row[0])
+                    self.content_hits += 1
+                    return row[1], fingerprint
+
+            phash = fingerprint.phash if fingerprint is not None else None
+            if phash is not None and self.hamming_threshold is not None:
+                best_id, best_distance = None, self.hamming_threshold + 1
+                for row_id, other in self._hashes.get(kind, {}).items():
+                    distance = hamming_distance(phash, other)
+                    if distance < best_distance:
+                        best_id, best_distance = row_id, distance
+                if best_id is not None:
+                    row = self._conn.execute("SELECT text FROM extractions WHERE id = ?", (best_id,)).fetchone()
+                    if row is not None:
+                        self._touch(best_id)
+                        self.near_hits += 1
+                        return row[0], fingerprint
+            self.misses += 1
+        return None, fingerprint
+
+    def store(self, kind, text, file_unique_id=None, fingerprint=None):
+        """
+        Saves an extraction result and evicts the least recently used entries if needed.
+
+        :param fingerprint: ImageFingerprint returned by lookup, or None to key the entry by file_unique_id only
+        """
+        if not text:
+            return
+        content_key = fingerprint.content_hash if fingerprint is not None else None
+        phash = fingerprint.phash if fingerprint is not None else None
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO extractions (kind, file_unique_id, phash, text, last_used, content_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, file_unique_id, format(phash, "016x") if phash is not None else None, text, time.time(),
+                 content_key)
+            )
+            if phash is not None and self.hamming_threshold is not None:
+                self._hashes.setdefault(kind, {})[cursor.lastrowid] = phash
+            self._evict()
+            self._conn.commit()
+
+    def _touch(self, row_id):
+        self._conn.execute("UPDATE extractions SET last_used = ? WHERE id = ?", (time.time(), row_id))
+        self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        stale = self._conn.execute(
+            "SELECT id, kind FROM extractions ORDER BY last_used LIMIT ?", (excess,)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM extractions WHERE id = ?", [(row_id,) for row_id, _ in stale])
+        for row_id, kind in stale:
+            self._hashes.get(kind, {}).pop(row_id, None)
+        self.evictions += len(stale)
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the overall hit rate.
+        """
+        with self._lock:
+            hits = self.exact_hits + self.content_hits + self.near_hits
+            total = hits + self.misses
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()
+            return {
+                "entries": entries,
+                "exact_hits": self.exact_hits,
+                "content_hits": self.content_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / total if total else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """
+    Returns the process-wide extraction cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
@@ -0,0 +1,244 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Hedging policy for slow API calls
+HEDGE_PERCENTILE = 0.95  # Fire a duplicate once a call is slower than this share of recent calls
+HEDGE_MIN_SAMPLES = 20  # Recent calls needed before the percentile is trusted
+HEDGE_DEFAULT_DELAY = 20.0  # Seconds before hedging while there is too little history
+HEDGE_MIN_DELAY = 2.0
+MAX_HEDGE_RATIO = 0.1  # Duplicates allowed per call, i.e. at most ~10% extra spend
+HISTOGRAM_WINDOW = 500  # Latencies kept in the histogram
+HEDGE_WORKERS = 16
+
+# Latency bucket upper bounds in seconds, roughly 25% apart from 0.1s to 120s
+LATENCY_BUCKETS = tuple(round(0.1 * 1.25 ** i, 3) for i in range(32)) + (float("inf"),)
+HEDGE_MAX_DELAY = LATENCY_BUCKETS[-2]  # Upper bound on the hedge delay; the overflow bucket is unbounded
+
+
+class HedgeCancelled(Exception):
+    """
+    Raised inside an attempt that lost the race and should stop.
+    """
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, window=HISTOGRAM_WINDOW):
+        """
+        Bucketed histogram over the most recent `window` latencies.
+        Percentiles are read from the bucket counts, so they cost O(buckets).
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.samples = deque()
+        self.window = window
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds):
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                return index
+        return len(self.buckets) - 1
+
+    def record(self, seconds):
+        index = self._bucket(seconds)
+        with self._lock:
+            self.samples.append(index)
+            self.counts[index] += 1
+            if len(self.samples) > self.window:
+                self.counts[self.samples.popleft()] -= 1
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given fraction (0-1) of recent latencies,
+        or None when nothing has been recorded.
+        """
+        with self._lock:
+            total = len(self.samples)
+            if not total:
+                return None
+            target = fraction * total
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= target:
+                    return bound
+            return self.buckets[-1]
+
+
+class HedgedCaller:
+    def __init__(self, percentile=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES, default_delay=HEDGE_DEFAULT_DELAY,
+                 min_delay=HEDGE_MIN_DELAY, max_delay=HEDGE_MAX_DELAY, max_hedge_ratio=MAX_HEDGE_RATIO, histogram=None,
+                 max_workers=HEDGE_WORKERS):
+        """
+        Runs a call and, if it has not answered by `percentile` of recent latency,
+        starts a duplicate. The first answer wins and the other attempt is cancelled.
+
+        :param percentile: Share of recent calls (0-1) a call may be slower than before it is hedged
+        :param min_samples: Recorded latencies needed before the percentile is used
+        :param default_delay: Hedge delay in seconds until enough latencies are recorded
+        :param min_delay: Lower bound on the hedge delay
+        :param max_delay: Upper bound on the hedge delay, used when the percentile falls in the overflow bucket
+        :param max_hedge_ratio: Maximum duplicates per call, capping the extra spend
+        :param histogram: LatencyHistogram to use; a new one by default
+        :param max_workers: Threads running attempts
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.histogram = histogram or LatencyHistogram()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+
+    def hedge_delay(self):
+        """
+        Seconds to wait for the first attempt before sending a duplicate.
+        """
+        if len(self.histogram) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, self.histogram.percentile(self.percentile)))
+
+    def _may_hedge(self):
+        with self._lock:
+            # One hedge of allowance, then at most max_hedge_ratio per call
+            if self.hedges > self.max_hedge_ratio * self.calls:
+                self.over_budget += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def _run(self, attempt, cancel):
+        started = time.monotonic()
+        try:
+            return attempt(cancel)
+        finally:
+            # Cancelled attempts still record how long they ran, so slow calls stay in the tail
+            self.histogram.record(time.monotonic() - started)
+
+    def call(self, attempt):
+        """
+        Calls attempt(cancel_event), hedging it when it is slow.
+
+        The attempt should check cancel_event.is_set() while it works (e.g. between
+        streamed chunks) and stop by raising HedgeCancelled; its result is ignored
+        once the other attempt has answered.
+
+        :return: The first successful result
+        """
+        with self._lock:
+            self.calls += 1
+
+        cancels = {}
+        primary_cancel = threading.Event()
+        primary = self.executor.submit(self._run, attempt, primary_cancel)
+        cancels[primary] = primary_cancel
+
+        delay = self.hedge_delay()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        print(f"Call slower than p{self.percentile * 100:.0f} ({delay:.1f}s), sending a hedged request")
+        hedge_cancel = threading.Event()
+        hedge = self.executor.submit(self._run, attempt, hedge_cancel)
+        cancels[hedge] = hedge_cancel
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    cancels[other].set()
+                    other.cancel()
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+        raise error
+
+    async def _async_run(self, attempt):
+        started = time.monotonic()
+        try:
+            return await attempt()
+        finally:
+            self.histogram.record(time.monotonic() - started)
+
+    async def async_call(self, attempt):
+        """
+        asyncio counterpart of call: attempt() is a coroutine function, and the
+        attempt that loses the race is cancelled instead of being signalled.
+
+        :return: The first successful result
+        """
+        with self._lock:
+            self.calls += 1
+
+        primary = asyncio.ensure_future(self._async_run(attempt))
+        tasks = [primary]
+        try:
+            delay = self.hedge_delay()
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not self._may_hedge():
+                return await primary
+
+            print(f"Call slower than p{self.percentile * 100:.0f} ({delay:.1f}s), sending a hedged request")
+            hedge = asyncio.ensure_future(self._async_run(attempt))
+            tasks.append(hedge)
+
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()  # The attempt that lost, or both if the caller was cancelled
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "over_budget": self.over_budget,
+                "hedge_delay": self.hedge_delay(),
+            }
+
+
+_vision_hedger = None
+_vision_hedger_lock = threading.Lock()
+
+
+def get_vision_hedger():
+    """
+    Returns the process-wide hedged caller for Vision API requests.
+    """
+    global _vision_hedger
+    with _vision_hedger_lock:
+        if _vision_hedger is None:
+            _vision_hedger = HedgedCaller()
+        return _vision_hedger
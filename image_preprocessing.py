@@ -0,0 +1,121 @@
+import time
+import cv2
+import numpy as np
+
+# Default preprocessing settings
+TARGET_LONG_SIDE = 1080  # Longest side of the processed image, in pixels
+DEFAULT_STEPS = ("resize", "denoise", "binarize")
+JPEG_QUALITY = 90
+
+
+def decode_image(image_bytes, grayscale=True):
+    """
+    Decodes encoded image bytes (JPEG/PNG) into a NumPy array.
+    """
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+    if img is None:
+        raise ValueError("Could not decode the image.")
+    return img
+
+
+def encode_image(img, quality=JPEG_QUALITY):
+    """
+    Encodes a NumPy image array as JPEG bytes.
+    """
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode the processed image.")
+    return encoded.tobytes()
+
+
+def resize_keep_aspect(img, long_side=TARGET_LONG_SIDE):
+    """
+    Scales the image so that its longest side equals long_side, keeping the aspect ratio.
+    Tall screenshots stay tall instead of being squashed into a square.
+    """
+    height, width = img.shape[:2]
+    scale = long_side / max(height, width)
+    if scale == 1:
+        return img
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=interpolation)
+
+
+def denoise(img):
+    """
+    Reduces noise with a small Gaussian blur.
+    """
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def binarize(img):
+    """
+    Converts the image to black and white using Otsu's threshold.
+    """
+    _, img = cv2.threshold(img, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return img
+
+
+class ImagePreprocessor:
+    STEP_FUNCTIONS = {
+        "resize": resize_keep_aspect,
+        "denoise": denoise,
+        "binarize": binarize,
+    }
+
+    def __init__(self, steps=DEFAULT_STEPS, long_side=TARGET_LONG_SIDE, jpeg_quality=JPEG_QUALITY):
+        """
+        Shared in-memory preprocessing stage for the OCR handlers.
+
+        :param steps: Ordered names of the steps to apply (see STEP_FUNCTIONS)
+        :param long_side: Target length of the longest image side for the resize step
+        :param jpeg_quality: JPEG quality used when re-encoding the result
+        """
+        unknown = [step for step in steps if step not in self.STEP_FUNCTIONS]
+        if unknown:
+            raise ValueError(f"Unknown preprocessing steps: {unknown}")
+        self.steps = tuple(steps)
+        self.long_side = long_side
+        self.jpeg_quality = jpeg_quality
+        self.last_timings = {}
+
+    def process_array(self, img):
+        """
+        Applies the configured steps to a decoded image.
+
+        :return: (processed image, {step name: seconds})
+        """
+        timings = {}
+        for step in self.steps:
+            start = time.perf_counter()
+            if step == "resize":
+                img = resize_keep_aspect(img, self.long_side)
+            else:
+                img = self.STEP_FUNCTIONS[step](img)
+            timings[step] = time.perf_counter() - start
+        return img, timings
+
+    def process_bytes(self, image_bytes):
+        """
+        Decodes image bytes, applies the configured steps and re-encodes the result as JPEG.
+
+        :return: (processed JPEG bytes, {step name: seconds})
+        """
+        timings = {}
+        start = time.perf_counter()
+        img = decode_image(image_bytes)
+        timings["decode"] = time.perf_counter() - start
+
+        img, step_timings = self.process_array(img)
+        timings.update(step_timings)
+
+        start = time.perf_counter()
+        processed = encode_image(img, self.jpeg_quality)
+        timings["encode"] = time.perf_counter() - start
+
+        self.last_timings = timings
+        return processed, timings
+
+
+default_preprocessor = ImagePreprocessor()
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from deck_template import deck_output, saved_deck
+from ppt_generator import MCQ_DECK_WRITER, PPTHandler
+from ai_presentation_generator import POINTS_DECK_WRITER, AIPresentationGenerator
+
+RENDER_WORKERS = 2  # Background threads rendering slides for all chats
+
+
+class IncrementalDeck:
+    def __init__(self, ppt_type):
+        """
+        Slides of one chat's deck, rendered as the chat's data is accumulated.
+
+        Each call to render turns the records added since the previous call into
+        slide XML (the same XML the streaming writer uses), so by the time the
+        user asks for the deck only the zip has to be written. The nav bar text
+        lives in the deck layout and is filled in when the deck is finalised, so
+        settings may still change until then.
+
+        :param ppt_type: "mcq" (one slide per question) or "points" (slides per titled block)
+        """
+        self.ppt_type = ppt_type
+        self.points_generator = AIPresentationGenerator(streaming=True)
+        self.slides = []  # Rendered slide XML, in deck order
+        self.rendered = 0  # Records already turned into slides
+        self._render_lock = threading.Lock()  # Serialises renders and the final write
+
+    def _new_records(self, question_data, lock):
+        """
+        Copies the records added since the last render, holding the chat's lock.
+        """
+        with lock:
+            if self.ppt_type == "mcq":
+                questions = question_data["Question"][self.rendered:]
+                options = question_data["Options"][self.rendered:]
+                return [(question, options[i] if i < len(options) else []) for i, question in enumerate(questions)]
+            return question_data["Points"][self.rendered:]
+
+    def _render_records(self, question_data, lock):
+        records = self._new_records(question_data, lock)
+        for record in records:
+            if self.ppt_type == "mcq":
+                question, options = record
+                self.rendered += 1
+                self.slides.append(PPTHandler.question_slide_xml(self.rendered, question, options))
+            else:
+                # paginate starts a new slide for every titled block, so blocks render independently
+                for title_text, texts in self.points_generator.paginate([record]):
+                    self.slides.append(self.points_generator.slide_xml(title_text, texts))
+                self.rendered += 1
+        return len(records)
+
+    def render(self, question_data, lock):
+        """
+        Renders slides for the records added since the last call.
+
+        :param question_data: The chat's accumulator ({"Question", "Options", "Points"})
+        :param lock: The chat's lock, held while the new records are copied
+        :return: Number of records rendered
+        """
+        with self._render_lock:
+            return self._render_records(question_data, lock)
+
+    def finalise(self, question_data, lock, settings, in_memory=False):
+        """
+        Renders any records the background has not reached yet and writes the deck.
+
+        :param settings: The chat's presentation settings (title, topic, teacher_name)
+        :param in_memory: Write the deck to a named BytesIO instead of a file
+        :return: File name of the saved deck (BytesIO if in_memory), or None if there are no slides
+        """
+        with self._render_lock:
+            self._render_records(question_data, lock)
+            if not self.slides:
+                print("No data to generate PPT.")
+                return None
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            if self.ppt_type == "mcq":
+                filename, writer = f"ppt_{timestamp}.pptx", MCQ_DECK_WRITER
+            else:
+                filename, writer = f"final_presentation_{timestamp}.pptx", POINTS_DECK_WRITER
+            output = deck_output(filename, in_memory)
+            writer.write(output, iter(self.slides), settings["title"], settings["topic"], settings["teacher_name"])
+            print(f"Presentation saved as {filename} ({len(self.slides)} slides)")
+            return saved_deck(output)
+
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+
+def get_render_executor():
+    """
+    Returns the process-wide thread pool rendering slides in the background.
+    """
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="deck-render")
+        return _render_executor
+
+
+def session_deck(session):
+    """
+    Returns the chat's IncrementalDeck for its current ppt type, starting a new
+    one when there is none or the type has changed. None for unknown types.
+    """
+    ppt_type = session.presentation_settings["ppt_type"]
+    if ppt_type not in ("mcq", "points"):
+        return None
+    with session.lock:
+        if session.deck is None or session.deck.ppt_type != ppt_type:
+            session.deck = IncrementalDeck(ppt_type)
+        return session.deck
+
+
+def _render_in_background(deck, question_data, lock):
+    try:
+        deck.render(question_data, lock)
+    except Exception as e:
+        # The records stay unrendered and are retried by the next update or by finalise
+        print(f"Error rendering slides in the background: {e}")
+
+
+def update_deck(session):
+    """
+    Schedules rendering of the records added to the chat since the last update.
+    Call after each accumulate_questions / accumulate_points (or streamed record).
+    """
+    deck = session_deck(session)
+    if deck is not None:
+        get_render_executor().submit(_render_in_background, deck, session.question_data, session.lock)
+
+
+def finalise_deck(session, in_memory=False):
+    """
+    Writes the chat's deck from its pre-rendered slides.
+
+    :param in_memory: Write the deck to a named BytesIO instead of a file
+    :return: File name of the saved deck (BytesIO if in_memory), or None if there is nothing to render
+    """
+    deck = session_deck(session)
+    if deck is None:
+        return None
+    return deck.finalise(session.question_data, session.lock, session.presentation_settings, in_memory)
@@ -0,0 +1,241 @@
+import json
+
+
+def strip_code_fence(text):
+    """
+    Removes a surrounding Markdown code fence (```json ... ```) if present.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text[:4].lower() == "json":
+            text = text[4:]
+        end = text.rfind("```")
+        if end != -1:
+            text = text[:end]
+    return text.strip()
+
+
+def remove_trailing_commas(text):
+    """
+    Drops commas that directly precede a closing } or ] outside of strings,
+    e.g. the `],\n  }` pattern from the prompt examples. Runs in linear time.
+    """
+    result = []
+    in_string = False
+    escape = False
+    length = len(text)
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            j = i + 1
+            while j < length and text[j] in " \t\r\n":
+                j += 1
+            if j < length and text[j] in "}]":
+                continue
+        result.append(ch)
+    return "".join(result)
+
+
+def scan_json_objects(text):
+    """
+    Collects every complete JSON object from a (possibly truncated) LLM response.
+
+    The scanner makes a single pass, tracking string and escape state so that
+    brackets inside string values never end an object. Every array opened
+    outside a record is a candidate record list, and the objects directly
+    inside it are its records; a top-level object outside any array is a
+    record on its own. The candidate opened first that yields a record wins,
+    so a bracket without objects (e.g. "[1]" in a sentence before the real
+    array) is treated as prose. Objects cut off by the end of the text are
+    dropped, so a response truncated by max_tokens still yields the records
+    that finished.
+
+    :return: (list of parsed objects, True if the outer array was closed)
+    """
+    stack = []  # [opening index, records] per open bracket; records is None unless a candidate array
+    first_closed = None  # (opening index, records) of the earliest candidate array that closed with records
+    top_objects = []
+    top_opened_at = None
+    object_start = None  # Index of the open top-level object
+    record_start = None  # Index of the open record object inside a candidate array
+    record_depth = None
+    in_string = False
+    escape = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            if stack:
+                in_string = True
+        elif ch == "[":
+            stack.append([i, [] if record_start is None else None])
+        elif ch == "{":
+            if not stack:
+                object_start = i
+            elif record_start is None and stack[-1][1] is not None:
+                record_start, record_depth = i, len(stack)
+            stack.append([i, None])
+        elif ch in "]}":
+            if not stack:
+                continue
+            opened_at, records = stack.pop()
+            if records and (first_closed is None or opened_at < first_closed[0]):
+                first_closed = opened_at, records
+            if record_start is not None and len(stack) == record_depth:
+                record = _parse_object(text[record_start:i + 1])
+                record_start = None
+                if record is not None:
+                    stack[-1][1].append(record)
+            if stack:
+                continue
+            if object_start is not None:
+                record = _parse_object(text[object_start:i + 1])
+                object_start = None
+                if record is not None:
+                    top_objects.append(record)
+                    if top_opened_at is None:
+                        top_opened_at = opened_at
+            if first_closed and (top_opened_at is None or first_closed[0] < top_opened_at):
+                return first_closed[1], True
+
+    candidates = [(opened_at, records, False) for opened_at, records in stack if records]
+    if first_closed:
+        candidates.append((*first_closed, True))
+    if top_objects:
+        candidates.append((top_opened_at, top_objects, not stack))
+    if not candidates:
+        return [], not stack
+    _, records, complete = min(candidates, key=lambda candidate: candidate[0])
+    return records, complete
+
+
+def _parse_object(segment):
+    """
+    Parses one object found by scan_json_objects, or returns None if it is malformed.
+    """
+    try:
+        return json.loads(remove_trailing_commas(segment))
+    except json.JSONDecodeError as e:
+        print(f"Skipping malformed JSON object: {e}")
+        return None
+
+
+class IncrementalObjectScanner:
+    def __init__(self):
+        """
+        Streaming counterpart of scan_json_objects: text is fed in pieces as it
+        arrives and each record object is returned as soon as its closing brace
+        is seen.
+
+        Records are the objects directly inside a top-level array ([{...}, ...])
+        or inside an array under a top-level key ({"questions": [{...}, ...]}).
+        String and escape state carry over between pieces, and only the text of
+        the record currently open is buffered.
+        """
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.record_parts = None  # Pieces of the open record, None between records
+        self.parts = []
+
+    @property
+    def text(self):
+        """
+        Everything fed so far.
+        """
+        return "".join(self.parts)
+
+    def _at_record_level(self):
+        return self.stack == ["["] or self.stack == ["{", "["]
+
+    def feed(self, chunk):
+        """
+        Consumes the next piece of the response.
+
+        :return: List of record objects completed by this piece
+        """
+        self.parts.append(chunk)
+        objects = []
+        start = 0 if self.record_parts is not None else None
+
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                if self.stack:
+                    self.in_string = True
+            elif ch in "[{":
+                if ch == "{" and self._at_record_level():
+                    self.record_parts = []
+                    start = i
+                self.stack.append(ch)
+            elif ch in "]}":
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                if ch == "}" and self.record_parts is not None and self._at_record_level():
+                    segment = "".join(self.record_parts) + chunk[start:i + 1]
+                    self.record_parts = None
+                    start = None
+                    try:
+                        objects.append(json.loads(remove_trailing_commas(segment)))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed JSON object: {e}")
+
+        if self.record_parts is not None:
+            self.record_parts.append(chunk[start:])
+        return objects
+
+
+def extract_json_array(response_text):
+    """
+    Returns the list of records in an LLM response, repairing what can be repaired locally.
+
+    Well-formed JSON is parsed directly. Otherwise the response is scanned for
+    complete objects, which also closes an array left open by truncation.
+
+    :return: List of parsed objects, or None if no object could be recovered
+    """
+    if not response_text:
+        return None
+    text = strip_code_fence(response_text)
+
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, list):
+            return parsed
+        if isinstance(parsed, dict):
+            return [parsed]
+    except json.JSONDecodeError:
+        pass
+
+    objects, complete = scan_json_objects(text)
+    if not objects:
+        return None
+    if not complete:
+        print(f"⚠️ Response was truncated; recovered {len(objects)} complete objects.")
+    return objects
@@ -0,0 +1,249 @@
+import os
+import json
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import openai
+from circuit_breaker import get_breaker
+from rate_limiter import async_call_with_rate_limit, call_with_rate_limit, estimate_request_tokens
+
+# Endpoint and connection settings; point LLM_BASE_URL at mock_llm_server.py to run offline
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://api.openai.com/v1")
+POOL_SIZE = 32  # Keep-alive connections per host
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 90
+
+
+class LLMError(Exception):
+    def __init__(self, message, status_code=None, headers=None):
+        """
+        Error returned by the chat completions endpoint.
+        status_code and headers are kept so the rate limiter can honour Retry-After.
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _api_key(api_key):
+    return api_key or os.environ.get("OPENAI_API_KEY") or getattr(openai, "api_key", None)
+
+
+def _stream_delta(line):
+    """
+    Reads one server-sent events line of a streamed completion.
+
+    :return: (True once the stream is done, text delta or None)
+    """
+    if not line or not line.startswith("data:"):
+        return False, None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return True, None
+    choices = json.loads(data).get("choices") or []
+    return False, choices[0].get("delta", {}).get("content") if choices else None
+
+
+class LLMClient:
+    def __init__(self, base_url=LLM_BASE_URL, api_key=None, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT_SECONDS, read_timeout=READ_TIMEOUT_SECONDS, limiter=None, breaker=None):
+        """
+        Synchronous chat completions client over a pooled keep-alive HTTP session.
+
+        Connections (and their TLS sessions) are reused across calls and threads
+        instead of being set up for every request.
+
+        :param base_url: OpenAI-compatible API root, e.g. https://api.openai.com/v1
+        :param api_key: API key; defaults to OPENAI_API_KEY or openai.api_key
+        :param pool_size: Maximum pooled connections to the endpoint
+        :param connect_timeout: Seconds to wait for a connection
+        :param read_timeout: Seconds to wait for the response
+        :param limiter: RateLimiter to use; defaults to the process-wide one
+        :param breaker: CircuitBreaker to use; defaults to the shared "openai" breaker
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self.breaker = breaker or get_breaker("openai")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {_api_key(self.api_key)}",
+            "Content-Type": "application/json",
+        }
+
+    def _post(self, payload, stream=False):
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(payload),
+            headers=self._headers(),
+            timeout=self.timeout,
+            stream=stream
+        )
+        if response.status_code >= 400:
+            raise LLMError(
+                f"Chat completion failed with HTTP {response.status_code}: {response.text[:300]}",
+                status_code=response.status_code,
+                headers=response.headers
+            )
+        return response if stream else response.json()
+
+    def chat_completion(self, **payload):
+        """
+        Creates a chat completion and returns the response as a dict
+        (response["choices"][0]["message"]["content"] holds the text).
+        Runs under the shared rate limiter with backoff on throttling, and fails
+        fast with CircuitOpenError while the OpenAI circuit is open.
+        """
+        estimated_tokens = estimate_request_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        return call_with_rate_limit(lambda: self._post(payload), estimated_tokens, self.limiter, breaker=self.breaker)
+
+    def stream_chat_completion(self, **payload):
+        """
+        Creates a streamed chat completion and yields the text deltas as they
+        arrive (server-sent events). Only opening the stream is rate limited and
+        retried; an error after the first delta is raised to the caller.
+        """
+        estimated_tokens = estimate_request_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        stream_payload = dict(payload, stream=True)
+        response = call_with_rate_limit(
+            lambda: self._post(stream_payload, stream=True), estimated_tokens, self.limiter, breaker=self.breaker
+        )
+        response.encoding = "utf-8"
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                done, delta = _stream_delta(line)
+                if done:
+                    break
+                if delta:
+                    yield delta
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncLLMClient:
+    def __init__(self, base_url=LLM_BASE_URL, api_key=None, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT_SECONDS, read_timeout=READ_TIMEOUT_SECONDS, limiter=None, breaker=None):
+        """
+        asyncio chat completions client over a pooled keep-alive aiohttp session,
+        so the asyncio bot awaits its OpenAI requests instead of parking threads on them.
+        The session is created lazily inside the running event loop.
+        Takes the same parameters as LLMClient.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.limiter = limiter
+        self.breaker = breaker or get_breaker("openai")
+        self._session = None
+        self._loop = None
+
+    async def _get_session(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    async def _post(self, payload, stream=False):
+        session = await self._get_session()
+        response = await session.post(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(payload),
+            headers={
+                "Authorization": f"Bearer {_api_key(self.api_key)}",
+                "Content-Type": "application/json",
+            }
+        )
+        if stream and response.status < 400:
+            return response
+        try:
+            if response.status >= 400:
+                text = await response.text()
+                raise LLMError(
+                    f"Chat completion failed with HTTP {response.status}: {text[:300]}",
+                    status_code=response.status,
+                    headers=dict(response.headers)
+                )
+            return await response.json()
+        finally:
+            response.release()
+
+    async def chat_completion(self, **payload):
+        """
+        Creates a chat completion without blocking the event loop.
+        Shares the process-wide rate limiter and the "openai" breaker with the synchronous client.
+        """
+        estimated_tokens = estimate_request_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        return await async_call_with_rate_limit(
+            lambda: self._post(payload), estimated_tokens, self.limiter, breaker=self.breaker
+        )
+
+    async def stream_chat_completion(self, **payload):
+        """
+        Creates a streamed chat completion and yields the text deltas as they
+        arrive. Only opening the stream is rate limited and retried.
+        """
+        estimated_tokens = estimate_request_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        stream_payload = dict(payload, stream=True)
+        response = await async_call_with_rate_limit(
+            lambda: self._post(stream_payload, stream=True), estimated_tokens, self.limiter, breaker=self.breaker
+        )
+        try:
+            async for line in response.content:
+                done, delta = _stream_delta(line.decode("utf-8").strip())
+                if done:
+                    break
+                if delta:
+                    yield delta
+        finally:
+            response.release()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """
+    Returns the process-wide synchronous LLM client.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
+
+
+_default_async_client = None
+
+
+def get_async_llm_client():
+    """
+    Returns the process-wide asyncio LLM client.
+    """
+    global _default_async_client
+    with _default_client_lock:
+        if _default_async_client is None:
+            _default_async_client = AsyncLLMClient()
+        return _default_async_client
@@ -0,0 +1,87 @@
+import time
+import numpy as np
+from ocr_reader import get_reader
+from image_preprocessing import decode_image, default_preprocessor
+
+# Batching settings for the local easyocr engine
+IMAGES_PER_BATCH = 4  # Images passed to easyocr in one readtext_batched call
+RECOGNITION_BATCH_SIZE = 16  # Text crops recognised per forward pass
+
+
+def pad_to_same_size(images, fill=255):
+    """
+    Pads grayscale images on the right/bottom to a common size so easyocr can
+    detect text in one batch without distorting their aspect ratio.
+    """
+    height = max(img.shape[0] for img in images)
+    width = max(img.shape[1] for img in images)
+    padded = []
+    for img in images:
+        canvas = np.full((height, width), fill, dtype=img.dtype)
+        canvas[:img.shape[0], :img.shape[1]] = img
+        padded.append(canvas)
+    return padded
+
+
+class LocalOCREngine:
+    def __init__(self, preprocessor=None, images_per_batch=IMAGES_PER_BATCH,
+                 recognition_batch_size=RECOGNITION_BATCH_SIZE, reader_factory=get_reader):
+        """
+        Offline OCR engine built on the shared easyocr reader.
+
+        :param preprocessor: ImagePreprocessor applied before recognition
+        :param images_per_batch: Number of images detected together in one call
+        :param recognition_batch_size: easyocr batch size for the recognition model
+        :param reader_factory: Callable returning the easyocr reader
+        """
+        self.preprocessor = preprocessor or default_preprocessor
+        self.images_per_batch = images_per_batch
+        self.recognition_batch_size = recognition_batch_size
+        self.reader_factory = reader_factory
+        self.last_batch_seconds = []
+
+    def read_texts(self, images_bytes):
+        """
+        Runs OCR over several encoded images in batches.
+
+        :param images_bytes: List of encoded images (JPEG/PNG bytes)
+        :return: One text string per image, lines in reading order joined by newlines.
+                 This is the plain-text shape that get_single_question_data and
+                 get_bullet_points_data expect.
+        """
+        reader = self.reader_factory()
+        images = [self.preprocessor.process_array(decode_image(data))[0] for data in images_bytes]
+
+        texts = []
+        self.last_batch_seconds = []
+        for start in range(0, len(images), self.images_per_batch):
+            batch = pad_to_same_size(images[start:start + self.images_per_batch])
+            started = time.perf_counter()
+            results = reader.readtext_batched(
+                batch,
+                batch_size=self.recognition_batch_size,
+                detail=0,
+                paragraph=True
+            )
+            self.last_batch_seconds.append(time.perf_counter() - started)
+            texts.extend("\n".join(lines) for lines in results)
+        return texts
+
+    def read_text(self, image_bytes):
+        """
+        Runs OCR over a single encoded image.
+        """
+        return self.read_texts([image_bytes])[0]
+
+
+_default_engine = None
+
+
+def get_local_engine():
+    """
+    Returns the process-wide local OCR engine.
+    """
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = LocalOCREngine()
+    return _default_engine
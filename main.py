@@ -1,5 +1,22 @@
+import sys
 from telegram_bot import TelegramBot
 
 if __name__ == "__main__":
-    bot = TelegramBot()
+    ocr_engine = "local" if "--local-ocr" in sys.argv else "openai"
+    stream_responses = "--stream" in sys.argv
+    hedge_requests = "--hedge" in sys.argv
+    incremental_decks = "--full-render" not in sys.argv  # Render the whole deck on "nextlevel"
+    render_pool = "--render-pool" in sys.argv  # Full renders run on a process pool (needs --full-render)
+    if render_pool and incremental_decks:
+        sys.exit("--render-pool only applies to full renders; pass it together with --full-render")
+    in_memory_decks = "--save-decks" not in sys.argv  # Keep ppt_*.pptx / final_presentation_*.pptx files on disk
+    if "--async" in sys.argv:
+        from async_telegram_bot import AsyncTelegramBot
+        bot = AsyncTelegramBot(ocr_engine=ocr_engine, stream_responses=stream_responses, hedge_requests=hedge_requests,
+                               incremental_decks=incremental_decks, render_pool=render_pool,
+                               in_memory_decks=in_memory_decks)
+    else:
+        bot = TelegramBot(ocr_engine=ocr_engine, stream_responses=stream_responses, hedge_requests=hedge_requests,
+                          incremental_decks=incremental_decks, render_pool=render_pool,
+                          in_memory_decks=in_memory_decks)
     bot.start()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+# Telegram delivers an album as one message per image sharing a media_group_id
+MEDIA_GROUP_WAIT_SECONDS = 1.5  # Quiet time after the last message before an album is processed
+
+
+def media_group_key(message):
+    """
+    Key of the album a message belongs to, or None for a standalone message.
+    """
+    media_group_id = getattr(message, "media_group_id", None)
+    if media_group_id is None:
+        return None
+    return message.chat.id, media_group_id
+
+
+def album_file(message):
+    """
+    The largest photo size, or the document, carried by an album message.
+    """
+    return message.photo[-1] if message.photo else message.document
+
+
+class MediaGroupBuffer:
+    def __init__(self, on_complete, wait_seconds=MEDIA_GROUP_WAIT_SECONDS):
+        """
+        Collects the messages of an album and hands them to on_complete together
+        once no new message of that album has arrived for wait_seconds.
+        Used by the threaded bot; on_complete runs on a timer thread.
+
+        :param on_complete: Called with the list of messages of a finished album
+        :param wait_seconds: Quiet time before an album is considered complete
+        """
+        self.on_complete = on_complete
+        self.wait_seconds = wait_seconds
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def add(self, message):
+        """
+        Adds an album message and restarts that album's timer.
+        """
+        key = media_group_key(message)
+        with self._lock:
+            messages, timer = self._groups.get(key, ([], None))
+            if timer is not None:
+                timer.cancel()
+            messages.append(message)
+            timer = threading.Timer(self.wait_seconds, self._flush, args=(key,))
+            timer.daemon = True
+            self._groups[key] = (messages, timer)
+        timer.start()
+
+    def _flush(self, key):
+        with self._lock:
+            messages, _ = self._groups.pop(key, (None, None))
+        if messages:
+            self.on_complete(messages)
+
+
+class AsyncMediaGroupBuffer:
+    def __init__(self, on_complete, wait_seconds=MEDIA_GROUP_WAIT_SECONDS):
+        """
+        asyncio counterpart of MediaGroupBuffer for the asyncio bot.
+
+        :param on_complete: Coroutine function called with the messages of a finished album
+        :param wait_seconds: Quiet time before an album is considered complete
+        """
+        self.on_complete = on_complete
+        self.wait_seconds = wait_seconds
+        self._groups = {}
+
+    def add(self, message):
+        """
+        Adds an album message and restarts that album's timer. Must be called on the event loop.
+        """
+        key = media_group_key(message)
+        messages, task = self._groups.get(key, ([], None))
+        if task is not None:
+            task.cancel()
+        messages.append(message)
+        self._groups[key] = (messages, asyncio.create_task(self._flush_later(key)))
+
+    async def _flush_later(self, key):
+        await asyncio.sleep(self.wait_seconds)
+        messages, _ = self._groups.pop(key)
+        await self.on_complete(messages)
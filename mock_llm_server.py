@@ -0,0 +1,181 @@
+"""
+Local OpenAI-compatible stand-in for measuring pipeline latency and throughput offline.
+
+Run:
+    python mock_llm_server.py --port 8099 --latency 0.5 --token-delay 0.02
+    LLM_BASE_URL=http://127.0.0.1:8099/v1 python main.py
+
+POST /v1/chat/completions answers with canned MCQ or bullet point JSON shaped
+like the real prompts expect, after an optional artificial delay. Requests with
+"stream": true get the same content as server-sent events, one small delta at
+a time.
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_QUESTIONS = [
+    {
+        "Question": "SRY जीन कहाँ पाया जा सकता है?",
+        "Options": ["(a) केवल पुरुषों में।", "(b) केवल महिलाओं में।", "(c) दोनों में।", "(d) इनमें से कोई नहीं।"]
+    },
+    {
+        "Question": "निम्नलिखित कथनों पर विचार करें:\n1. पहला कथन।\n2. दूसरा कथन।\nइनमें से कौन से कथन सही हैं?",
+        "Options": ["(a) केवल 1", "(b) केवल 2", "(c) 1 और 2 दोनों", "(d) न तो 1 और न ही 2"]
+    },
+]
+
+SAMPLE_POINTS = [
+    {
+        "title": "अनुपात (Ratio)",
+        "points": [
+            "अनुपात समान इकाई की दो राशियों के बीच तुलना दिखाता है।",
+            "जब दो अनुपात आपस में बराबर हों तो इसे समानुपात कहते हैं।"
+        ]
+    }
+]
+
+
+def prompt_text(messages):
+    parts = []
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    images += 1
+                else:
+                    parts.append(part.get("text", ""))
+    return "\n".join(parts), images
+
+
+def canned_content(messages, response_format=None):
+    """
+    Picks a response matching the kind of prompt that was sent.
+    """
+    text, images = prompt_text(messages)
+    items = SAMPLE_POINTS if "bullet point" in text.lower() else SAMPLE_QUESTIONS
+    if "Multiple Images" in text:
+        return json.dumps({"images": [{"image": n, "items": items} for n in range(1, images + 1)]}, ensure_ascii=False)
+    if response_format and response_format.get("type") == "json_schema":
+        key = "slides" if items is SAMPLE_POINTS else "questions"
+        return json.dumps({key: items}, ensure_ascii=False, indent=2)
+    return json.dumps(items, ensure_ascii=False, indent=2)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive like the real API
+    latency = 0.0
+    jitter = 0.0
+    failure_rate = 0.0
+    token_delay = 0.0
+    stream_chunk_chars = 12
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content, model):
+        """
+        Sends the content as chunked server-sent events, like a streamed completion.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(body):
+            data = f"data: {body}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        for start in range(0, len(content), self.stream_chunk_chars):
+            write_event(json.dumps({
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + self.stream_chunk_chars]}}]
+            }, ensure_ascii=False))
+            time.sleep(self.token_delay)
+        write_event(json.dumps({
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if random.random() < self.failure_rate:
+            self._send_json(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "1"})
+            return
+
+        content = canned_content(payload.get("messages", []), payload.get("response_format"))
+        if payload.get("stream"):
+            self._send_stream(content, payload.get("model", "mock"))
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 3, "total_tokens": len(content) // 3}
+        })
+
+
+def serve(host="127.0.0.1", port=8099, latency=0.0, jitter=0.0, failure_rate=0.0, token_delay=0.0):
+    """
+    Starts the mock server and blocks until interrupted.
+    """
+    MockLLMHandler.latency = latency
+    MockLLMHandler.jitter = jitter
+    MockLLMHandler.failure_rate = failure_rate
+    MockLLMHandler.token_delay = token_delay
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    print(f"Mock LLM server listening on http://{host}:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds added to the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.latency, args.jitter, args.failure_rate, args.token_delay)
@@ -0,0 +1,115 @@
+import os
+import threading
+
+# Models tried in order for each pipeline stage; a stage escalates to the next
+# model when the previous one's reply fails schema validation.
+# Override a stage with e.g. MODEL_ROUTE_STRUCTURE_MCQ="gpt-4o-mini,gpt-4o".
+DEFAULT_ROUTES = {
+    "vision_mcq": ("gpt-4o",),
+    "vision_points": ("gpt-4o",),
+    "structure_mcq": ("gpt-4o-mini", "gpt-4o"),
+    "structure_points": ("gpt-4o-mini", "gpt-4o"),
+}
+
+
+def routes_from_env(defaults=DEFAULT_ROUTES, environ=os.environ):
+    """
+    Returns the routing policy, with stages overridden by MODEL_ROUTE_<STAGE>
+    environment variables holding comma-separated model names.
+    """
+    routes = dict(defaults)
+    for stage in defaults:
+        value = environ.get(f"MODEL_ROUTE_{stage.upper()}")
+        if value:
+            models = tuple(model.strip() for model in value.split(",") if model.strip())
+            if models:
+                routes[stage] = models
+    return routes
+
+
+class ModelRouter:
+    def __init__(self, routes=None):
+        """
+        Per-stage model routing with escalation on validation failure.
+
+        :param routes: Dict of stage -> tuple of models, cheapest first
+        """
+        self.routes = routes or routes_from_env()
+        self._lock = threading.Lock()
+        self.calls = {stage: 0 for stage in self.routes}
+        self.escalations = {stage: 0 for stage in self.routes}
+
+    def models(self, stage):
+        """
+        Models to try for `stage`, in order.
+        """
+        return self.routes[stage]
+
+    def model(self, stage, tier=0):
+        """
+        Model for `stage` at escalation tier `tier` (0 is the first choice).
+        Tiers past the end of the route stay on the strongest model.
+        """
+        models = self.routes[stage]
+        return models[min(tier, len(models) - 1)]
+
+    def escalate(self, stage, tier, reason):
+        """
+        Moves a request of `stage` from tier `tier` to the next model.
+
+        :return: The next tier, or None when `tier` already is the strongest model
+        """
+        if tier + 1 >= len(self.routes[stage]):
+            return None
+        print(f"Escalating {stage} from {self.model(stage, tier)} to {self.model(stage, tier + 1)}: {reason}")
+        return tier + 1
+
+    def record(self, stage, tier):
+        """
+        Records one finished request of `stage` that ended on escalation tier `tier`
+        and reports the stage's escalation rate whenever a request escalated.
+        """
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            if tier > 0:
+                self.escalations[stage] = self.escalations.get(stage, 0) + 1
+            calls = self.calls[stage]
+            escalations = self.escalations.get(stage, 0)
+        if tier > 0:
+            print(f"{stage} escalation rate: {escalations}/{calls} ({escalations / calls:.0%})")
+
+    def escalation_rate(self, stage):
+        with self._lock:
+            calls = self.calls.get(stage, 0)
+            return self.escalations.get(stage, 0) / calls if calls else 0.0
+
+    def stats(self):
+        """
+        Per-stage request count, escalations and escalation rate.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "models": list(models),
+                    "calls": self.calls.get(stage, 0),
+                    "escalations": self.escalations.get(stage, 0),
+                    "escalation_rate": (self.escalations.get(stage, 0) / self.calls[stage]
+                                        if self.calls.get(stage) else 0.0),
+                }
+                for stage, models in self.routes.items()
+            }
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_model_router():
+    """
+    Returns the process-wide model router.
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
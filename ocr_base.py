@@ -0,0 +1,710 @@
+import base64
+import asyncio
+import logging
+import requests
+from contextlib import nullcontext
+from telegram_files import fetch_file_bytes
+from image_preprocessing import default_preprocessor
+from ocr_reader import get_reader
+from local_ocr import get_local_engine
+from extraction_cache import get_extraction_cache
+from token_budget import async_chat_completion_with_continuation, chat_completion_with_continuation
+from llm_client import get_async_llm_client, get_llm_client
+from json_scanner import IncrementalObjectScanner
+from hedging import HedgeCancelled
+from circuit_breaker import CircuitOpenError, get_breaker
+from model_routing import get_model_router
+from record_schemas import STRUCTURED_OUTPUTS, extract_records, response_format
+from vision_batching import (
+    MAX_BATCH_BYTES, MAX_IMAGES_PER_BATCH, async_extract_in_batches, batch_instructions, extract_in_batches
+)
+
+OCR_ENGINES = ("openai", "local")
+EXTRACTION_UNAVAILABLE = "Image processing is temporarily unavailable, please try again in a minute."
+
+logger = logging.getLogger(__name__)
+
+
+class BaseOCRHandler:
+    """
+    Image-to-records pipeline shared by the MCQ and bullet point handlers:
+    download, cache, preprocessing, local or Vision API extraction (single,
+    batched, hedged or streamed) and accumulation of the structured records.
+
+    The network stages have asyncio counterparts (async_*) that the asyncio bot
+    awaits, while it runs the CPU stages on its own pool.
+
+    Subclasses set the record kind and prompts and implement the structuring
+    and accumulator hooks at the bottom of the class.
+    """
+    KIND = None  # "mcq" or "points": cache namespace, model route and response schema
+    VISION_SYSTEM_PROMPT = None
+    VISION_PROMPT = None
+    EXTRACTED_LABEL = "Extracted Text:"  # Prefix of the extraction log line
+    NO_TEXT_MESSAGE = "No text detected in the image."
+    ACCUMULATE_ERROR = "Error processing extracted data"
+
+    def __init__(self, bot, group_chat_id, preprocessor=None, engine="openai", local_engine=None,
+                 cache=None, use_cache=True, single_pass=True,
+                 max_batch_images=MAX_IMAGES_PER_BATCH, max_batch_bytes=MAX_BATCH_BYTES, hedger=None):
+        self.bot = bot
+        self.group_chat_id = group_chat_id
+        self.preprocessor = preprocessor or default_preprocessor
+        if engine not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR engine: {engine}")
+        self.engine = engine  # "openai" (Vision API) or "local" (offline easyocr)
+        self._local_engine = local_engine
+        self._cache = cache
+        self.use_cache = use_cache
+        self.single_pass = single_pass  # Use a schema-conforming vision response as-is
+        self.max_batch_images = max_batch_images  # Images packed into one Vision API request
+        self.max_batch_bytes = max_batch_bytes
+        self.hedger = hedger  # HedgedCaller for single-image Vision API requests, or None
+
+    @property
+    def reader(self):
+        """
+        Shared easyocr reader (English and Hindi), loaded on first use.
+        """
+        return get_reader()
+
+    @property
+    def local_engine(self):
+        """
+        Offline easyocr engine, created on first use.
+        """
+        if self._local_engine is None:
+            self._local_engine = get_local_engine()
+        return self._local_engine
+
+    @property
+    def cache(self):
+        """
+        Persistent extraction cache, or None when caching is disabled.
+        """
+        if not self.use_cache:
+            return None
+        if self._cache is None:
+            self._cache = get_extraction_cache()
+        return self._cache
+
+    @property
+    def cache_kind(self):
+        """
+        Cache namespace; results differ per content type and engine.
+        """
+        return f"{self.KIND}:{self.engine}"
+
+    def cached_text(self, file_unique_id):
+        """
+        Returns a cached extraction for an exact Telegram file_unique_id match, or None.
+        """
+        if self.cache is None or not file_unique_id:
+            return None
+        return self.cache.lookup_by_file_id(self.cache_kind, file_unique_id)
+
+    def cache_result(self, extracted_text, file_unique_id=None, fingerprint=None):
+        """
+        Caches an extraction result. Vision replies are only kept once they parse
+        into records, so a refusal or a truncated reply is retried next time
+        instead of being replayed. Local easyocr text is deterministic and kept as is.
+        """
+        if self.cache is None or not extracted_text:
+            return
+        if self.engine != "local" and not extract_records(extracted_text, self.KIND):
+            logger.debug("Not caching a reply without %s records", self.KIND)
+            return
+        self.cache.store(self.cache_kind, extracted_text, file_unique_id, fingerprint)
+
+    def preprocess_image(self, image_bytes):
+        """
+        Enhances contrast and clarity to improve OCR accuracy.
+        Works on the encoded image in memory and returns the processed JPEG bytes.
+        """
+        processed, timings = self.preprocessor.process_bytes(image_bytes)
+        logger.debug("Preprocessing timings (ms): %s",
+                     {step: round(seconds * 1000, 1) for step, seconds in timings.items()})
+        return processed
+
+    def report_error(self, error_message):
+        print(error_message)
+        self.bot.send_message(self.group_chat_id, error_message)
+
+    def extract_text_from_image(self, file_id, file_unique_id=None):
+        """
+        Downloads an image from Telegram into memory and extracts its text.
+        """
+        cached = self.cached_text(file_unique_id)
+        if cached:
+            logger.debug("Extraction cache hit for %s", file_unique_id)
+            return cached
+
+        try:
+            # ✅ Step 1: Download the image once, straight into memory
+            image_bytes = fetch_file_bytes(self.bot, file_id)
+
+        except requests.exceptions.RequestException as e:
+            self.report_error(f"Failed to download file: {e}")
+            return ""
+
+        except Exception as e:
+            self.report_error(f"Error during OCR processing: {str(e)}")
+            return ""
+
+        return self.extract_text_from_bytes(image_bytes, file_unique_id)
+
+    def ensure_openai_available(self):
+        """
+        Raises CircuitOpenError while the OpenAI circuit is open. Both engines need
+        OpenAI to structure the text, so the request fails fast instead of running
+        OCR whose output could not be used.
+        """
+        get_breaker("openai").ensure_available()
+
+    def extract_text_from_bytes(self, image_bytes, file_unique_id=None, processed_image=None):
+        """
+        Extracts text from an already downloaded image without touching the disk.
+        Raises CircuitOpenError while OpenAI is unavailable.
+
+        :param processed_image: The output of preprocess_image if the caller already
+            ran it (e.g. on a CPU pool), or None to preprocess here
+        """
+        try:
+            # ✅ Reuse an earlier result for the same image
+            fingerprint = None
+            if self.cache is not None:
+                cached, fingerprint = self.cache.lookup(self.cache_kind, file_unique_id, image_bytes)
+                if cached:
+                    logger.debug("Extraction cache hit")
+                    return cached
+
+            self.ensure_openai_available()
+            if self.engine == "local":
+                # ✅ Offline: run easyocr on this machine
+                extracted_text = self.local_engine.read_text(image_bytes)
+            else:
+                # ✅ Step 2: Preprocess the image in memory
+                if processed_image is None:
+                    processed_image = self.preprocess_image(image_bytes)
+
+                # ✅ Step 3: Send the processed image to the OpenAI Vision API
+                extracted_text = self.get_text_from_openai(processed_image)
+
+            if extracted_text:
+                logger.debug("%s %s", self.EXTRACTED_LABEL, extracted_text)
+                self.cache_result(extracted_text, file_unique_id, fingerprint)
+                return extracted_text
+            else:
+                raise ValueError(self.NO_TEXT_MESSAGE)
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            self.report_error(f"Error during OCR processing: {str(e)}")
+            return ""
+
+    def extract_texts_from_bytes(self, images_bytes, file_unique_ids=None, processed_images=None):
+        """
+        Extracts text from several downloaded images, e.g. the images of an album.
+        The local engine runs easyocr over the images in batches; the OpenAI engine
+        packs several images into each Vision API request. Returns one string per
+        image ("" on failure). Raises CircuitOpenError while OpenAI is unavailable.
+
+        :param processed_images: The output of preprocess_image for each image if the
+            caller already ran it, or None to preprocess here
+        """
+        if self.engine != "local":
+            return self.extract_texts_with_openai(images_bytes, file_unique_ids, processed_images)
+
+        self.ensure_openai_available()
+        try:
+            extracted_texts = self.local_engine.read_texts(images_bytes)
+            logger.debug("%s %s", self.EXTRACTED_LABEL, extracted_texts)
+            return extracted_texts
+        except Exception as e:
+            self.report_error(f"Error during OCR processing: {str(e)}")
+            return [""] * len(images_bytes)
+
+    def extract_texts_with_openai(self, images_bytes, file_unique_ids=None, processed_images=None):
+        """
+        Extracts text from several images with batched Vision API requests.
+        Cached images are answered from the cache; the rest are preprocessed and
+        sent in batches sized by max_batch_images / max_batch_bytes.
+        """
+        file_unique_ids = file_unique_ids or [None] * len(images_bytes)
+        results, fingerprints, pending = self.lookup_images(images_bytes, file_unique_ids, processed_images)
+        if pending:
+            self.ensure_openai_available()
+        texts = extract_in_batches(
+            [processed for _, processed in pending],
+            self.get_texts_from_openai_batch,
+            self.get_text_from_openai,
+            max_images=self.max_batch_images,
+            max_bytes=self.max_batch_bytes
+        )
+        self.store_texts(results, pending, texts, file_unique_ids, fingerprints)
+        return results
+
+    def lookup_images(self, images_bytes, file_unique_ids, processed_images=None, fingerprints=None):
+        """
+        Answers the cached images of a batch and preprocesses the others.
+
+        :param fingerprints: The cache fingerprint of each image if the caller already computed it, or None
+        :return: (one text per image, "" where not cached; fingerprints; [(index, processed image)] to extract)
+        """
+        processed_images = processed_images or [None] * len(images_bytes)
+        fingerprints = list(fingerprints or [None] * len(images_bytes))
+        results = [""] * len(images_bytes)
+        pending = []
+
+        for index, (image_bytes, file_unique_id) in enumerate(zip(images_bytes, file_unique_ids)):
+            try:
+                if self.cache is not None:
+                    cached, fingerprints[index] = self.cache.lookup(
+                        self.cache_kind, file_unique_id, image_bytes, fingerprints[index]
+                    )
+                    if cached:
+                        results[index] = cached
+                        continue
+                processed = processed_images[index]
+                pending.append((index, processed if processed is not None else self.preprocess_image(image_bytes)))
+            except Exception as e:
+                print(f"Error preparing image {index + 1}: {e}")
+        return results, fingerprints, pending
+
+    def store_texts(self, results, pending, texts, file_unique_ids, fingerprints):
+        """
+        Fills in and caches the texts extracted for the pending images of lookup_images.
+        """
+        for (index, _), extracted_text in zip(pending, texts):
+            if not extracted_text:
+                continue
+            results[index] = extracted_text
+            self.cache_result(extracted_text, file_unique_ids[index], fingerprints[index])
+
+        logger.debug("%s %s", self.EXTRACTED_LABEL, results)
+
+    def vision_payload(self, image_bytes):
+        """
+        Vision API request payload for one preprocessed image.
+        With STRUCTURED_OUTPUTS the reply is constrained to the record schema.
+        """
+        payload = {
+            "model": get_model_router().model(f"vision_{self.KIND}"),
+            "messages": [
+                {"role": "system", "content": self.VISION_SYSTEM_PROMPT},
+                {"role": "user", "content": [
+                    {"type": "text", "text": self.VISION_PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{self.encode_image(image_bytes)}"}}
+                ]}
+            ],
+            "max_tokens": 2000,
+        }
+        if STRUCTURED_OUTPUTS:
+            payload["response_format"] = response_format(self.KIND)
+        return payload
+
+    def get_text_from_openai(self, image_bytes):
+        """
+        Uses the OpenAI Vision API to extract text from an image.
+        With a hedger the reply is streamed, and a slow request is duplicated.
+        CircuitOpenError is raised; other errors are reported and return None.
+        """
+        try:
+            if self.hedger is not None:
+                return self.hedger.call(lambda cancel: self.collect_streamed_text(image_bytes, cancel))
+            response = chat_completion_with_continuation(**self.vision_payload(image_bytes))
+
+            extracted_text = response["choices"][0]["message"]["content"]
+            return extracted_text
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"OpenAI Vision API Error: {e}")
+            return None
+
+    def collect_streamed_text(self, image_bytes, cancel):
+        """
+        Reads a streamed Vision API reply into one string. Stops and closes the
+        connection as soon as `cancel` is set, e.g. when a hedged duplicate won.
+        """
+        parts = []
+        stream = get_llm_client().stream_chat_completion(**self.vision_payload(image_bytes))
+        try:
+            for delta in stream:
+                if cancel.is_set():
+                    raise HedgeCancelled()
+                parts.append(delta)
+        finally:
+            stream.close()
+        return "".join(parts)
+
+    def stream_text_from_openai(self, image_bytes, on_record):
+        """
+        Streams the Vision API reply for one preprocessed image and calls
+        on_record(record) for every record object as soon as it is complete.
+
+        :return: The whole reply text
+        """
+        scanner = IncrementalObjectScanner()
+        for delta in get_llm_client().stream_chat_completion(**self.vision_payload(image_bytes)):
+            for record in scanner.feed(delta):
+                on_record(record)
+        return scanner.text
+
+    def batch_payload(self, images_bytes):
+        """
+        Vision API request payload for several preprocessed images.
+        Each image is labelled so the response can attribute results per image.
+        """
+        content = [{"type": "text", "text": self.VISION_PROMPT + batch_instructions(len(images_bytes))}]
+        for number, image_bytes in enumerate(images_bytes, start=1):
+            content.append({"type": "text", "text": f"Image {number}"})
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{self.encode_image(image_bytes)}"}})
+
+        return {
+            "model": get_model_router().model(f"vision_{self.KIND}"),
+            "messages": [
+                {"role": "system", "content": self.VISION_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            "max_tokens": min(4096, 2000 * len(images_bytes)),
+        }
+
+    def get_texts_from_openai_batch(self, images_bytes):
+        """
+        Sends several preprocessed images in one Vision API request.
+        Errors are raised (not swallowed) so the caller can split the batch.
+        """
+        response = chat_completion_with_continuation(**self.batch_payload(images_bytes))
+        return response["choices"][0]["message"]["content"]
+
+    def encode_image(self, image_bytes):
+        """
+        Encodes image bytes as a Base64 string.
+        """
+        return base64.b64encode(image_bytes).decode("utf-8")
+
+    def accumulate_text(self, extracted_text, accumulator, lock=None):
+        """
+        Structures extracted text and adds the records to the accumulator.
+        The structuring call runs without the lock, which is only held while
+        the records are appended, so other work on the chat does not queue
+        behind a network round-trip.
+
+        Raises CircuitOpenError when nothing could be structured because OpenAI is unavailable.
+
+        :param lock: The chat's lock, held while the accumulator is updated
+        :return: Number of records added
+        """
+        try:
+            records = self.structure_records(extracted_text)
+            if not records:
+                self.ensure_openai_available()
+            with lock or nullcontext():
+                self.append_records(accumulator, records)
+            return len(records)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"{self.ACCUMULATE_ERROR}: {e}")
+            self.bot.send_message(self.group_chat_id, f"{self.ACCUMULATE_ERROR}: {e}")
+            return 0
+
+    def stream_records_from_bytes(self, image_bytes, accumulator, file_unique_id=None, lock=None, on_record=None,
+                                  processed_image=None):
+        """
+        Extracts records from a downloaded image and adds each one to the
+        accumulator as soon as its JSON object has streamed in, instead of
+        waiting for the whole Vision API reply before structuring starts.
+
+        Objects that do not match the record schema are structured on their own.
+        Cache hits, the local engine and replies without a complete object go
+        through accumulate_text as before. Raises CircuitOpenError while OpenAI
+        is unavailable.
+
+        :param accumulator: The chat's question data (MCQ) or list of points records
+        :param lock: Held while the accumulator is updated
+        :param on_record: Called with the running count after records are added
+        :param processed_image: The output of preprocess_image if the caller already ran it, or None
+        :return: Number of records added
+        """
+        lock = lock or nullcontext()
+        added = 0
+
+        def add_records(records):
+            nonlocal added
+            with lock:
+                self.append_records(accumulator, records)
+            added += len(records)
+            if records and on_record:
+                on_record(added)
+
+        def handle_record(record):
+            if self.is_record(record):
+                add_records([record])
+                return
+            print(f"Streamed object does not match the {self.KIND} schema, structuring it separately.")
+            add_records(self.structure_object(record))
+
+        def accumulate_text(extracted_text):
+            nonlocal added
+            added = self.accumulate_text(extracted_text, accumulator, lock)
+            if added and on_record:
+                on_record(added)
+            return added
+
+        cached, fingerprint = None, None
+        if self.engine != "local" and self.cache is not None:
+            cached, fingerprint = self.cache.lookup(self.cache_kind, file_unique_id, image_bytes)
+        if self.engine == "local" or cached:
+            return accumulate_text(cached or self.extract_text_from_bytes(image_bytes, file_unique_id, processed_image))
+
+        self.ensure_openai_available()
+        try:
+            if processed_image is None:
+                processed_image = self.preprocess_image(image_bytes)
+            extracted_text = self.stream_text_from_openai(processed_image, handle_record)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            self.report_error(f"Error during OCR processing: {str(e)}")
+            return added
+
+        logger.debug("%s %s", self.EXTRACTED_LABEL, extracted_text)
+        self.cache_result(extracted_text, file_unique_id, fingerprint)
+        if not added and extracted_text:
+            # No complete record object streamed in; structure the whole reply
+            return accumulate_text(extracted_text)
+        return added
+
+    # asyncio counterparts of the network stages, awaited by the asyncio bot
+
+    def prepare_image(self, image_bytes):
+        """
+        CPU work done before a Vision API request: the cache fingerprint of the
+        image and its preprocessed version. Lets an asyncio caller run both on a
+        CPU pool and keep the event loop for the request itself.
+
+        :return: (ImageFingerprint or None, processed image bytes)
+        """
+        fingerprint = self.cache.fingerprint(image_bytes) if self.cache is not None else None
+        return fingerprint, self.preprocess_image(image_bytes)
+
+    async def async_report_error(self, error_message):
+        """
+        report_error from the event loop. The handlers' Telegram client is
+        synchronous, so the (rare) error report is sent from a worker thread.
+        """
+        await asyncio.to_thread(self.report_error, error_message)
+
+    async def async_extract_text_from_bytes(self, image_bytes, file_unique_id=None, processed_image=None,
+                                            fingerprint=None):
+        """
+        asyncio counterpart of extract_text_from_bytes for the OpenAI engine: the
+        Vision API request is awaited. Raises CircuitOpenError while OpenAI is unavailable.
+
+        :param processed_image: The output of preprocess_image (see prepare_image), or None to preprocess here
+        :param fingerprint: The cache fingerprint of the image (see prepare_image), or None to compute it here
+        """
+        try:
+            if self.cache is not None:
+                cached, fingerprint = self.cache.lookup(self.cache_kind, file_unique_id, image_bytes, fingerprint)
+                if cached:
+                    logger.debug("Extraction cache hit")
+                    return cached
+
+            self.ensure_openai_available()
+            if processed_image is None:
+                processed_image = self.preprocess_image(image_bytes)
+            extracted_text = await self.async_get_text_from_openai(processed_image)
+
+            if extracted_text:
+                logger.debug("%s %s", self.EXTRACTED_LABEL, extracted_text)
+                self.cache_result(extracted_text, file_unique_id, fingerprint)
+                return extracted_text
+            else:
+                raise ValueError(self.NO_TEXT_MESSAGE)
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            await self.async_report_error(f"Error during OCR processing: {str(e)}")
+            return ""
+
+    async def async_extract_texts_with_openai(self, images_bytes, file_unique_ids=None, processed_images=None,
+                                              fingerprints=None):
+        """
+        asyncio counterpart of extract_texts_with_openai; the batches are sent concurrently.
+
+        :param fingerprints: The cache fingerprint of each image (see prepare_image), or None
+        """
+        file_unique_ids = file_unique_ids or [None] * len(images_bytes)
+        results, fingerprints, pending = self.lookup_images(
+            images_bytes, file_unique_ids, processed_images, fingerprints
+        )
+        if pending:
+            self.ensure_openai_available()
+        texts = await async_extract_in_batches(
+            [processed for _, processed in pending],
+            self.async_get_texts_from_openai_batch,
+            self.async_get_text_from_openai,
+            max_images=self.max_batch_images,
+            max_bytes=self.max_batch_bytes
+        )
+        self.store_texts(results, pending, texts, file_unique_ids, fingerprints)
+        return results
+
+    async def async_get_text_from_openai(self, image_bytes):
+        """
+        asyncio counterpart of get_text_from_openai. With a hedger a slow request
+        is duplicated and the request that loses is cancelled.
+        """
+        try:
+            if self.hedger is not None:
+                return await self.hedger.async_call(lambda: self.async_collect_streamed_text(image_bytes))
+            response = await async_chat_completion_with_continuation(**self.vision_payload(image_bytes))
+            return response["choices"][0]["message"]["content"]
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"OpenAI Vision API Error: {e}")
+            return None
+
+    async def async_collect_streamed_text(self, image_bytes):
+        """
+        Reads a streamed Vision API reply into one string. Cancelling the
+        awaiting task closes the connection.
+        """
+        parts = []
+        async for delta in get_async_llm_client().stream_chat_completion(**self.vision_payload(image_bytes)):
+            parts.append(delta)
+        return "".join(parts)
+
+    async def async_stream_text_from_openai(self, image_bytes, on_record):
+        """
+        asyncio counterpart of stream_text_from_openai; on_record is a coroutine function.
+        """
+        scanner = IncrementalObjectScanner()
+        async for delta in get_async_llm_client().stream_chat_completion(**self.vision_payload(image_bytes)):
+            for record in scanner.feed(delta):
+                await on_record(record)
+        return scanner.text
+
+    async def async_get_texts_from_openai_batch(self, images_bytes):
+        """
+        asyncio counterpart of get_texts_from_openai_batch.
+        """
+        response = await async_chat_completion_with_continuation(**self.batch_payload(images_bytes))
+        return response["choices"][0]["message"]["content"]
+
+    async def async_accumulate_text(self, extracted_text, accumulator, lock=None):
+        """
+        asyncio counterpart of accumulate_text: the structuring call is awaited
+        and the lock is only taken to append the records.
+        """
+        try:
+            records = await self.async_structure_records(extracted_text)
+            if not records:
+                self.ensure_openai_available()
+            with lock or nullcontext():
+                self.append_records(accumulator, records)
+            return len(records)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            await self.async_report_error(f"{self.ACCUMULATE_ERROR}: {e}")
+            return 0
+
+    async def async_stream_records_from_bytes(self, image_bytes, accumulator, file_unique_id=None, lock=None,
+                                              on_record=None, processed_image=None, fingerprint=None):
+        """
+        asyncio counterpart of stream_records_from_bytes for the OpenAI engine.
+        on_record is called on the event loop.
+
+        :param fingerprint: The cache fingerprint of the image (see prepare_image), or None
+        """
+        lock = lock or nullcontext()
+        added = 0
+
+        def add_records(records):
+            nonlocal added
+            with lock:
+                self.append_records(accumulator, records)
+            added += len(records)
+            if records and on_record:
+                on_record(added)
+
+        async def handle_record(record):
+            if self.is_record(record):
+                add_records([record])
+                return
+            print(f"Streamed object does not match the {self.KIND} schema, structuring it separately.")
+            add_records(await self.async_structure_object(record))
+
+        async def accumulate_text(extracted_text):
+            nonlocal added
+            added = await self.async_accumulate_text(extracted_text, accumulator, lock)
+            if added and on_record:
+                on_record(added)
+            return added
+
+        cached = None
+        if self.cache is not None:
+            cached, fingerprint = self.cache.lookup(self.cache_kind, file_unique_id, image_bytes, fingerprint)
+        if cached:
+            return await accumulate_text(cached)
+
+        self.ensure_openai_available()
+        try:
+            if processed_image is None:
+                processed_image = self.preprocess_image(image_bytes)
+            extracted_text = await self.async_stream_text_from_openai(processed_image, handle_record)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            await self.async_report_error(f"Error during OCR processing: {str(e)}")
+            return added
+
+        logger.debug("%s %s", self.EXTRACTED_LABEL, extracted_text)
+        self.cache_result(extracted_text, file_unique_id, fingerprint)
+        if not added and extracted_text:
+            # No complete record object streamed in; structure the whole reply
+            return await accumulate_text(extracted_text)
+        return added
+
+    # Hooks implemented by the handlers
+
+    def structure_records(self, extracted_text):
+        """
+        Structures extracted text into a list of records (may call OpenAI).
+        """
+        raise NotImplementedError
+
+    def structure_object(self, record):
+        """
+        Structures a streamed object that does not match the record schema.
+
+        :return: List of conforming records
+        """
+        raise NotImplementedError
+
+    async def async_structure_records(self, extracted_text):
+        """
+        asyncio counterpart of structure_records.
+        """
+        raise NotImplementedError
+
+    async def async_structure_object(self, record):
+        """
+        asyncio counterpart of structure_object.
+        """
+        raise NotImplementedError
+
+    def is_record(self, record):
+        raise NotImplementedError
+
+    def append_records(self, accumulator, records):
+        raise NotImplementedError
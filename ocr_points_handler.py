@@ -1,138 +1,92 @@
-import openai
-import cv2
-import os
-import requests
-import datetime
-import telebot
-from PIL import Image
-import easyocr
-from config import BOT_TOKEN, GROUP_CHAT_ID
-from validate_points_data import get_bullet_points_data  # Import the new function
+import json
+from ocr_base import BaseOCRHandler
+from validate_points_data import (  # Import the new function
+    async_get_bullet_points_data, get_bullet_points_data, is_points_record, parse_points_records
+)
 
+VISION_SYSTEM_PROMPT = "You are an AI expert that extracts key bullet points accurately."
 
-class OCRPointsHandler:
-    def __init__(self, bot, group_chat_id):
-        self.bot = bot
-        self.group_chat_id = group_chat_id
-        self.reader = easyocr.Reader(['en', 'hi'])  # Supports English and Hindi
+VISION_PROMPT = (
+    "Extract **key bullet points** from the given image."
+    "Do not extract explanations or unnecessary text."
+    "Maintain the exact structure and order of points."
+    "If a point is present in both Hindi and English, prioritize Hindi and ignore English."
+    "Extract **only meaningful information**, skipping irrelevant details."
+    "\n\n### **Expected Output Format (JSON)**:"
+    "\n```json"
+    "\n["
+    "\n  {"
+    "\n    \"title\": \"Title of the slide (if present)\","
+    "\n    \"points\": ["
+    "\n      \"• Point 1 exactly as in the image\","
+    "\n      \"• Point 2 exactly as in the image\","
+    "\n      \"• Point 3 exactly as in the image\""
+    "\n    ]"
+    "\n  }"
+    "\n]"
+    "\n```"
+)
 
-    def preprocess_image(self, image_path):
+
+class OCRPointsHandler(BaseOCRHandler):
+    """
+    Extracts bullet points from images. The shared pipeline lives in
+    BaseOCRHandler; this class adds the points prompts and structuring.
+    """
+    KIND = "points"
+    VISION_SYSTEM_PROMPT = VISION_SYSTEM_PROMPT
+    VISION_PROMPT = VISION_PROMPT
+    EXTRACTED_LABEL = "Extracted Points:"
+    NO_TEXT_MESSAGE = "No bullet points detected in the image."
+    ACCUMULATE_ERROR = "Error processing extracted bullet points"
+
+    def process_text_with_openai(self, extracted_text):
         """
-        Preprocesses image to enhance contrast and clarity for OCR.
+        Structures extracted text into bullet point records.
+        In single-pass mode a vision response that already is a valid JSON array of
+        points is used directly and the second OpenAI call is skipped.
         """
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)  
-        img = cv2.resize(img, (1080, 1080))  
-        img = cv2.GaussianBlur(img, (5, 5), 0)  
-        _, img = cv2.threshold(img, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)  
-        processed_path = "processed_" + image_path
-        cv2.imwrite(processed_path, img)
-        return processed_path
+        return self.single_pass_data(extracted_text) or get_bullet_points_data(extracted_text)
 
-    def extract_text_from_image(self, file_id):
+    async def async_process_text_with_openai(self, extracted_text):
         """
-        Extracts bullet points from an image using OpenAI Vision API.
+        asyncio counterpart of process_text_with_openai.
         """
-        local_file_path = None
-        try:
-            # ✅ Step 1: Get Image from Telegram
-            file_info = self.bot.get_file(file_id)
-            file_url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_info.file_path}"
-            local_file_path = f"temp_image_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-
-            # ✅ Step 2: Download Image
-            response = requests.get(file_url, stream=True)
-            response.raise_for_status()
-            with open(local_file_path, "wb") as f:
-                f.write(response.content)
+        return self.single_pass_data(extracted_text) or await async_get_bullet_points_data(extracted_text)
 
-            # ✅ Step 3: Preprocess Image
-            processed_image_path = self.preprocess_image(local_file_path)
-
-            # ✅ Step 4: Extract Bullet Points
-            extracted_text = self.get_text_from_openai(processed_image_path)
-            
-            if extracted_text:
-                print("Extracted Points:", extracted_text)
-                return extracted_text
-            else:
-                raise ValueError("No bullet points detected in the image.")
+    def single_pass_data(self, extracted_text):
+        """
+        The vision response as points records if single-pass mode can use it as-is, otherwise None.
+        """
+        if not self.single_pass:
+            return None
+        structured_data = parse_points_records(extracted_text)
+        if structured_data:
+            print("Vision response is valid points JSON, skipping the structuring call.")
+        return structured_data
 
-        except requests.exceptions.RequestException as e:
-            error_message = f"Failed to download file: {e}"
-            print(error_message)
-            self.bot.send_message(self.group_chat_id, error_message)
-            return ""
+    def accumulate_points(self, extracted_text, points_data, lock=None):
+        """
+        Accumulates extracted bullet points into points_data.
 
-        except Exception as e:
-            error_message = f"Error during OCR processing: {str(e)}"
-            print(error_message)
-            self.bot.send_message(self.group_chat_id, error_message)
-            return ""
+        :param lock: The chat's lock, held only while points_data is updated
+        """
+        self.accumulate_text(extracted_text, points_data, lock)
 
-        finally:
-            # Cleanup Temporary File
-            if local_file_path and os.path.exists(local_file_path):
-                os.remove(local_file_path)
+    def structure_records(self, extracted_text):
+        return self.process_text_with_openai(extracted_text)
 
-    def get_text_from_openai(self, image_path):
-        """
-        Uses OpenAI Vision API to extract **structured bullet points** from an image.
-        """
-        try:
-            with open(image_path, "rb") as image_file:
-                response = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are an AI expert that extracts key bullet points accurately."},
-                        {"role": "user", "content": [
-                            {"type": "text", "text": (
-                            "Extract **key bullet points** from the given image."
-                            "Do not extract explanations or unnecessary text."
-                            "Maintain the exact structure and order of points."
-                            "If a point is present in both Hindi and English, prioritize Hindi and ignore English."
-                            "Extract **only meaningful information**, skipping irrelevant details."
-                            "\n\n### **Expected Output Format (JSON)**:"
-                            "\n```json"
-                            "\n["
-                            "\n  {"
-                            "\n    \"title\": \"Title of the slide (if present)\","
-                            "\n    \"points\": ["
-                            "\n      \"• Point 1 exactly as in the image\","
-                            "\n      \"• Point 2 exactly as in the image\","
-                            "\n      \"• Point 3 exactly as in the image\""
-                            "\n    ]"
-                            "\n  }"
-                            "\n]"
-                            "\n```"
-                        )},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{self.encode_image(image_path)}"}}
-                        ]}
-                    ],
-                    max_tokens=2000
-                )
+    def structure_object(self, record):
+        return get_bullet_points_data(json.dumps(record, ensure_ascii=False))
 
-            extracted_text = response["choices"][0]["message"]["content"]
-            return extracted_text
+    async def async_structure_records(self, extracted_text):
+        return await self.async_process_text_with_openai(extracted_text)
 
-        except Exception as e:
-            print(f"OpenAI Vision API Error: {e}")
-            return None
+    async def async_structure_object(self, record):
+        return await async_get_bullet_points_data(json.dumps(record, ensure_ascii=False))
 
-    def encode_image(self, image_path):
-        """
-        Encodes an image file as a Base64 string.
-        """
-        import base64
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+    def is_record(self, record):
+        return is_points_record(record)
 
-    def accumulate_points(self, extracted_text, points_data):
-        """
-        Accumulates extracted bullet points into points_data.
-        """
-        try:
-            structured_data = get_bullet_points_data(extracted_text)  # Call new function
-            points_data.extend(structured_data)  # Append extracted points
-        except Exception as e:
-            print(f"Error in accumulating bullet points: {e}")
-            self.bot.send_message(self.group_chat_id, f"Error processing extracted bullet points: {e}")
+    def append_records(self, points_data, records):
+        points_data.extend(records)  # Append extracted points
@@ -0,0 +1,51 @@
+import os
+import threading
+
+# Languages used by the OCR handlers (English and Hindi)
+OCR_LANGUAGES = ("en", "hi")
+
+# Optional directory with pre-downloaded easyocr models. When set, models are
+# loaded from it and never downloaded at runtime.
+MODEL_DIRECTORY = os.environ.get("EASYOCR_MODEL_DIR")
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(languages=OCR_LANGUAGES, model_dir=MODEL_DIRECTORY, gpu=False):
+    """
+    Returns the process-wide easyocr Reader for the given languages.
+
+    The reader (and the easyocr import itself) is created on first use only and
+    shared by every handler afterwards, so the detection and recognition models
+    are loaded once per process instead of once per handler at startup.
+
+    :param languages: Iterable of easyocr language codes
+    :param model_dir: Directory holding the model files, or None for easyocr's default
+    :param gpu: Whether easyocr should use the GPU
+    """
+    key = (tuple(languages), model_dir, gpu)
+    reader = _readers.get(key)
+    if reader is not None:
+        return reader
+
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is None:
+            import easyocr
+
+            kwargs = {"gpu": gpu}
+            if model_dir:
+                kwargs["model_storage_directory"] = model_dir
+                kwargs["download_enabled"] = False
+            print(f"Loading easyocr models for {list(languages)}...")
+            reader = easyocr.Reader(list(languages), **kwargs)
+            _readers[key] = reader
+    return reader
+
+
+def loaded_readers():
+    """
+    Returns the keys of the readers loaded so far.
+    """
+    return list(_readers)
@@ -5,6 +5,12 @@ from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
+from deck_template import (
+    SLIDE_HEIGHT, TEACHER_TOKEN, TITLE_TOKEN, TOPIC_TOKEN, DeckTemplate, add_layout_placeholder, deck_output,
+    draw_on_layout, saved_deck, set_geometry
+)
+from pptx_stream_writer import StreamingDeckWriter, paragraph_xml, placeholder_shape_xml, slide_xml
+from text_layout import LINE_HEIGHT, fit_font_size, lines_height, wrap_lines
 
 # Constants for styling
 
@@ -28,71 +34,67 @@ MIN_FONT_SIZE = Pt(12)
 
 
 IMAGE_1_PATH = "logo.jpg"
+
+# Placeholder indexes of the MCQ slide layout
+QUESTION_NUMBER_IDX = 10
+QUESTION_IDX = 11
+OPTIONS_IDX = 12
+QUESTION_LEFT = Inches(7.5)
+QUESTION_TOP = Inches(1)
+QUESTION_WIDTH = Inches(6.3)
+
+# Text layout, in points
+QUESTION_TEXT_WIDTH = QUESTION_WIDTH.pt  # Question box has no margins
+OPTIONS_TEXT_WIDTH = Inches(6.1).pt  # Options box keeps the default 0.1" side margins
+QUESTION_MAX_HEIGHT = Inches(3).pt  # Question height the dynamic font size aims for
+QUESTION_FONT_SIZES = (36, 30, 24, 20, 16)
+OPTION_LINE_HEIGHT = LINE_HEIGHT * 1.2  # Options use 1.2 line spacing
+
 class PPTHandler:
-    def __init__(self):
+    def __init__(self, use_slide_master=True, streaming=False, in_memory=False):
+        """
+        :param use_slide_master: Render slides from a cached deck layout that holds the
+            nav bar, logo and text styles once, instead of drawing them on every slide
+        :param streaming: Write the slide XML straight into the .pptx zip one slide at a time
+            instead of building the deck with python-pptx (for very large decks; uses the deck layout)
+        :param in_memory: Return decks as BytesIO buffers named ppt_<timestamp>.pptx instead of saving files
+        """
         self.prs = Presentation()
         self.prs.slide_width = Inches(14)
         self.prs.slide_height = Inches(7.5)
+        self.use_slide_master = use_slide_master
+        self.streaming = streaming
+        self.in_memory = in_memory
 
     @staticmethod
     def _calculate_dynamic_font_size(text, max_font_size=Pt(36), min_font_size=Pt(16)):
         """
-        Dynamically calculate font size based on text length.
+        Dynamically calculate font size based on how the question wraps.
         
         :param text: Input text
         :param max_font_size: Maximum font size
         :param min_font_size: Minimum font size
-        :return: Appropriate font size
+        :return: Largest size at which the bold question fits the question box, or min_font_size
         """
-        # Basic length-based font size calculation
-        length = len(text)
-        
-        # Adjust font size based on text length
-        if length < 50:
-            return max_font_size  # Large font for short questions
-        elif length < 100:
-            return Pt(30)
-        elif length < 200:
-            return Pt(24)
-        elif length < 300:
-            return Pt(20)
-        else:
+        sizes = [size for size in QUESTION_FONT_SIZES if min_font_size.pt <= size <= max_font_size.pt]
+        if not sizes:
             return min_font_size
+        return Pt(fit_font_size(text, FONT_NAME, sizes, QUESTION_TEXT_WIDTH, QUESTION_MAX_HEIGHT, bold=True))
 
     @staticmethod
-    def wrap_text_to_fit(text, font_size=Pt(36), max_width=700):
+    def wrap_text_to_fit(text, font_size=Pt(36), max_width=QUESTION_TEXT_WIDTH, bold=False, line_spacing=LINE_HEIGHT):
         """
-        Wrap text to fit within specified width, with dynamic font sizing.
+        Wrap text to fit within specified width, using the font's glyph widths.
         
         :param text: Input text
-        :param font_size: Base font size 
+        :param font_size: Font size the text is shown at
         :param max_width: Maximum width in points
-        :return: Wrapped text with adjusted dimensions
+        :param bold: Whether the text is bold
+        :param line_spacing: Line height as a multiple of the font size
+        :return: Wrapped text and its height in points
         """
-        # Dynamically adjust font size based on text length
-        adjusted_font_size = PPTHandler._calculate_dynamic_font_size(text)
-        
-        words = text.split()
-        lines = []
-        current_line = ""
-        approx_char_width = adjusted_font_size.pt * 0.4  # Approximation of character width in points
-        
-        for word in words:
-            if (len(current_line) + len(word)) * approx_char_width > max_width:
-                lines.append(current_line.strip())
-                current_line = word
-            else:
-                current_line += " " + word if current_line else word
-        
-        if current_line:
-            lines.append(current_line.strip())
-
-        # Calculate line height with some extra spacing
-        line_height = adjusted_font_size.pt * 1.2
-        total_height = len(lines) * line_height
-
-        # Return wrapped text and adjust height calculation
-        return "\n".join(lines), total_height
+        lines = wrap_lines(text, FONT_NAME, font_size.pt, max_width, bold)
+        return "\n".join(lines), lines_height(len(lines), font_size.pt, line_spacing)
 
     def add_question_slide(prs, question_number, question, options, title, topic, teacher_name):
         """Add a slide for the question with improved sizing and positioning."""
@@ -106,8 +108,8 @@ class PPTHandler:
         PPTHandler.add_navigation_bar(slide, title, topic, teacher_name)
 
         # Determine question box dimensions dynamically
-        font_size = Pt(36)
-        wrapped_question, text_height = PPTHandler.wrap_text_to_fit(question, font_size=font_size, max_width=700)
+        font_size = PPTHandler._calculate_dynamic_font_size(question)
+        wrapped_question, text_height = PPTHandler.wrap_text_to_fit(question, font_size=font_size, bold=True)
         
         # Adjust box dimensions based on text height
         box_width = Inches(6.3)  # Default width for the box
@@ -148,8 +150,7 @@ class PPTHandler:
         question_paragraph.font.name = FONT_NAME
         
         # Dynamically adjust font size
-        dynamic_font_size = PPTHandler._calculate_dynamic_font_size(question)
-        question_paragraph.font.size = dynamic_font_size
+        question_paragraph.font.size = font_size
         question_paragraph.alignment = PP_ALIGN.LEFT
 
     
@@ -161,7 +162,8 @@ class PPTHandler:
             wrapped_option, option_height = PPTHandler.wrap_text_to_fit(
                 option, 
                 font_size=OPTION_FONT_SIZE,
-                max_width=600  # Slightly smaller than box width to ensure padding
+                max_width=OPTIONS_TEXT_WIDTH,
+                line_spacing=OPTION_LINE_HEIGHT
             )
             wrapped_options.append(wrapped_option)
             total_options_height += option_height + Pt(10).pt  # Add padding between options
@@ -195,14 +197,117 @@ class PPTHandler:
             option_paragraph.font.name = FONT_NAME
             option_paragraph.alignment = PP_ALIGN.LEFT
 
+    @staticmethod
+    def question_slide_metrics(question, options, slide_height=SLIDE_HEIGHT):
+        """
+        Wrapped text and box geometry of a question slide based on the deck layout.
+
+        :return: (wrapped question, question font size, question box (left, top, width, height),
+            wrapped options, options box (left, top, width, height))
+        """
+        font_size = PPTHandler._calculate_dynamic_font_size(question)
+        wrapped_question, text_height = PPTHandler.wrap_text_to_fit(question, font_size=font_size, bold=True)
+        question_height = Inches((text_height / 72) + 0.2)
+        question_geometry = (QUESTION_LEFT, QUESTION_TOP, QUESTION_WIDTH, question_height)
+
+        total_options_height = 0
+        wrapped_options = []
+        for option in options:
+            wrapped_option, option_height = PPTHandler.wrap_text_to_fit(
+                option, font_size=OPTION_FONT_SIZE, max_width=OPTIONS_TEXT_WIDTH, line_spacing=OPTION_LINE_HEIGHT
+            )
+            wrapped_options.append(wrapped_option)
+            total_options_height += option_height + Pt(10).pt
+
+        # Same placement as add_question_slide: below the question or centred, whichever is lower
+        min_options_top = QUESTION_TOP + question_height + Inches(1)
+        slide_middle = (slide_height - Inches(1)) / 2
+        options_top = max(min_options_top, slide_middle - Inches(total_options_height/72/2))
+        options_geometry = (QUESTION_LEFT, options_top, QUESTION_WIDTH, Inches(total_options_height/72 + 0.5))
+        return wrapped_question, font_size, question_geometry, wrapped_options, options_geometry
+
+    @staticmethod
+    def add_question_slide_from_layout(prs, layout, question_number, question, options):
+        """
+        Add a question slide based on the deck layout. The nav bar, logo, background
+        and text styles come from the layout, so the slide only stores its text,
+        the question's font size and the computed box positions.
+        """
+        slide = prs.slides.add_slide(layout)
+        wrapped_question, font_size, question_geometry, wrapped_options, options_geometry = (
+            PPTHandler.question_slide_metrics(question, options, prs.slide_height)
+        )
+
+        number_frame = slide.placeholders[QUESTION_NUMBER_IDX].text_frame
+        number_frame.add_paragraph().text = str(question_number) + "."
+
+        question_box = slide.placeholders[QUESTION_IDX]
+        set_geometry(question_box, *question_geometry)
+        question_paragraph = question_box.text_frame.add_paragraph()
+        question_paragraph.text = wrapped_question
+        question_paragraph.font.size = font_size
+
+        options_box = slide.placeholders[OPTIONS_IDX]
+        set_geometry(options_box, *options_geometry)
+        options_frame = options_box.text_frame
+        for wrapped_option in wrapped_options:
+            options_frame.add_paragraph().text = wrapped_option
+
+    @staticmethod
+    def question_slide_xml(question_number, question, options):
+        """
+        Slide XML of a question slide, identical to what add_question_slide_from_layout produces.
+        """
+        wrapped_question, font_size, question_geometry, wrapped_options, options_geometry = (
+            PPTHandler.question_slide_metrics(question, options)
+        )
+        empty = paragraph_xml("")
+        return slide_xml([
+            placeholder_shape_xml(1, QUESTION_NUMBER_IDX, [empty, paragraph_xml(str(question_number) + ".")]),
+            placeholder_shape_xml(2, QUESTION_IDX, [empty, paragraph_xml(wrapped_question, font_size)], question_geometry),
+            placeholder_shape_xml(
+                3, OPTIONS_IDX, [empty] + [paragraph_xml(option) for option in wrapped_options], options_geometry
+            ),
+        ])
+
+    def stream_presentation(self, data, title, topic, teacher_name):
+        """
+        Writes the MCQ deck with the streaming writer, one slide at a time.
+
+        :return: File name of the saved deck (BytesIO if in_memory), or None if there are no questions
+        """
+        questions = data["Question"]
+        all_options = data.get("Options", [])
+        if len(questions) == 0:
+            print("No data to generate PPT.")
+            return None
+
+        slides = (
+            PPTHandler.question_slide_xml(i + 1, question, all_options[i] if i < len(all_options) else [])
+            for i, question in enumerate(questions)
+        )
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"ppt_{timestamp}.pptx"
+        output = deck_output(filename, self.in_memory)
+        count = MCQ_DECK_WRITER.write(output, slides, title, topic, teacher_name)
+        print(f"Presentation saved as {filename} ({count} slides)")
+        return saved_deck(output)
+
     def create_custom_presentation(self, data, title, topic, teacher_name):
         """Create a custom PowerPoint presentation based on the provided data."""
         print("Generating New PPT...")
 
-        # Create a new PowerPoint presentation
-        prs = Presentation()
-        prs.slide_width = Inches(14)
-        prs.slide_height = Inches(7.5)
+        if self.streaming:
+            return self.stream_presentation(data, title, topic, teacher_name)
+
+        if self.use_slide_master:
+            # Copy of the cached prototype, with the nav bar filled in once for the whole deck
+            prs, layout = MCQ_DECK_TEMPLATE.new_deck(title, topic, teacher_name)
+        else:
+            # Create a new PowerPoint presentation
+            prs = Presentation()
+            prs.slide_width = Inches(14)
+            prs.slide_height = Inches(7.5)
 
         question_count = len(data["Question"])
         year_count = len(data.get("Year", []))
@@ -222,16 +327,20 @@ class PPTHandler:
             print(f"Options: {options}")
 
             # Add Question Slide
-            PPTHandler.add_question_slide(prs, i + 1, question, options, title, topic, teacher_name)
+            if self.use_slide_master:
+                PPTHandler.add_question_slide_from_layout(prs, layout, i + 1, question, options)
+            else:
+                PPTHandler.add_question_slide(prs, i + 1, question, options, title, topic, teacher_name)
 
         # Ensure unique filename every time
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"ppt_{timestamp}.pptx"
 
-        prs.save(filename)
+        output = deck_output(filename, self.in_memory)
+        prs.save(output)
         print(f"Presentation saved as {filename}")
 
-        return filename  # Return the filename to be sent in Telegram bot
+        return saved_deck(output)  # Return the filename (or buffer) to be sent in Telegram bot
 
 
     def add_navigation_bar(slide,title,topic,teacher_name):
@@ -271,4 +380,28 @@ class PPTHandler:
         nav_right.text_frame.paragraphs[0].font.bold = True
         nav_right.text_frame.paragraphs[0].font.color.rgb = HEADER_TEXT_WHITE
         nav_right.text_frame.paragraphs[0].font.name = FONT_NAME
-        nav_right.text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
\ No newline at end of file
+        nav_right.text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
+
+
+def build_question_layout(prs, layout):
+    """
+    Adds the nav bar, logo and the question number, question and options
+    placeholders to the MCQ slide layout.
+    """
+    draw_on_layout(prs, layout, lambda slide: PPTHandler.add_navigation_bar(slide, TITLE_TOKEN, TOPIC_TOKEN, TEACHER_TOKEN))
+    add_layout_placeholder(
+        layout, QUESTION_NUMBER_IDX, "Question Number", Inches(6.3), Inches(1.3), Inches(0.7), Inches(0.9),
+        FONT_NAME, Pt(30), RGBColor(255, 255, 255), bold=True, align="r", fill=RGBColor(255, 0, 0), wrap="none"
+    )
+    add_layout_placeholder(
+        layout, QUESTION_IDX, "Question", QUESTION_LEFT, QUESTION_TOP, QUESTION_WIDTH, Inches(1),
+        FONT_NAME, Pt(36), QUESTION_TEXT_COLOR, bold=True, margins=(0, 0, 0, 0)
+    )
+    add_layout_placeholder(
+        layout, OPTIONS_IDX, "Options", QUESTION_LEFT, Inches(3.5), QUESTION_WIDTH, Inches(3),
+        FONT_NAME, OPTION_FONT_SIZE, OPTION_TEXT_COLOR, line_spacing=1.2, space_after=Pt(10)
+    )
+
+
+MCQ_DECK_TEMPLATE = DeckTemplate(build_question_layout, background=BACKGROUND_COLOR)
+MCQ_DECK_WRITER = StreamingDeckWriter(MCQ_DECK_TEMPLATE)
\ No newline at end of file
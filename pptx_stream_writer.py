@@ -0,0 +1,173 @@
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from pptx import Presentation
+from deck_template import BLANK_LAYOUT_INDEX, TEACHER_TOKEN, TITLE_TOKEN, TOPIC_TOKEN
+
+# Slide parts are written with the same XML python-pptx produces for a slide based on the deck layout,
+# so streamed decks have the same parts, relationships and placeholders as decks saved with prs.save.
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+SLIDE_XML = (
+    XML_DECLARATION +
+    '<p:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<p:cSld><p:spTree><p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+    '<p:grpSpPr/>{shapes}</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>'
+)
+PLACEHOLDER_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="Text Placeholder {number}"/>'
+    '<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+    '<p:nvPr><p:ph type="body" idx="{idx}" sz="quarter"/></p:nvPr></p:nvSpPr>'
+    '{geometry}<p:txBody><a:bodyPr/><a:lstStyle/>{paragraphs}</p:txBody></p:sp>'
+)
+GEOMETRY_XML = '<p:spPr><a:xfrm><a:off x="{0}" y="{1}"/><a:ext cx="{2}" cy="{3}"/></a:xfrm></p:spPr>'
+SLIDE_RELS_XML = (
+    XML_DECLARATION +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout" '
+    'Target="../slideLayouts/{layout}"/></Relationships>'
+)
+SLIDE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+FIRST_SLIDE_ID = 256
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)  # Fixed entry dates, so the same deck always has the same bytes
+
+LINE_BREAKS = re.compile(r"[\n\v]")
+CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+RELATIONSHIP_ID = re.compile(r'Id="rId(\d+)"')
+
+
+def text_runs_xml(text):
+    """
+    Runs of a paragraph's text; line breaks become <a:br/> like python-pptx's paragraph.text.
+    """
+    runs = []
+    for number, line in enumerate(LINE_BREAKS.split(text)):
+        if number:
+            runs.append("<a:br/>")
+        if line:
+            line = CONTROL_CHARS.sub(lambda match: f"_x{ord(match.group()):04X}_", line)
+            runs.append(f"<a:r><a:t>{escape(line)}</a:t></a:r>")
+    return "".join(runs)
+
+
+def paragraph_xml(text, font_size=None):
+    """
+    XML of one paragraph. font_size (Pt) is set like python-pptx's paragraph.font.size.
+    """
+    properties = f'<a:pPr><a:defRPr sz="{int(font_size.pt * 100)}"/></a:pPr>' if font_size is not None else ""
+    runs = text_runs_xml(text)
+    if not properties and not runs:
+        return "<a:p/>"
+    return f"<a:p>{properties}{runs}</a:p>"
+
+
+def placeholder_shape_xml(number, idx, paragraphs, geometry=None):
+    """
+    XML of a slide placeholder inheriting its style from layout placeholder `idx`.
+
+    :param number: 1-based position of the placeholder on the slide (shape id is number + 1)
+    :param paragraphs: Paragraph XML strings (see paragraph_xml)
+    :param geometry: (left, top, width, height) overriding the layout's position, or None
+    """
+    return PLACEHOLDER_XML.format(
+        shape_id=number + 1,
+        number=number,
+        idx=idx,
+        geometry=GEOMETRY_XML.format(*(int(value) for value in geometry)) if geometry else "<p:spPr/>",
+        paragraphs="".join(paragraphs),
+    )
+
+
+def _write_part(archive, name, data):
+    info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    archive.writestr(info, data)
+
+
+def slide_xml(shapes):
+    """
+    XML of a slide part holding the given placeholder shapes.
+    """
+    return SLIDE_XML.format(shapes="".join(shapes))
+
+
+class StreamingDeckWriter:
+    def __init__(self, template):
+        """
+        Writes a deck straight into the .pptx zip one slide at a time.
+
+        The prototype of the DeckTemplate supplies every part but the slides;
+        slide parts are rendered from XML templates by the caller and written as
+        they are produced, so memory stays flat however many slides the deck has.
+        The presentation part, its relationships and the content types list the
+        slides and are written last, once the slide count is known.
+
+        :param template: DeckTemplate whose layout the slides use
+        """
+        self.template = template
+        self._layout_name = None
+
+    def layout_name(self):
+        """
+        File name of the deck layout part in the prototype, e.g. "slideLayout7.xml".
+        """
+        if self._layout_name is None:
+            prototype = Presentation(io.BytesIO(self.template.prototype_bytes()))
+            self._layout_name = prototype.slide_layouts[BLANK_LAYOUT_INDEX].part.partname.filename
+        return self._layout_name
+
+    def write(self, file, slides, title, topic, teacher_name):
+        """
+        Writes the deck to `file` (path or binary file object).
+
+        :param slides: Iterable of slide XML strings (see slide_xml), consumed lazily
+        :return: Number of slides written
+        """
+        layout_name = self.layout_name()
+        layout_part = f"ppt/slideLayouts/{layout_name}"
+        replacements = {TITLE_TOKEN: title, TOPIC_TOKEN: topic, TEACHER_TOKEN: teacher_name}
+        deferred_parts = ("[Content_Types].xml", "ppt/presentation.xml", "ppt/_rels/presentation.xml.rels")
+        slide_rels = SLIDE_RELS_XML.format(layout=layout_name)
+
+        with zipfile.ZipFile(io.BytesIO(self.template.prototype_bytes())) as prototype, \
+                zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info in prototype.infolist():
+                if info.filename in deferred_parts:
+                    continue
+                data = prototype.read(info.filename)
+                if info.filename == layout_part:
+                    text = data.decode("utf-8")
+                    for token, value in replacements.items():
+                        text = text.replace(token, escape(value))
+                    data = text.encode("utf-8")
+                _write_part(archive, info.filename, data)
+
+            count = 0
+            for count, xml in enumerate(slides, 1):
+                _write_part(archive, f"ppt/slides/slide{count}.xml", xml)
+                _write_part(archive, f"ppt/slides/_rels/slide{count}.xml.rels", slide_rels)
+
+            rels = prototype.read("ppt/_rels/presentation.xml.rels").decode("utf-8")
+            first_rid = max(int(rid) for rid in RELATIONSHIP_ID.findall(rels)) + 1
+            _write_part(archive, "ppt/_rels/presentation.xml.rels", rels.replace("</Relationships>", "".join(
+                f'<Relationship Id="rId{first_rid + n}" Type="{SLIDE_REL_TYPE}" Target="slides/slide{n + 1}.xml"/>'
+                for n in range(count)
+            ) + "</Relationships>"))
+
+            presentation = prototype.read("ppt/presentation.xml").decode("utf-8")
+            slide_ids = "".join(
+                f'<p:sldId id="{FIRST_SLIDE_ID + n}" r:id="rId{first_rid + n}"/>' for n in range(count)
+            )
+            _write_part(archive, "ppt/presentation.xml", presentation.replace(
+                "<p:sldIdLst/>", f"<p:sldIdLst>{slide_ids}</p:sldIdLst>" if count else "<p:sldIdLst/>"
+            ))
+
+            content_types = prototype.read("[Content_Types].xml").decode("utf-8")
+            _write_part(archive, "[Content_Types].xml", content_types.replace("</Types>", "".join(
+                f'<Override PartName="/ppt/slides/slide{n + 1}.xml" ContentType="{SLIDE_CONTENT_TYPE}"/>'
+                for n in range(count)
+            ) + "</Types>"))
+        return count
@@ -0,0 +1,274 @@
+import time
+import random
+import asyncio
+import threading
+
+# Process-wide OpenAI limits; set these to the account's tier limits
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 30000
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError", "Timeout", "APITimeoutError", "APIConnectionError",
+    "ServiceUnavailableError", "TryAgain", "InternalServerError",
+    "ConnectionError", "ConnectTimeout", "ReadTimeout", "ClientConnectionError", "ServerDisconnectedError",
+}
+IMAGE_TOKEN_ESTIMATE = 800  # Rough prompt tokens for one high-detail image
+
+
+class TokenBucket:
+    def __init__(self, capacity_per_minute, clock=time.monotonic):
+        """
+        Token bucket refilled continuously at capacity_per_minute / 60 per second.
+        """
+        self.capacity = float(capacity_per_minute)
+        self.rate = capacity_per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until `amount` tokens are available (0 if they are available now).
+        Requests larger than the capacity wait for a full bucket.
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Shared limiter for requests per minute and tokens per minute.
+
+        :param requests_per_minute: Request budget per minute
+        :param tokens_per_minute: Token budget (prompt + completion) per minute
+        :param clock: Monotonic time source
+        :param sleep: Sleep function, injectable for tests
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.retries = 0
+
+    def try_acquire(self, tokens):
+        """
+        Reserves one request and `tokens` tokens if they fit in the budget.
+
+        :return: 0 once reserved, otherwise the seconds to wait before trying again
+        """
+        with self._lock:
+            now = self.clock()
+            wait = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now),
+            )
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                return 0.0
+            self.throttled += 1
+            return wait
+
+    def acquire(self, tokens):
+        """
+        Blocks until one request and `tokens` tokens fit in the budget, then reserves them.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.sleep(wait)
+
+    async def async_acquire(self, tokens):
+        """
+        asyncio counterpart of acquire: waits on the event loop instead of blocking a thread.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Holds back every caller for `seconds`, e.g. after a 429 with Retry-After.
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def stats(self):
+        with self._lock:
+            return {"throttled": self.throttled, "retries": self.retries}
+
+
+def backoff_delay(attempt, base=BASE_BACKOFF_SECONDS, cap=MAX_BACKOFF_SECONDS):
+    """
+    Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2**attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def error_status(error):
+    """
+    HTTP status of an API error, if the client recorded one.
+    """
+    for attribute in ("http_status", "status_code", "status"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after_seconds(error):
+    """
+    Reads the Retry-After header (in seconds) from an API error, if present.
+    """
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def is_retryable(error):
+    return error_status(error) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def call_with_rate_limit(func, estimated_tokens, limiter=None, max_retries=MAX_RETRIES, breaker=None):
+    """
+    Calls func() within the shared rate limit, retrying throttling and transient
+    errors with exponential backoff and jitter. A Retry-After header from the API
+    takes precedence over the computed backoff and pauses all callers.
+
+    :param func: Zero-argument callable performing the API request
+    :param estimated_tokens: Tokens the request is expected to consume
+    :param breaker: CircuitBreaker checked before and told the outcome of every attempt;
+        an open circuit stops the retries immediately
+    """
+    limiter = limiter or get_rate_limiter()
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        limiter.acquire(estimated_tokens)
+        try:
+            result = func()
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+                if not breaker.is_closed():
+                    raise  # The dependency is down; waiting out a backoff would not help
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            retry_after = retry_after_seconds(e)
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            print(f"OpenAI request throttled or failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            if retry_after is not None or error_status(e) == 429:
+                limiter.pause(delay)
+            else:
+                limiter.sleep(delay)
+            with limiter._lock:
+                limiter.retries += 1
+            attempt += 1
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+async def async_call_with_rate_limit(func, estimated_tokens, limiter=None, max_retries=MAX_RETRIES, breaker=None):
+    """
+    asyncio counterpart of call_with_rate_limit; func is a coroutine function.
+    A cancelled call frees the breaker's half-open trial slot, since it ends
+    without telling whether the dependency is healthy.
+    """
+    limiter = limiter or get_rate_limiter()
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            await limiter.async_acquire(estimated_tokens)
+            result = await func()
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+                if not breaker.is_closed():
+                    raise  # The dependency is down; waiting out a backoff would not help
+            if not (is_retryable(e) or isinstance(e, asyncio.TimeoutError)) or attempt >= max_retries:
+                raise
+            retry_after = retry_after_seconds(e)
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            print(f"OpenAI request throttled or failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            if retry_after is not None or error_status(e) == 429:
+                limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+            with limiter._lock:
+                limiter.retries += 1
+            attempt += 1
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.release_trial()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+def estimate_request_tokens(messages, max_tokens):
+    """
+    Rough token estimate of a chat request: prompt characters / 3 (Hindi text is
+    token-dense), a fixed amount per image, plus the completion budget.
+    """
+    characters = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            characters += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    images += 1
+                else:
+                    characters += len(part.get("text", ""))
+    return characters // 3 + images * IMAGE_TOKEN_ESTIMATE + (max_tokens or 0)
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Returns the process-wide rate limiter.
+    """
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
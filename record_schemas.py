@@ -0,0 +1,189 @@
+import re
+import copy
+import json
+from json_scanner import extract_json_array, strip_code_fence
+
+# Send JSON schemas through the API's response_format (structured outputs)
+STRUCTURED_OUTPUTS = True
+
+MCQ_RECORD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "Question": {"type": "string"},  # Statements of statement-list questions stay in the text
+        "Options": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["Question", "Options"],
+    "additionalProperties": False,
+}
+
+POINTS_RECORD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "points": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["title", "points"],
+    "additionalProperties": False,
+}
+
+# Structured outputs need an object at the top level, so records are wrapped in one
+RESPONSE_KEYS = {"mcq": "questions", "points": "slides"}
+RECORD_SCHEMAS = {"mcq": MCQ_RECORD_SCHEMA, "points": POINTS_RECORD_SCHEMA}
+
+
+def response_schema(kind):
+    """
+    JSON schema of a whole structured response: {"questions": [...]} or {"slides": [...]}.
+    """
+    key = RESPONSE_KEYS[kind]
+    return {
+        "type": "object",
+        "properties": {key: {"type": "array", "items": RECORD_SCHEMAS[kind]}},
+        "required": [key],
+        "additionalProperties": False,
+    }
+
+
+def response_format(kind):
+    """
+    response_format payload asking the model for output matching the schema of `kind`.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": f"{kind}_records",
+            "strict": True,
+            "schema": response_schema(kind),
+        },
+    }
+
+
+def compile_schema(schema, path="$"):
+    """
+    Compiles a JSON schema (the subset used here: type, properties, required,
+    additionalProperties, items, minLength) into a validator function.
+
+    The schema is walked once up front; the returned function only runs the
+    checks, so validating many records stays cheap.
+
+    :return: Callable(value) -> list of error messages (empty when valid)
+    """
+    checks = []
+    expected_type = schema.get("type")
+    python_types = {"object": dict, "array": list, "string": str}
+
+    if expected_type in python_types:
+        python_type = python_types[expected_type]
+
+        def check_type(value, errors):
+            if not isinstance(value, python_type):
+                errors.append(f"{path}: expected {expected_type}")
+                return False
+            return True
+    else:
+        def check_type(value, errors):
+            return True
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+        checks.append(lambda value, errors: len(value.strip()) >= min_length
+                      or errors.append(f"{path}: shorter than {min_length}"))
+
+    if expected_type == "object":
+        properties = {
+            name: compile_schema(subschema, f"{path}.{name}")
+            for name, subschema in schema.get("properties", {}).items()
+        }
+        required = list(schema.get("required", []))
+        closed = schema.get("additionalProperties", True) is False
+
+        def check_object(value, errors):
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}: missing {name}")
+            for name, item in value.items():
+                validator = properties.get(name)
+                if validator is not None:
+                    errors.extend(validator(item))
+                elif closed:
+                    errors.append(f"{path}: unexpected {name}")
+        checks.append(check_object)
+
+    if expected_type == "array" and "items" in schema:
+        item_validator = compile_schema(schema["items"], f"{path}[]")
+
+        def check_items(value, errors):
+            for item in value:
+                errors.extend(item_validator(item))
+        checks.append(check_items)
+
+    def validate(value):
+        errors = []
+        if check_type(value, errors):
+            for check in checks:
+                check(value, errors)
+        return errors
+
+    return validate
+
+
+def lenient_record_schema(kind):
+    """
+    Record schema for locally validating replies produced without structured
+    outputs, where "title" may be omitted and extra keys appear. MCQ records may
+    carry the "Subpoints" list the structuring prompt asks for. Also rejects
+    empty questions (minLength is not accepted by strict mode, so it is only
+    checked locally).
+    """
+    schema = copy.deepcopy(RECORD_SCHEMAS[kind])
+    schema["required"] = ["Question", "Options"] if kind == "mcq" else ["points"]
+    if kind == "mcq":
+        schema["properties"]["Question"]["minLength"] = 1
+        schema["properties"]["Subpoints"] = {"type": "array", "items": {"type": "string"}}
+    schema["additionalProperties"] = True
+    return schema
+
+
+validate_mcq_record = compile_schema(lenient_record_schema("mcq"))
+validate_points_record = compile_schema(lenient_record_schema("points"))
+validate_mcq_response = compile_schema(response_schema("mcq"))
+validate_points_response = compile_schema(response_schema("points"))
+
+
+def unwrap_records(parsed, kind):
+    """
+    Returns the record list from a parsed reply, unwrapping the structured
+    {"questions": [...]} / {"slides": [...]} envelope when present.
+    """
+    key = RESPONSE_KEYS[kind]
+    if isinstance(parsed, dict) and isinstance(parsed.get(key), list):
+        return parsed[key]
+    if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], dict) and isinstance(parsed[0].get(key), list):
+        return parsed[0][key]
+    return parsed
+
+
+def extract_records(response_text, kind):
+    """
+    Returns the list of records in a reply, with or without the structured
+    envelope. A truncated envelope is opened up so the records that finished
+    can still be recovered by the JSON scanner.
+
+    :return: List of records, or None if none could be recovered
+    """
+    if not response_text:
+        return None
+    text = strip_code_fence(response_text)
+    try:
+        parsed = unwrap_records(json.loads(text), kind)
+        if isinstance(parsed, dict):
+            return [parsed]
+        if isinstance(parsed, list):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    envelope = re.match(r'\s*\{\s*"' + RESPONSE_KEYS[kind] + r'"\s*:\s*', text)
+    if envelope:
+        text = text[envelope.end():]
+    return extract_json_array(text)
@@ -0,0 +1,142 @@
+import os
+import json
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import chain
+from deck_template import deck_output, saved_deck
+from ppt_generator import MCQ_DECK_WRITER, PPTHandler
+from ai_presentation_generator import POINTS_DECK_WRITER, AIPresentationGenerator
+
+# Render service defaults
+RENDER_PROCESSES = os.cpu_count() or 2
+SPLIT_THRESHOLD = 400  # Records above which a deck is split into ranges rendered by separate workers
+RANGE_SIZE = 200  # Records per range of a split deck
+
+logger = logging.getLogger(__name__)
+
+
+def render_deck(ppt_type, data, title, topic, teacher_name, in_memory=False):
+    """
+    Renders a whole deck with python-pptx. Runs in a worker process.
+
+    :param in_memory: Return the deck as a named BytesIO (pickled back to the caller) instead of saving a file
+    :return: File name of the saved deck (BytesIO if in_memory), or None if there was nothing to render
+    """
+    if ppt_type == "mcq":
+        return PPTHandler(in_memory=in_memory).create_custom_presentation(data, title, topic, teacher_name)
+    return AIPresentationGenerator(in_memory=in_memory).create_presentation(data, title, topic, teacher_name)
+
+
+def render_slide_range(ppt_type, records, first_number):
+    """
+    Renders the slide XML of a range of records. Runs in a worker process.
+
+    :param records: (question, options) pairs for "mcq", titled points blocks for "points"
+    :param first_number: Question number of the first record
+    :return: List of slide XML strings
+    """
+    if ppt_type == "mcq":
+        return [
+            PPTHandler.question_slide_xml(first_number + i, question, options)
+            for i, (question, options) in enumerate(records)
+        ]
+    generator = AIPresentationGenerator(streaming=True)
+    # paginate starts a new slide for every titled block, so ranges of blocks paginate independently
+    return [generator.slide_xml(title_text, texts) for title_text, texts in generator.paginate(records)]
+
+
+def deck_records(ppt_type, data):
+    """
+    The records of a deck as a list: (question, options) pairs for "mcq", points blocks for "points".
+    """
+    if ppt_type == "mcq":
+        options = data.get("Options", [])
+        return [(question, options[i] if i < len(options) else []) for i, question in enumerate(data["Question"])]
+    if isinstance(data, str):
+        data = json.loads(data)
+    return data
+
+
+class RenderService:
+    def __init__(self, max_workers=RENDER_PROCESSES, split_threshold=SPLIT_THRESHOLD, range_size=RANGE_SIZE,
+                 in_memory=False):
+        """
+        Renders decks on a process pool, so decks of different chats render in
+        parallel instead of queueing on the GIL.
+
+        Decks up to split_threshold records are rendered whole by one worker with
+        python-pptx. Bigger decks are split into ranges of range_size records whose
+        slide XML is rendered by separate workers and merged in order into one zip
+        by the streaming writer.
+
+        :param max_workers: Worker processes
+        :param split_threshold: Records above which a deck is split (None never splits)
+        :param range_size: Records per range of a split deck
+        :param in_memory: Return decks as named BytesIO buffers instead of saving files
+        """
+        self.max_workers = max_workers
+        self.split_threshold = split_threshold
+        self.range_size = range_size
+        self.in_memory = in_memory
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Started on first use, so importing the bot does not start workers. Workers are
+        # spawned, not forked: the bot's polling and pool threads may hold locks at fork time.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def render(self, ppt_type, data, title, topic, teacher_name):
+        """
+        Renders a deck and blocks until it is saved. Safe to call from several threads.
+
+        :param ppt_type: "mcq" or "points"
+        :param data: Question data ({"Question", "Options"}) for "mcq", points blocks for "points"
+        :return: File name of the saved deck (BytesIO if in_memory), or None if there was nothing to render
+        """
+        records = deck_records(ppt_type, data)
+        if self.split_threshold is None or len(records) <= self.split_threshold:
+            return self.executor.submit(
+                render_deck, ppt_type, data, title, topic, teacher_name, self.in_memory
+            ).result()
+        return self.render_split(ppt_type, records, title, topic, teacher_name)
+
+    def render_split(self, ppt_type, records, title, topic, teacher_name):
+        """
+        Renders ranges of the deck in parallel and merges them into one file.
+        """
+        ranges = [
+            self.executor.submit(render_slide_range, ppt_type, records[start:start + self.range_size], start + 1)
+            for start in range(0, len(records), self.range_size)
+        ]
+        logger.debug("Rendering %d records in %d ranges", len(records), len(ranges))
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        if ppt_type == "mcq":
+            filename, writer = f"ppt_{timestamp}.pptx", MCQ_DECK_WRITER
+        else:
+            filename, writer = f"final_presentation_{timestamp}.pptx", POINTS_DECK_WRITER
+        # Ranges are written in order as they finish; later ranges keep rendering meanwhile
+        output = deck_output(filename, self.in_memory)
+        count = writer.write(output, chain.from_iterable(future.result() for future in ranges), title, topic, teacher_name)
+        if count == 0:
+            if not self.in_memory:
+                os.remove(filename)
+            return None
+        logger.debug("Presentation saved as %s (%d slides)", filename, count)
+        return saved_deck(output)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Defaults for the per-chat session store
+MAX_SESSIONS = 500  # Upper bound on chats kept in memory
+SESSION_TTL_SECONDS = 6 * 60 * 60  # Drop chats idle for more than 6 hours
+
+
+def default_presentation_settings():
+    """Returns a fresh copy of the default presentation settings."""
+    return {
+        "title": "NEXT LEVEL ACADEMY",
+        "topic": "General Questions",
+        "teacher_name": "Instructor",
+        "ppt_type": "mcq"
+    }
+
+
+class ChatSession:
+    def __init__(self, chat_id):
+        """
+        Holds the accumulated data and presentation settings of a single chat.
+        """
+        self.chat_id = chat_id
+        self.question_data = {"Question": [], "Options": [], "Points": []}
+        self.presentation_settings = default_presentation_settings()
+        self.pending_input = None  # Setting awaiting a value (used by the asyncio bot)
+        self.deck = None  # Slides rendered so far (incremental_deck.IncrementalDeck)
+        self.last_access = time.monotonic()
+        self.lock = threading.RLock()  # Serialises handlers working on the same chat
+
+    def reset(self):
+        """
+        Clears the accumulated data and restores the default settings.
+        """
+        self.question_data = {key: [] for key in self.question_data}
+        self.presentation_settings = default_presentation_settings()
+        self.deck = None
+
+
+class SessionStore:
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS, clock=time.monotonic):
+        """
+        Stores one ChatSession per chat ID with LRU and idle-TTL eviction.
+
+        :param max_sessions: Maximum number of sessions kept in memory
+        :param ttl_seconds: Idle time after which a session is dropped (None disables the TTL)
+        :param clock: Monotonic time source, injectable for tests
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, chat_id):
+        """
+        Returns the session for a chat, creating it if needed, and marks it as recently used.
+        """
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(chat_id)
+            if session is not None:
+                self.hits += 1
+                self._sessions.move_to_end(chat_id)
+            else:
+                self.misses += 1
+                session = ChatSession(chat_id)
+                self._sessions[chat_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            session.last_access = now
+            return session
+
+    def peek(self, chat_id):
+        """
+        Returns the session for a chat without creating it or updating its recency.
+        """
+        with self._lock:
+            return self._sessions.get(chat_id)
+
+    def discard(self, chat_id):
+        """
+        Removes the session of a chat if present.
+        """
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+    def _expire(self, now):
+        """
+        Drops sessions idle for longer than the TTL. The OrderedDict is kept in
+        access order, so expired sessions are always at the front.
+        """
+        if self.ttl_seconds is None:
+            return
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl_seconds:
+                break
+            del self._sessions[chat_id]
+            self.expirations += 1
+
+    def stats(self):
+        """
+        Returns the store's counters.
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
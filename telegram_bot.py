@@ -8,32 +8,54 @@
 # class TelegramBot:
 #     def _init_(self):
 import telebot
-import requests
 from ocr import OCRHandler
 from config import BOT_TOKEN, GROUP_CHAT_ID
 from ppt_generator import PPTHandler
 from ai_presentation_generator import AIPresentationGenerator
 from ocr_points_handler import OCRPointsHandler 
+from session_store import SessionStore
+from hedging import get_vision_hedger
+from telegram_files import configure_telegram_timeouts, download_file_bytes, get_file_info
+from circuit_breaker import CircuitOpenError, breaker_summary
+from ocr_base import EXTRACTION_UNAVAILABLE
+from incremental_deck import finalise_deck, update_deck
+from render_service import RenderService
+from deck_archive import archive_deck
+from media_groups import MediaGroupBuffer, album_file, media_group_key
 
 class TelegramBot:
-    def __init__(self):
+    def __init__(self, ocr_engine="openai", stream_responses=False, hedge_requests=False, incremental_decks=True,
+                 render_pool=False, in_memory_decks=True):
         """
         Initializes the Telegram bot with OCR and PPT handlers.
+
+        :param ocr_engine: "openai" for the Vision API or "local" for offline easyocr
+        :param stream_responses: Stream Vision API replies and add each question as soon as it is complete
+        :param hedge_requests: Duplicate Vision API requests that are slower than usual
+        :param incremental_decks: Render slides in the background as data arrives, so "nextlevel" only writes the file
+        :param render_pool: Render full decks on a process pool, in parallel across chats.
+            Only applies with incremental_decks=False; combining it with incremental decks raises ValueError
+        :param in_memory_decks: Build decks in memory and upload them without writing files
+            (archived by content hash when DECK_ARCHIVE_DIR is set)
         """
+        configure_telegram_timeouts()
+        if render_pool and incremental_decks:
+            raise ValueError("render_pool only applies to full renders (incremental_decks=False)")
         self.bot = telebot.TeleBot(BOT_TOKEN)
-        self.ocr_handler = OCRHandler(self.bot, GROUP_CHAT_ID)  # MCQ Handler
-        self.ocr_points_handler = OCRPointsHandler(self.bot, GROUP_CHAT_ID)  # Points Handler
-        self.question_data = {"Question": [], "Options": [], "Points": []}  # Add Points Data
-        self.ppt_handler = PPTHandler()
-        self.bullet_points =AIPresentationGenerator()
-
-        # Default presentation settings
-        self.presentation_settings = {
-            "title": "NEXT LEVEL ACADEMY",
-            "topic": "General Questions",
-            "teacher_name": "Instructor",
-            "ppt_type":"mcq"
-        }
+        hedger = get_vision_hedger() if hedge_requests else None
+        self.ocr_handler = OCRHandler(self.bot, GROUP_CHAT_ID, engine=ocr_engine, hedger=hedger)  # MCQ Handler
+        self.ocr_points_handler = OCRPointsHandler(self.bot, GROUP_CHAT_ID, engine=ocr_engine, hedger=hedger)  # Points Handler
+        self.ppt_handler = PPTHandler(in_memory=in_memory_decks)
+        self.bullet_points =AIPresentationGenerator(in_memory=in_memory_decks)
+        self.stream_responses = stream_responses
+        self.incremental_decks = incremental_decks
+        self.in_memory_decks = in_memory_decks
+        self.render_service = RenderService(in_memory=in_memory_decks) if render_pool else None
+
+        # Per-chat question data and presentation settings
+        self.sessions = SessionStore()
+        # Albums are collected and extracted with batched requests
+        self.media_groups = MediaGroupBuffer(self.process_album)
         self.register_handlers()
 
 
@@ -41,42 +63,146 @@ class TelegramBot:
         """
         Generates a PowerPoint presentation from accumulated question data and sends it to the user.
         """
+        session = self.sessions.get(chat_id)
         try:
-            ppt_type = self.presentation_settings["ppt_type"]
-            if ppt_type == "mcq":
+            settings = session.presentation_settings
+            ppt_type = settings["ppt_type"]
+            if self.incremental_decks and ppt_type in ("mcq", "points"):
+                output_file = finalise_deck(session, self.in_memory_decks)
+                if not output_file:
+                    self.bot.send_message(chat_id, "No data available to generate the presentation.")
+                    return
+
+            elif self.render_service is not None and ppt_type in ("mcq", "points"):
+                data = session.question_data if ppt_type == "mcq" else session.question_data.get("Points", [])
+                output_file = self.render_service.render(
+                    ppt_type, data, settings["title"], settings["topic"], settings["teacher_name"]
+                )
+                if not output_file:
+                    self.bot.send_message(chat_id, "No data available to generate the presentation.")
+                    return
+
+            elif ppt_type == "mcq":
                 output_file = self.ppt_handler.create_custom_presentation(
-                    data=self.question_data,
-                    title=self.presentation_settings["title"],
-                    topic=self.presentation_settings["topic"],
-                    teacher_name=self.presentation_settings["teacher_name"],
+                    data=session.question_data,
+                    title=settings["title"],
+                    topic=settings["topic"],
+                    teacher_name=settings["teacher_name"],
                 )
 
             elif ppt_type == "points":
                 output_file = self.bullet_points.create_presentation(
-                    extracted_data=self.question_data.get("Points",[]),
-                    title=self.presentation_settings["title"],
-                    topic=self.presentation_settings["topic"],
-                    teacher_name=self.presentation_settings["teacher_name"]
+                    extracted_data=session.question_data.get("Points",[]),
+                    title=settings["title"],
+                    topic=settings["topic"],
+                    teacher_name=settings["teacher_name"]
                 )
             else:
                 self.bot.send_message(chat_id, "No data available to generate the presentation.")    
+                return
 
             # Send the generated presentation to the user
-            with open(output_file, "rb") as f:
-                self.bot.send_document(chat_id, f)
+            self.send_deck(chat_id, output_file)
 
-            # Clear question data after generating the presentation
-            self.question_data = {key: [] for key in self.question_data}
-            self.presentation_settings = {
-                "title": "NEXT LEVEL ACADEMY",
-                "topic": "General Questions",
-                "teacher_name": "Instructor"
-            }
+            # Clear this chat's data after generating the presentation
+            session.reset()
             self.bot.send_message(chat_id, "Presentation generated and sent successfully!")
             
         except Exception as e:
             self.bot.send_message(chat_id, f"Error generating the presentation: {str(e)}")
 
+    def send_deck(self, chat_id, output_file):
+        """
+        Sends a deck given as a file name, or as an in-memory buffer which is
+        uploaded directly and then archived.
+        """
+        if isinstance(output_file, str):
+            with open(output_file, "rb") as f:
+                self.bot.send_document(chat_id, f)
+            return
+        self.bot.send_document(chat_id, output_file)
+        archive_deck(output_file)
+
+    def update_deck(self, session):
+        """
+        Renders the slides for newly accumulated data in the background.
+        """
+        if self.incremental_decks:
+            update_deck(session)
+
+    def stream_image(self, chat_id, session, handler, image_bytes, file_unique_id=None):
+        """
+        Streams one image through OCR, adding each question or points block to the
+        chat's data as soon as it is complete. The user hears back at the first one
+        instead of after the whole reply.
+        """
+        ppt_type = session.presentation_settings["ppt_type"]
+        accumulator = session.question_data if ppt_type == "mcq" else session.question_data["Points"]
+        item = "question" if ppt_type == "mcq" else "slide"
+
+        notified = False
+
+        def on_record(count):
+            nonlocal notified
+            self.update_deck(session)
+            if not notified:
+                notified = True
+                self.bot.send_message(chat_id, f"First {item} extracted, reading the rest of the image...")
+
+        handler.stream_records_from_bytes(image_bytes, accumulator, file_unique_id, session.lock, on_record)
+        self.update_deck(session)  # Records added without on_record (cache hits, local engine)
+
+        if ppt_type == "mcq":
+            self.bot.send_message(chat_id, f"Data extracted and added to the presentation. Total questions: {len(session.question_data['Question'])}")
+        else:
+            self.bot.send_message(chat_id, f"Data extracted and added to the presentation. Total points: {len(session.question_data['Points'])}")
+
+    def process_album(self, messages):
+        """
+        Extracts the images of an album together: exact cache hits skip the download
+        and the rest go through the handler's batched extraction. Replies once.
+        """
+        chat_id = messages[0].chat.id
+        session = self.sessions.get(chat_id)
+        try:
+            ppt_type = session.presentation_settings["ppt_type"]
+            handler = {"mcq": self.ocr_handler, "points": self.ocr_points_handler}.get(ppt_type)
+            if handler is None:
+                self.bot.send_message(chat_id, "No text detected in the image. Please try another image.")
+                return
+            self.bot.send_message(chat_id, f"Received {len(messages)} images. Processing...")
+
+            extracted_texts = []
+            images_bytes, file_unique_ids = [], []
+            for message in messages:
+                album_image = album_file(message)
+                cached = handler.cached_text(album_image.file_unique_id)
+                if cached:
+                    extracted_texts.append(cached)
+                    continue
+                file_info = get_file_info(self.bot, album_image.file_id)
+                if not file_info or not file_info.file_path:
+                    continue
+                images_bytes.append(download_file_bytes(file_info.file_path))
+                file_unique_ids.append(album_image.file_unique_id)
+            if images_bytes:
+                extracted_texts.extend(handler.extract_texts_from_bytes(images_bytes, file_unique_ids))
+
+            accumulator = session.question_data if ppt_type == "mcq" else session.question_data["Points"]
+            for extracted_text in extracted_texts:
+                if extracted_text:
+                    handler.accumulate_text(extracted_text, accumulator, session.lock)
+            self.update_deck(session)
+
+            if ppt_type == "mcq":
+                self.bot.send_message(chat_id, f"All images processed. Total questions: {len(session.question_data['Question'])}")
+            else:
+                self.bot.send_message(chat_id, f"All images processed. Total points: {len(session.question_data['Points'])}")
+        except CircuitOpenError:
+            self.bot.send_message(chat_id, EXTRACTION_UNAVAILABLE)
+        except Exception as e:
+            self.bot.send_message(chat_id, f"Error processing images: {str(e)}")
+
     def register_handlers(self):
         """
         Registers message handlers for the Telegram bot.
@@ -135,13 +261,16 @@ class TelegramBot:
 
         @self.bot.message_handler(commands=['status'])
         def handle_status(message):
+            session = self.sessions.get(message.chat.id)
+            settings = session.presentation_settings
             status = (
                 "Current Settings:\n"
-                f"Title: {self.presentation_settings['title']}\n"
-                f"Topic: {self.presentation_settings['topic']}\n"
-                f"Teacher: {self.presentation_settings['teacher_name']}\n"
-                f"Type: {self.presentation_settings['ppt_type']}\n\n"
-                f"Questions added: {len(self.question_data['Question'])}"
+                f"Title: {settings['title']}\n"
+                f"Topic: {settings['topic']}\n"
+                f"Teacher: {settings['teacher_name']}\n"
+                f"Type: {settings['ppt_type']}\n\n"
+                f"Questions added: {len(session.question_data['Question'])}\n\n"
+                f"Services: {breaker_summary()}"
             )
             self.bot.reply_to(message, status)
 
@@ -152,36 +281,52 @@ class TelegramBot:
             """
             Handles image messages, processes the image using OCR, and updates the question data.
             """
+            if media_group_key(message) is not None:
+                self.media_groups.add(message)
+                return
+            session = self.sessions.get(message.chat.id)
             try:
                 photo = message.photo[-1]
                 file_id = photo.file_id
                 self.bot.send_message(message.chat.id, "Image received. Processing it now...")
-                file_info = self.bot.get_file(file_id)
-                if not file_info or not file_info.file_path:
-                    self.bot.send_message(message.chat.id, "Error: File information could not be retrieved. Please try again.")
-                    return
-
-                file_path = f"temp_{file_id}.jpg"
 
-                # Download the image
-                self._download_file(file_path, file_info.file_path)
-
-            
                 # Use the correct OCR handler
-                if self.presentation_settings["ppt_type"] == "mcq":
-                    extracted_data = self.ocr_handler.extract_text_from_image(file_id)
-                    self.ocr_handler.accumulate_questions(extracted_data, self.question_data)
-                    self.bot.send_message(message.chat.id, f"Data extracted and added to the presentation. Total questions: {len(self.question_data['Question'])}")
-
-                elif self.presentation_settings["ppt_type"] == "points":
-                    extracted_data = self.ocr_points_handler.extract_text_from_image(file_id)
-                    self.ocr_points_handler.accumulate_points(extracted_data, self.question_data["Points"])
-
-                    self.bot.send_message(message.chat.id, f"Data extracted and added to the presentation. Total points: {len(self.question_data['Points'])}")
-
-                    
-                else:
+                ppt_type = session.presentation_settings["ppt_type"]
+                handler = {"mcq": self.ocr_handler, "points": self.ocr_points_handler}.get(ppt_type)
+                if handler is None:
                     self.bot.send_message(message.chat.id, "No text detected in the image. Please try another image.")
+                    return
+
+                # Skip the download entirely when this exact file was processed before
+                extracted_data = handler.cached_text(photo.file_unique_id)
+                if not extracted_data:
+                    file_info = get_file_info(self.bot, file_id)
+                    if not file_info or not file_info.file_path:
+                        self.bot.send_message(message.chat.id, "Error: File information could not be retrieved. Please try again.")
+                        return
+
+                    # Download the image once and keep it in memory
+                    image_bytes = download_file_bytes(file_info.file_path)
+                    if self.stream_responses:
+                        self.stream_image(message.chat.id, session, handler, image_bytes, photo.file_unique_id)
+                        return
+                    extracted_data = handler.extract_text_from_bytes(image_bytes, photo.file_unique_id)
+
+                if ppt_type == "mcq":
+                    self.ocr_handler.accumulate_questions(extracted_data, session.question_data, session.lock)
+                    self.update_deck(session)
+                    self.bot.send_message(message.chat.id, f"Data extracted and added to the presentation. Total questions: {len(session.question_data['Question'])}")
+
+                elif ppt_type == "points":
+                    self.ocr_points_handler.accumulate_points(
+                        extracted_data, session.question_data["Points"], session.lock
+                    )
+                    self.update_deck(session)
+
+                    self.bot.send_message(message.chat.id, f"Data extracted and added to the presentation. Total points: {len(session.question_data['Points'])}")
+
+            except CircuitOpenError:
+                self.bot.send_message(message.chat.id, EXTRACTION_UNAVAILABLE)
             except Exception as e:
                 self.bot.send_message(message.chat.id, f"Error processing image: {str(e)}")
 
@@ -190,24 +335,32 @@ class TelegramBot:
             """
             Handles multiple image uploads, processes them using OCR, and updates the question data.
             """
+            if media_group_key(message) is not None:
+                self.media_groups.add(message)
+                return
+            session = self.sessions.get(message.chat.id)
             try:
                 self.bot.send_message(message.chat.id, "Received multiple images. Processing...")
-                for document in message.document:
-                    file_id = document.file_id
-                    file_info = self.bot.get_file(file_id)
-                    file_path = f"temp_{file_id}.jpg"
+                # Telegram delivers one document per message
+                document = message.document
+                extracted_data = self.ocr_handler.cached_text(document.file_unique_id)
+                if not extracted_data:
+                    file_info = get_file_info(self.bot, document.file_id)
 
-                    # Download and process the image
-                    self._download_file(file_path, file_info.file_path)
-                    extracted_data = self.ocr_handler.extract_text_from_image(file_path)
+                    # Download and process the image in memory
+                    image_bytes = download_file_bytes(file_info.file_path)
+                    extracted_data = self.ocr_handler.extract_text_from_bytes(image_bytes, document.file_unique_id)
 
-                    if extracted_data:
-                        self.ocr_handler.accumulate_questions(extracted_data)
+                if extracted_data:
+                    self.ocr_handler.accumulate_questions(extracted_data, session.question_data, session.lock)
+                    self.update_deck(session)
 
                 self.bot.send_message(
                     message.chat.id,
-                    f"All images processed. Total questions: {len(self.question_data['Question'])}"
+                    f"All images processed. Total questions: {len(session.question_data['Question'])}"
                 )
+            except CircuitOpenError:
+                self.bot.send_message(message.chat.id, EXTRACTION_UNAVAILABLE)
             except Exception as e:
                 self.bot.send_message(message.chat.id, f"Error processing images: {str(e)}")
 
@@ -222,53 +375,53 @@ class TelegramBot:
         """
         Saves the title and confirms it.
         """
-        self.presentation_settings["title"] = message.text.strip()
+        settings = self.sessions.get(message.chat.id).presentation_settings
+        settings["title"] = message.text.strip()
         self.bot.send_message(
             message.chat.id,
-            f"✅ Title set successfully: {self.presentation_settings['title']}"
+            f"✅ Title set successfully: {settings['title']}"
         )
 
     def save_topic(self, message):
         """
         Saves the topic and confirms it.
         """
-        self.presentation_settings["topic"] = message.text.strip()
+        settings = self.sessions.get(message.chat.id).presentation_settings
+        settings["topic"] = message.text.strip()
         self.bot.send_message(
             message.chat.id,
-            f"✅ Topic set successfully: {self.presentation_settings['topic']}"
+            f"✅ Topic set successfully: {settings['topic']}"
         )
 
     def save_teacher(self, message):
         """
         Saves the teacher's name and confirms it.
         """
-        self.presentation_settings["teacher_name"] = message.text.strip()
+        settings = self.sessions.get(message.chat.id).presentation_settings
+        settings["teacher_name"] = message.text.strip()
         self.bot.send_message(
             message.chat.id,
-            f"✅ Teacher's name set successfully: {self.presentation_settings['teacher_name']}"
+            f"✅ Teacher's name set successfully: {settings['teacher_name']}"
         )
 
     def save_type(self, message):
         """
         Saves the ppt's type and confirms it.
         """
-        self.presentation_settings["ppt_type"] = message.text.strip().lower()
+        settings = self.sessions.get(message.chat.id).presentation_settings
+        settings["ppt_type"] = message.text.strip().lower()
         self.bot.send_message(
             message.chat.id,
-            f"✅ PPT type set successfully: {self.presentation_settings['ppt_type'].upper()}"
+            f"✅ PPT type set successfully: {settings['ppt_type'].upper()}"
         ) 
          
 
-    def _download_file(self, save_path, file_path):
-        """
-        Downloads a file from Telegram's servers.
-        """
-        file_url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
-        with open(save_path, "wb") as f:
-            f.write(requests.get(file_url).content)
-
     def start(self):
         """
         Starts polling for Telegram bot updates.
         """
-        self.bot.polling(none_stop=True)
\ No newline at end of file
+        try:
+            self.bot.polling(none_stop=True)
+        finally:
+            if self.render_service is not None:
+                self.render_service.shutdown(wait=False)
\ No newline at end of file
@@ -0,0 +1,55 @@
+import requests
+from telebot import apihelper
+from config import BOT_TOKEN
+from circuit_breaker import get_breaker
+
+# Timeouts (seconds) for Telegram Bot API and file downloads
+TELEGRAM_CONNECT_TIMEOUT = 5
+TELEGRAM_READ_TIMEOUT = 30
+
+
+def configure_telegram_timeouts(connect_timeout=TELEGRAM_CONNECT_TIMEOUT, read_timeout=TELEGRAM_READ_TIMEOUT):
+    """
+    Applies the timeouts to Bot API calls made through telebot (get_file,
+    send_message, ...). telebot keeps them as module globals, so this is
+    called when a bot is constructed rather than on import.
+    """
+    apihelper.CONNECT_TIMEOUT = connect_timeout
+    apihelper.READ_TIMEOUT = read_timeout
+
+
+def file_url(file_path):
+    """
+    Builds the download URL of a file stored on Telegram's servers.
+    """
+    return f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
+
+
+def download_file_bytes(file_path):
+    """
+    Downloads a file from Telegram's servers and returns its content as bytes.
+    Fails fast with CircuitOpenError while Telegram is unhealthy.
+    """
+    def download():
+        response = requests.get(file_url(file_path), timeout=(TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT))
+        response.raise_for_status()
+        return response.content
+
+    return get_breaker("telegram").call(download)
+
+
+def get_file_info(bot, file_id):
+    """
+    Resolves a Telegram file ID through the "telegram" circuit breaker.
+    """
+    return get_breaker("telegram").call(bot.get_file, file_id)
+
+
+def fetch_file_bytes(bot, file_id):
+    """
+    Resolves a Telegram file ID and downloads the file into memory.
+    """
+    file_info = get_file_info(bot, file_id)
+    if not file_info or not file_info.file_path:
+        raise ValueError("File information could not be retrieved.")
+    return download_file_bytes(file_info.file_path)
@@ -0,0 +1,120 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_dependency_failure
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ConnectionError(Exception):
+    pass
+
+
+def make_breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, recovery_timeout=10, clock=clock)
+
+
+def unreachable():
+    raise ConnectionError()
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            breaker.call(unreachable)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker(FakeClock())
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = make_breaker(FakeClock())
+    fail(breaker, 2)
+    assert breaker.call(lambda: "ok") == "ok"
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 3)
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # The trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # A second caller while the trial runs
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens_the_circuit():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 3)
+    clock.now = 10
+    fail(breaker)
+    assert breaker.state == OPEN
+    clock.now = 19
+    assert breaker.state == OPEN
+    clock.now = 20
+    assert breaker.state == HALF_OPEN
+
+
+def test_ensure_available_does_not_take_the_trial():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    breaker.ensure_available()
+    fail(breaker, 3)
+    with pytest.raises(CircuitOpenError):
+        breaker.ensure_available()
+    clock.now = 10
+    breaker.ensure_available()
+    breaker.before_call()  # The trial is still available
+
+
+def test_client_errors_do_not_count_as_failures():
+    assert is_dependency_failure(HTTPError(503))
+    assert is_dependency_failure(ConnectionError())
+    assert not is_dependency_failure(HTTPError(400))
+    assert not is_dependency_failure(HTTPError(429))
+
+    breaker = make_breaker(FakeClock())
+    for _ in range(5):
+        breaker.record_error(HTTPError(400))
+    assert breaker.state == CLOSED
+
+
+def test_interrupted_trial_frees_the_slot():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 3)
+    clock.now = 10
+
+    def interrupted():
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+from hedging import HEDGE_MAX_DELAY, HedgedCaller, LatencyHistogram
+
+
+def make_caller(**kwargs):
+    return HedgedCaller(max_workers=4, **kwargs)
+
+
+def test_default_delay_until_enough_samples():
+    caller = make_caller(min_samples=5, default_delay=7.0)
+    for _ in range(4):
+        caller.histogram.record(0.5)
+    assert caller.hedge_delay() == 7.0
+
+
+def test_delay_follows_the_percentile_bucket():
+    caller = make_caller(min_samples=5, min_delay=0.0, percentile=0.5)
+    for seconds in (0.1, 0.1, 0.1, 3.0, 3.0):
+        caller.histogram.record(seconds)
+    assert caller.hedge_delay() == caller.histogram.percentile(0.5)
+    assert 0.1 <= caller.hedge_delay() < 0.2
+
+
+def test_delay_is_raised_to_the_minimum():
+    caller = make_caller(min_samples=1, min_delay=2.0)
+    caller.histogram.record(0.1)
+    assert caller.hedge_delay() == 2.0
+
+
+def test_overflow_bucket_is_clamped_to_a_finite_delay():
+    caller = make_caller(min_samples=1)
+    caller.histogram.record(10_000)
+    assert caller.histogram.percentile(0.95) == float("inf")
+    assert caller.hedge_delay() == HEDGE_MAX_DELAY
+
+    bounded = make_caller(min_samples=1, max_delay=30.0)
+    bounded.histogram.record(10_000)
+    assert bounded.hedge_delay() == 30.0
+
+
+def test_histogram_window_drops_old_samples():
+    histogram = LatencyHistogram(window=3)
+    for seconds in (100.0, 0.1, 0.1, 0.1):
+        histogram.record(seconds)
+    assert len(histogram) == 3
+    assert histogram.percentile(1.0) < 1.0
+
+
+def test_hedge_budget():
+    caller = make_caller(max_hedge_ratio=0.1)
+    caller.calls = 10
+    assert caller._may_hedge()  # One hedge of allowance
+    assert caller._may_hedge()  # 1 <= 0.1 * 10
+    assert not caller._may_hedge()
+    assert caller.over_budget == 1
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    caller = make_caller(default_delay=0.05)
+    first = threading.Event()
+    cancelled = threading.Event()
+
+    def attempt(cancel):
+        if not first.is_set():
+            first.set()
+            while not cancel.is_set():
+                time.sleep(0.01)
+            cancelled.set()
+            return "primary"
+        return "hedge"
+
+    assert caller.call(attempt) == "hedge"
+    assert cancelled.wait(1)
+    assert caller.stats()["hedge_wins"] == 1
+
+
+def test_fast_call_is_not_hedged():
+    caller = make_caller(default_delay=1.0)
+    assert caller.call(lambda cancel: "done") == "done"
+    assert caller.hedges == 0
+
+
+def test_slow_async_call_is_hedged_and_the_loser_cancelled():
+    caller = make_caller(default_delay=0.05)
+    started = []
+    cancelled = []
+
+    async def attempt():
+        started.append(True)
+        if len(started) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "primary"
+        return "hedge"
+
+    async def hedged_call():
+        result = await caller.async_call(attempt)
+        await asyncio.sleep(0)  # Let the loser handle its cancellation
+        return result
+
+    assert asyncio.run(hedged_call()) == "hedge"
+    assert cancelled == [True]
+    assert caller.stats()["hedge_wins"] == 1
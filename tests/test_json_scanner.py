@@ -0,0 +1,62 @@
+import time
+
+from json_scanner import IncrementalObjectScanner, extract_json_array, scan_json_objects
+
+
+def test_well_formed_array_is_parsed_directly():
+    assert extract_json_array('[{"Question": "q1"}, {"Question": "q2"}]') == [{"Question": "q1"}, {"Question": "q2"}]
+
+
+def test_code_fence_and_trailing_commas_are_repaired():
+    text = '```json\n[{"Question": "q1", "Options": ["a", "b",],},\n]\n```'
+    assert extract_json_array(text) == [{"Question": "q1", "Options": ["a", "b"]}]
+
+
+def test_truncated_array_keeps_finished_objects():
+    objects, complete = scan_json_objects('[{"Question": "q1"}, {"Question": "q2", "Opt')
+    assert objects == [{"Question": "q1"}]
+    assert not complete
+
+
+def test_brackets_inside_strings_do_not_close_objects():
+    objects, complete = scan_json_objects('[{"Question": "What is [x] } here?"}]')
+    assert objects == [{"Question": "What is [x] } here?"}]
+    assert complete
+
+
+def test_scanning_resumes_after_a_bracket_in_prose():
+    text = 'Note: the answer [1] is: [{"Question": "q1"}, {"Question": "q2"}]'
+    assert extract_json_array(text) == [{"Question": "q1"}, {"Question": "q2"}]
+
+
+def test_scanning_resumes_after_a_malformed_leading_object():
+    assert extract_json_array('See {this} first: [{"a": 1}]') == [{"a": 1}]
+
+
+def test_prose_without_objects_returns_none():
+    assert extract_json_array("No questions found [0]") is None
+
+
+def test_incremental_scanner_matches_whole_text_scan():
+    text = '{"questions": [{"Question": "q1", "Options": ["{a}"]}, {"Question": "q2"}]}'
+    scanner = IncrementalObjectScanner()
+    objects = []
+    for start in range(0, len(text), 7):
+        objects.extend(scanner.feed(text[start:start + 7]))
+    assert objects == [{"Question": "q1", "Options": ["{a}"]}, {"Question": "q2"}]
+    assert scanner.text == text
+
+
+def test_unclosed_prose_brackets_are_scanned_in_linear_time():
+    text = "[" * 50000 + '[{"Question": "q1"}]'
+    start = time.perf_counter()
+    objects, complete = scan_json_objects(text)
+    assert time.perf_counter() - start < 1
+    assert objects == [{"Question": "q1"}]
+    assert complete
+
+
+def test_objects_nested_in_a_truncated_record_are_not_records():
+    objects, complete = scan_json_objects('[{"Question": "q1", "Options": [{"a": 1}], "Sub')
+    assert objects == []
+    assert not complete
@@ -0,0 +1,80 @@
+import pytest
+
+import validate_data
+import validate_points_data
+from model_routing import DEFAULT_ROUTES, ModelRouter, routes_from_env
+
+
+def test_environment_overrides_a_stage():
+    routes = routes_from_env(environ={"MODEL_ROUTE_STRUCTURE_MCQ": " small , large ", "MODEL_ROUTE_VISION_MCQ": " , "})
+    assert routes["structure_mcq"] == ("small", "large")
+    assert routes["vision_mcq"] == DEFAULT_ROUTES["vision_mcq"]
+
+
+def test_tiers_past_the_route_stay_on_the_strongest_model():
+    router = ModelRouter({"stage": ("cheap", "strong")})
+    assert router.model("stage") == "cheap"
+    assert router.model("stage", 1) == "strong"
+    assert router.model("stage", 5) == "strong"
+
+
+def test_escalation_stops_at_the_strongest_model():
+    router = ModelRouter({"stage": ("cheap", "strong")})
+    assert router.escalate("stage", 0, "invalid JSON") == 1
+    assert router.escalate("stage", 1, "invalid JSON") is None
+
+
+def test_escalation_rate():
+    router = ModelRouter({"stage": ("cheap", "strong")})
+    assert router.escalation_rate("stage") == 0.0
+    for tier in (0, 0, 1, 0):
+        router.record("stage", tier)
+    assert router.escalation_rate("stage") == 0.25
+    assert router.stats()["stage"] == {
+        "models": ["cheap", "strong"], "calls": 4, "escalations": 1, "escalation_rate": 0.25
+    }
+
+
+@pytest.fixture
+def structuring(monkeypatch):
+    """
+    Points both structuring modules at a fresh router and a fake completion that
+    answers every request with the queued reply, recording the models asked.
+    """
+    router = ModelRouter({"structure_mcq": ("cheap", "strong"), "structure_points": ("cheap", "strong")})
+    models = []
+    reply = {}
+
+    def fake_completion(**payload):
+        models.append(payload["model"])
+        return {"choices": [{"message": {"content": reply["text"]}, "finish_reason": "stop"}]}
+
+    for module in (validate_data, validate_points_data):
+        monkeypatch.setattr(module, "get_model_router", lambda: router)
+        monkeypatch.setattr(module, "chat_completion_with_continuation", fake_completion)
+    return router, models, reply
+
+
+def test_empty_mcq_reply_is_accepted_without_escalation(structuring):
+    router, models, reply = structuring
+    reply["text"] = '{"questions": []}'
+    assert validate_data.structure_question_chunk("Chapter 3") == []
+    assert models == ["cheap"]
+    assert router.stats()["structure_mcq"]["calls"] == 1
+    assert router.escalation_rate("structure_mcq") == 0.0
+
+
+def test_empty_points_reply_is_accepted_without_escalation(structuring):
+    router, models, reply = structuring
+    reply["text"] = '{"slides": []}'
+    assert validate_points_data.get_bullet_points_data("Chapter 3") == []
+    assert models == ["cheap"]
+    assert router.escalation_rate("structure_points") == 0.0
+
+
+def test_reply_without_json_escalates(structuring):
+    router, models, reply = structuring
+    reply["text"] = "Sorry, I cannot help with that."
+    assert validate_data.structure_question_chunk("Q1. text", max_retries=1) == []
+    assert models == ["cheap", "strong"]
+    assert router.escalation_rate("structure_mcq") == 1.0
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from circuit_breaker import HALF_OPEN, CircuitBreaker
+from rate_limiter import (
+    RateLimiter, TokenBucket, async_call_with_rate_limit, backoff_delay, call_with_rate_limit,
+    estimate_request_tokens, is_retryable, retry_after_seconds
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def make_limiter(clock, requests_per_minute=60, tokens_per_minute=600):
+    return RateLimiter(requests_per_minute, tokens_per_minute, clock=clock, sleep=clock.sleep)
+
+
+def test_bucket_refills_continuously():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(1.0)
+    clock.now = 30
+    assert bucket.wait_time(30, clock.now) == 0.0
+    assert bucket.wait_time(31, clock.now) == pytest.approx(1.0)
+
+
+def test_bucket_never_exceeds_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    clock.now = 1000
+    bucket.wait_time(0, clock.now)
+    assert bucket.tokens == 60
+
+
+def test_acquire_waits_for_the_token_budget():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.acquire(600)
+    limiter.acquire(300)  # Half the per-minute budget refills in 30 seconds
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_pause_holds_back_callers():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.pause(5)
+    limiter.acquire(1)
+    assert clock.sleeps == [pytest.approx(5.0)]
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(APIError(429, {"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(APIError(429, {"Retry-After": "bad"})) is None
+    assert retry_after_seconds(APIError(429)) is None
+
+
+def test_retry_after_pauses_the_limiter_before_retrying():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    replies = [APIError(429, {"retry-after": "4"}), "ok"]
+
+    def request():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert call_with_rate_limit(request, 10, limiter=limiter) == "ok"
+    assert clock.sleeps == [pytest.approx(4.0)]
+    assert limiter.stats()["retries"] == 1
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    assert is_retryable(APIError(503)) and not is_retryable(APIError(400))
+
+    def bad_request():
+        raise APIError(400)
+
+    with pytest.raises(APIError):
+        call_with_rate_limit(bad_request, 10, limiter=limiter)
+    assert limiter.stats()["retries"] == 0
+
+
+def test_backoff_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=5.0) <= 5.0
+
+
+def test_request_token_estimate():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "x" * 30}, {"type": "image_url"}]}]
+    assert estimate_request_tokens(messages, 100) == 10 + 800 + 100
+
+
+def test_cancelled_async_call_frees_the_half_open_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    async def hanging_request():
+        await asyncio.Event().wait()
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(async_call_with_rate_limit(hanging_request, 10, make_limiter(clock), breaker=breaker))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # The next call can be the trial
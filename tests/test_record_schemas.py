@@ -0,0 +1,58 @@
+from record_schemas import (
+    MCQ_RECORD_SCHEMA, extract_records, response_format, validate_mcq_record, validate_points_record
+)
+import validate_data
+from validate_data import build_question_prompt, parse_question_records, question_text
+
+
+def test_strict_mcq_schema_keeps_statements_in_the_question():
+    assert MCQ_RECORD_SCHEMA["required"] == ["Question", "Options"]
+    assert "Subpoints" not in MCQ_RECORD_SCHEMA["properties"]
+    schema = response_format("mcq")["json_schema"]
+    assert schema["strict"] is True
+    assert schema["schema"]["required"] == ["questions"]
+
+
+def test_lenient_mcq_validation():
+    assert validate_mcq_record({"Question": "q", "Options": ["a", "b"]}) == []
+    assert validate_mcq_record({"Question": "q", "Subpoints": ["1. s"], "Options": ["a"], "Answer": "a"}) == []
+    assert validate_mcq_record({"Question": "  ", "Options": ["a"]})
+    assert validate_mcq_record({"Question": "q", "Options": [1]})
+    assert validate_mcq_record({"Question": "q", "Subpoints": "1. s", "Options": ["a"]})
+    assert validate_mcq_record({"Options": ["a"]}) == ["$: missing Question"]
+
+
+def test_lenient_points_validation():
+    assert validate_points_record({"points": ["p"]}) == []
+    assert validate_points_record({"title": "t", "points": "p"})
+
+
+def test_extract_records_unwraps_the_envelope():
+    assert extract_records('{"questions": [{"Question": "q", "Options": []}]}', "mcq") == [{"Question": "q", "Options": []}]
+    assert extract_records('[{"title": "t", "points": []}]', "points") == [{"title": "t", "points": []}]
+
+
+def test_extract_records_recovers_a_truncated_envelope():
+    text = '{"slides": [{"title": "t", "points": ["p"]}, {"title": "u", "poi'
+    assert extract_records(text, "points") == [{"title": "t", "points": ["p"]}]
+    assert extract_records("", "points") is None
+
+
+def test_subpoints_are_appended_to_the_question():
+    record = {"Question": "Consider the statements:", "Subpoints": ["1. First.", "", "2. Second."], "Options": []}
+    assert question_text(record) == "Consider the statements:\n1. First.\n2. Second."
+    assert question_text({"Question": "q", "Options": []}) == "q"
+
+
+def test_parsed_questions_keep_their_statements():
+    parsed = parse_question_records(
+        '[{"Question": "Which are correct?", "Subpoints": ["1. A", "2. B"], "Options": ["(a) 1", "(b) 2"]}]'
+    )
+    assert parsed == {"Question": ["Which are correct?\n1. A\n2. B"], "Options": [["(a) 1", "(b) 2"]]}
+
+
+def test_prompt_asks_for_subpoints_only_without_structured_outputs(monkeypatch):
+    monkeypatch.setattr(validate_data, "STRUCTURED_OUTPUTS", True)
+    assert "Subpoints" not in build_question_prompt("1. q")
+    monkeypatch.setattr(validate_data, "STRUCTURED_OUTPUTS", False)
+    assert "Subpoints" in build_question_prompt("1. q")
@@ -0,0 +1,72 @@
+from session_store import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_creates_once_and_counts_hits():
+    store = SessionStore(clock=FakeClock())
+    session = store.get(1)
+    assert store.get(1) is session
+    assert store.stats() == {"sessions": 1, "hits": 1, "misses": 1, "evictions": 0, "expirations": 0}
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2, clock=FakeClock())
+    store.get(1)
+    store.get(2)
+    store.get(1)  # 2 is now the least recently used
+    store.get(3)
+    assert store.peek(2) is None
+    assert store.peek(1) is not None and store.peek(3) is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=10, clock=clock)
+    store.get(1)
+    clock.now = 5
+    store.get(2)
+    clock.now = 12
+    store.get(2)
+    assert store.peek(1) is None
+    assert len(store) == 1
+    assert store.stats()["expirations"] == 1
+
+
+def test_ttl_can_be_disabled():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=None, clock=clock)
+    first = store.get(1)
+    clock.now = 10 ** 9
+    assert store.get(1) is first
+
+
+def test_peek_neither_creates_nor_counts():
+    store = SessionStore(max_sessions=2, clock=FakeClock())
+    assert store.peek(1) is None
+    store.get(1)
+    store.get(2)
+    store.peek(1)  # Does not refresh recency
+    store.get(3)
+    assert store.peek(1) is None
+    assert store.stats()["hits"] == 0
+    assert store.stats()["misses"] == 3
+
+
+def test_reset_restores_defaults():
+    store = SessionStore(clock=FakeClock())
+    session = store.get(1)
+    session.question_data["Question"].append("q")
+    session.presentation_settings["title"] = "Custom"
+    session.reset()
+    assert session.question_data == {"Question": [], "Options": [], "Points": []}
+    assert session.presentation_settings["title"] == "NEXT LEVEL ACADEMY"
+    store.discard(1)
+    assert store.peek(1) is None
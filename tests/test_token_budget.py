@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import token_budget
+from token_budget import (
+    CONTINUE_PROMPT, MAX_RETRY_OUTPUT_TOKENS, async_chat_completion_with_continuation,
+    chat_completion_with_continuation, output_token_budget
+)
+
+SCHEMA_FORMAT = {"type": "json_schema", "json_schema": {"name": "mcq_records", "strict": True, "schema": {}}}
+
+
+class FakeClient:
+    def __init__(self, replies):
+        """
+        Returns the given (content, finish_reason) pairs in order and records every payload.
+        """
+        self.replies = list(replies)
+        self.payloads = []
+
+    def chat_completion(self, **payload):
+        self.payloads.append(payload)
+        content, finish_reason = self.replies.pop(0)
+        return {"choices": [{"message": {"content": content}, "finish_reason": finish_reason}]}
+
+
+def payload(**extra):
+    return dict(model="m", messages=[{"role": "user", "content": "text"}], max_tokens=1000, **extra)
+
+
+def test_plain_reply_is_continued_and_joined():
+    client = FakeClient([('[{"Question": "q1"}, ', "length"), ('{"Question": "q2"}]', "stop")])
+    response = chat_completion_with_continuation(client, **payload())
+    assert response["choices"][0]["message"]["content"] == '[{"Question": "q1"}, {"Question": "q2"}]'
+    assert client.payloads[1]["messages"][-1] == {"role": "user", "content": CONTINUE_PROMPT}
+
+
+@pytest.mark.parametrize("response_format", [SCHEMA_FORMAT, {"type": "json_object"}])
+def test_json_constrained_reply_is_requested_again_with_a_larger_budget(response_format):
+    client = FakeClient([('{"questions": [{"Question": "q1"}, {"Que', "length"),
+                         ('{"questions": [{"Question": "q1"}, {"Question": "q2"}]}', "stop")])
+    response = chat_completion_with_continuation(client, **payload(response_format=response_format))
+    assert response["choices"][0]["message"]["content"] == '{"questions": [{"Question": "q1"}, {"Question": "q2"}]}'
+    assert [p["max_tokens"] for p in client.payloads] == [1000, 2000]
+    assert all(p["messages"] == payload()["messages"] for p in client.payloads)
+
+
+def test_json_constrained_retries_stop_at_the_limit():
+    client = FakeClient([("{", "length")] * 3)
+    response = chat_completion_with_continuation(client, max_continuations=2, **payload(response_format=SCHEMA_FORMAT))
+    assert response["choices"][0]["finish_reason"] == "length"
+    assert [p["max_tokens"] for p in client.payloads] == [1000, 2000, 4000]
+
+
+def test_json_constrained_retries_stop_at_the_token_ceiling():
+    client = FakeClient([("{", "length"), ("{", "length")])
+    chat_completion_with_continuation(
+        client, max_continuations=5, **dict(payload(response_format=SCHEMA_FORMAT), max_tokens=MAX_RETRY_OUTPUT_TOKENS // 2)
+    )
+    assert [p["max_tokens"] for p in client.payloads] == [MAX_RETRY_OUTPUT_TOKENS // 2, MAX_RETRY_OUTPUT_TOKENS]
+
+
+def test_output_budget_is_clamped():
+    assert output_token_budget("") == token_budget.MIN_OUTPUT_TOKENS
+    assert output_token_budget("प्रश्न " * 10000) == token_budget.MAX_OUTPUT_TOKENS
+
+
+class FakeAsyncClient(FakeClient):
+    async def chat_completion(self, **payload):
+        return FakeClient.chat_completion(self, **payload)
+
+
+def test_async_reply_is_continued_and_joined():
+    client = FakeAsyncClient([('[{"Question": "q1"}, ', "length"), ('{"Question": "q2"}]', "stop")])
+    response = asyncio.run(async_chat_completion_with_continuation(client, **payload()))
+    assert response["choices"][0]["message"]["content"] == '[{"Question": "q1"}, {"Question": "q2"}]'
+    assert client.payloads[1]["messages"][-1] == {"role": "user", "content": CONTINUE_PROMPT}
+
+
+def test_async_json_constrained_reply_is_requested_again_with_a_larger_budget():
+    client = FakeAsyncClient([("{", "length"), ('{"questions": []}', "stop")])
+    response = asyncio.run(async_chat_completion_with_continuation(client, **payload(response_format=SCHEMA_FORMAT)))
+    assert response["choices"][0]["message"]["content"] == '{"questions": []}'
+    assert [p["max_tokens"] for p in client.payloads] == [1000, 2000]
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from circuit_breaker import CircuitOpenError
+from vision_batching import async_extract_in_batches, extract_in_batches, parse_batched_response, plan_batches
+
+
+def test_batches_respect_count_and_byte_budgets():
+    assert plan_batches([1] * 5, max_images=2, max_bytes=100) == [[0, 1], [2, 3], [4]]
+    assert plan_batches([60, 60, 30, 200], max_images=6, max_bytes=100) == [[0], [1, 2], [3]]
+
+
+def test_batch_size_is_bounded_by_image_tokens():
+    assert plan_batches([1] * 4, max_images=6, max_image_tokens=1600, tokens_per_image=800) == [[0, 1], [2, 3]]
+
+
+def test_batched_response_is_split_per_image():
+    text = '```json\n{"images": [{"image": 2, "items": [{"q": 2}]}, {"image": 1, "items": []}]}\n```'
+    assert [json.loads(part) for part in parse_batched_response(text, 2)] == [[], [{"q": 2}]]
+
+
+def test_batched_response_missing_an_image_is_rejected():
+    with pytest.raises(ValueError):
+        parse_batched_response('{"images": [{"image": 1, "items": []}]}', 2)
+
+
+def batch_reply(images):
+    return json.dumps({"images": [{"image": n, "items": [image]} for n, image in enumerate(images, start=1)]})
+
+
+def test_failed_batches_are_split_down_to_single_calls():
+    batch_sizes = []
+
+    def call_batch(images):
+        batch_sizes.append(len(images))
+        if len(images) > 2:
+            raise ValueError("too many")
+        return batch_reply(images)
+
+    results = extract_in_batches(["a", "b", "c", "d", "e"], call_batch, lambda image: f"single {image}", max_images=6)
+    assert batch_sizes == [5, 2, 3, 2]
+    assert results == ['["a"]', '["b"]', "single c", '["d"]', '["e"]']
+
+
+def test_open_circuit_is_not_split():
+    calls = []
+
+    def call_batch(images):
+        calls.append(len(images))
+        raise CircuitOpenError("openai is unavailable (circuit open)")
+
+    with pytest.raises(CircuitOpenError):
+        extract_in_batches(["a", "b", "c", "d"], call_batch, lambda image: None)
+    assert calls == [4]
+
+
+def test_async_failed_batches_are_split_down_to_single_calls():
+    async def call_batch(images):
+        if len(images) > 2:
+            raise ValueError("too many")
+        return batch_reply(images)
+
+    async def call_single(image):
+        return f"single {image}"
+
+    results = asyncio.run(async_extract_in_batches(["a", "b", "c", "d", "e"], call_batch, call_single, max_images=6))
+    assert results == ['["a"]', '["b"]', "single c", '["d"]', '["e"]']
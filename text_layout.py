@@ -0,0 +1,124 @@
+import os
+import threading
+import unicodedata
+from functools import lru_cache
+from PIL import ImageFont
+
+# Font files tried for each (font name, bold), in order. Carlito is metric-compatible with
+# Calibri and Lohit/Noto Devanagari are close to Mangal, for servers without Windows fonts.
+FONT_FILES = {
+    ("Calibri", False): ("calibri.ttf", "Calibri.ttf", "Carlito-Regular.ttf"),
+    ("Calibri", True): ("calibrib.ttf", "Calibri Bold.ttf", "Carlito-Bold.ttf"),
+    ("Mangal", False): ("mangal.ttf", "Mangal.ttf", "Lohit-Devanagari.ttf", "NotoSansDevanagari-Regular.ttf"),
+    ("Mangal", True): ("mangalb.ttf", "Mangal Bold.ttf", "NotoSansDevanagari-Bold.ttf", "mangal.ttf"),
+}
+
+# Directories searched for font files; FONT_DIR (if set) and ./fonts come first
+FONT_DIRS = (
+    os.environ.get("FONT_DIR", ""),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"),
+    r"C:\Windows\Fonts",
+    "/Library/Fonts",
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+)
+
+REFERENCE_SIZE = 100  # Glyph advances are measured at this size and scaled, since they are linear in size
+LINE_HEIGHT = 1.2  # Single line spacing as a multiple of the font size
+FALLBACK_CHAR_WIDTH = 0.5  # Average advance in ems when no font file is found
+WORD_CACHE_SIZE = 200000
+
+
+@lru_cache(maxsize=None)
+def find_font_file(font_name, bold=False):
+    """
+    Path of the font file for a font, or None if none of its files is installed.
+    """
+    names = FONT_FILES.get((font_name, bold), (f"{font_name}.ttf", f"{font_name.lower()}.ttf"))
+    for directory in FONT_DIRS:
+        if not directory or not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in names:
+                if name in files:
+                    return os.path.join(root, name)
+    return None
+
+
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+def _load_font(font_name, bold):
+    """
+    PIL font at REFERENCE_SIZE, or None when the font file is missing (measured by character count).
+    """
+    key = (font_name, bold)
+    with _fonts_lock:
+        if key not in _fonts:
+            path = find_font_file(font_name, bold)
+            if path is None:
+                print(f"⚠️ Font file for {font_name}{' Bold' if bold else ''} not found, estimating text width")
+                _fonts[key] = None
+            else:
+                _fonts[key] = ImageFont.truetype(path, REFERENCE_SIZE)
+        return _fonts[key]
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def word_width(font_name, bold, word):
+    """
+    Advance width of `word` in ems (points at a 1pt font size).
+    Cached per (font, word); the width at a size is this value times the size.
+    """
+    font = _load_font(font_name, bold)
+    if font is not None:
+        return font.getlength(word) / REFERENCE_SIZE
+    # Combining marks (Devanagari vowel signs, viramas) take no space of their own
+    return FALLBACK_CHAR_WIDTH * sum(1 for char in word if unicodedata.category(char) != "Mn")
+
+
+def wrap_lines(text, font_name, font_size, max_width, bold=False):
+    """
+    Greedy word wrap using measured glyph advances, like PowerPoint's own wrapping.
+    Existing line breaks are kept; a word wider than the line gets a line of its own.
+
+    :param font_size: Font size in points
+    :param max_width: Line width in points
+    :return: List of lines
+    """
+    limit = max_width / font_size  # Compare in ems so the cached widths are used as is
+    space = word_width(font_name, bold, " ")
+    lines = []
+    for paragraph in text.split("\n"):
+        line = []
+        line_width = 0.0
+        for word in paragraph.split():
+            width = word_width(font_name, bold, word)
+            if line and line_width + space + width > limit:
+                lines.append(" ".join(line))
+                line = [word]
+                line_width = width
+            else:
+                line_width += space + width if line else width
+                line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def lines_height(line_count, font_size, line_spacing=LINE_HEIGHT):
+    """
+    Height in points of `line_count` lines at `font_size` points.
+    """
+    return line_count * font_size * line_spacing
+
+
+def fit_font_size(text, font_name, sizes, max_width, max_height, bold=False):
+    """
+    Largest of `sizes` (points, largest first) at which the wrapped text fits
+    in max_width x max_height points; the smallest size if none does.
+    """
+    for size in sizes:
+        if lines_height(len(wrap_lines(text, font_name, size, max_width, bold)), size) <= max_height:
+            return size
+    return sizes[-1]
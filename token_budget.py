@@ -0,0 +1,168 @@
+import re
+from llm_client import get_async_llm_client, get_llm_client
+
+# Output budget limits
+MIN_OUTPUT_TOKENS = 300
+MAX_OUTPUT_TOKENS = 4096
+JSON_OVERHEAD = 1.3  # Escaping, keys and punctuation added when text is restructured as JSON
+TOKENS_PER_QUESTION = 40  # Keys and brackets of one MCQ record
+TOKENS_PER_POINTS_BLOCK = 20  # Keys and brackets of one points record
+MAX_CONTINUATIONS = 2
+MAX_RETRY_OUTPUT_TOKENS = 16384  # Ceiling when a truncated JSON-constrained reply is re-requested
+JSON_RESPONSE_FORMATS = ("json_schema", "json_object")
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off. Continue exactly where it stopped, "
+    "without repeating anything and without any extra text."
+)
+
+QUESTION_COUNT_PATTERN = re.compile(r"^\s*(?:Q\.?\s*\d+|प्रश्न\s*\d+|\d+\s*[.)])|\{\s*\"Question\"", re.MULTILINE)
+POINT_COUNT_PATTERN = re.compile(r"^\s*(?:[•\-*➤]|\d+\s*[.)])", re.MULTILINE)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count of a text. Latin text averages about 4 characters per
+    token; Devanagari and other non-ASCII scripts are much denser, about 2.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_count = len(text) - non_ascii
+    return ascii_count // 4 + non_ascii // 2 + 1
+
+
+def expected_item_count(text, kind="mcq"):
+    """
+    Estimates how many questions (kind="mcq") or points (kind="points") the text contains.
+    """
+    pattern = QUESTION_COUNT_PATTERN if kind == "mcq" else POINT_COUNT_PATTERN
+    return max(1, len(pattern.findall(text)))
+
+
+def output_token_budget(input_text, kind="mcq", expected_items=None,
+                        minimum=MIN_OUTPUT_TOKENS, maximum=MAX_OUTPUT_TOKENS):
+    """
+    Sizes max_tokens for a structuring call from the length of its input.
+
+    The structured output repeats the input text plus JSON overhead and a fixed
+    cost per record, so a dense Hindi page gets a larger budget than a short one.
+
+    :param input_text: OCR text to be structured
+    :param kind: "mcq" or "points"
+    :param expected_items: Known number of records, if any
+    """
+    if expected_items is None:
+        expected_items = expected_item_count(input_text, kind)
+    per_item = TOKENS_PER_QUESTION if kind == "mcq" else TOKENS_PER_POINTS_BLOCK
+    budget = int(estimate_tokens(input_text) * JSON_OVERHEAD) + expected_items * per_item
+    return max(minimum, min(maximum, budget))
+
+
+def is_json_constrained(payload):
+    """
+    True if the request's response_format forces every reply to be a complete JSON document.
+    """
+    response_format = payload.get("response_format") or {}
+    return response_format.get("type") in JSON_RESPONSE_FORMATS
+
+
+def chat_completion_with_continuation(client=None, max_continuations=MAX_CONTINUATIONS, **payload):
+    """
+    Creates a chat completion and, if it stops because of max_tokens
+    (finish_reason "length"), asks the model to continue from where it stopped
+    instead of starting over. The parts are joined into a single response.
+
+    A reply constrained by a JSON response_format cannot be continued, since the
+    continuation would open a new document; the request is repeated with a
+    larger max_tokens instead (see retry_with_larger_budget).
+
+    :return: The last response dict, with the combined text in choices[0].message.content
+    """
+    client = client or get_llm_client()
+    response = client.chat_completion(**payload)
+    if is_json_constrained(payload):
+        return retry_with_larger_budget(client, response, max_continuations, payload)
+    content = response["choices"][0]["message"]["content"] or ""
+    finish_reason = response["choices"][0].get("finish_reason")
+
+    continuations = 0
+    while finish_reason == "length" and continuations < max_continuations:
+        continuations += 1
+        print(f"Response cut off at max_tokens, continuing ({continuations}/{max_continuations})")
+        response = client.chat_completion(**continuation_payload(payload, content))
+        content += response["choices"][0]["message"]["content"] or ""
+        finish_reason = response["choices"][0].get("finish_reason")
+
+    response["choices"][0]["message"]["content"] = content
+    return response
+
+
+def continuation_payload(payload, content):
+    """
+    Payload asking the model to continue the cut-off reply `content`.
+    """
+    messages = list(payload["messages"]) + [
+        {"role": "assistant", "content": content},
+        {"role": "user", "content": CONTINUE_PROMPT},
+    ]
+    return dict(payload, messages=messages)
+
+
+def retry_with_larger_budget(client, response, max_retries, payload):
+    """
+    Re-requests a truncated JSON-constrained reply with max_tokens doubled each
+    time, up to MAX_RETRY_OUTPUT_TOKENS. Each retry replaces the previous reply.
+
+    :return: The first complete response, or the longest truncated one
+    """
+    max_tokens = payload.get("max_tokens") or MAX_OUTPUT_TOKENS
+    retries = 0
+    while response["choices"][0].get("finish_reason") == "length" and retries < max_retries:
+        if max_tokens >= MAX_RETRY_OUTPUT_TOKENS:
+            break
+        retries += 1
+        max_tokens = min(max_tokens * 2, MAX_RETRY_OUTPUT_TOKENS)
+        print(f"JSON response cut off at max_tokens, retrying with {max_tokens} ({retries}/{max_retries})")
+        response = client.chat_completion(**dict(payload, max_tokens=max_tokens))
+    return response
+
+
+async def async_chat_completion_with_continuation(client=None, max_continuations=MAX_CONTINUATIONS, **payload):
+    """
+    asyncio counterpart of chat_completion_with_continuation, using the
+    process-wide AsyncLLMClient unless a client is given.
+    """
+    client = client or get_async_llm_client()
+    response = await client.chat_completion(**payload)
+    if is_json_constrained(payload):
+        return await async_retry_with_larger_budget(client, response, max_continuations, payload)
+    content = response["choices"][0]["message"]["content"] or ""
+    finish_reason = response["choices"][0].get("finish_reason")
+
+    continuations = 0
+    while finish_reason == "length" and continuations < max_continuations:
+        continuations += 1
+        print(f"Response cut off at max_tokens, continuing ({continuations}/{max_continuations})")
+        response = await client.chat_completion(**continuation_payload(payload, content))
+        content += response["choices"][0]["message"]["content"] or ""
+        finish_reason = response["choices"][0].get("finish_reason")
+
+    response["choices"][0]["message"]["content"] = content
+    return response
+
+
+async def async_retry_with_larger_budget(client, response, max_retries, payload):
+    """
+    asyncio counterpart of retry_with_larger_budget.
+    """
+    max_tokens = payload.get("max_tokens") or MAX_OUTPUT_TOKENS
+    retries = 0
+    while response["choices"][0].get("finish_reason") == "length" and retries < max_retries:
+        if max_tokens >= MAX_RETRY_OUTPUT_TOKENS:
+            break
+        retries += 1
+        max_tokens = min(max_tokens * 2, MAX_RETRY_OUTPUT_TOKENS)
+        print(f"JSON response cut off at max_tokens, retrying with {max_tokens} ({retries}/{max_retries})")
+        response = await client.chat_completion(**dict(payload, max_tokens=max_tokens))
+    return response
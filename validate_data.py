@@ -1,148 +1,400 @@
 import re
-import openai
 import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from config import GROUP_CHAT_ID,openai
-import re
+from record_schemas import STRUCTURED_OUTPUTS, extract_records, response_format, validate_mcq_record
+from rate_limiter import backoff_delay
+from model_routing import get_model_router
+from circuit_breaker import CircuitOpenError
+from token_budget import async_chat_completion_with_continuation, chat_completion_with_continuation, output_token_budget
+
+# Chunking of long OCR texts for get_single_question_data
+MAX_CHUNK_CHARS = 2500
+MAX_PARALLEL_CHUNKS = 4
+
+# Start of a numbered question: "1.", "12)", "Q1.", "Q.1", "प्रश्न 1", "प्र. 1"
+QUESTION_START_PATTERN = re.compile(r"^\s*(?:Q\.?\s*\d+|प्रश्न\s*\d+|प्र\.\s*\d+|\d+\s*[.)])", re.IGNORECASE)
+# An answer option: "(a)" anywhere in a line, or "a)", "a.", "क)" at its start
+OPTION_PATTERN = re.compile(r"\(\s*[a-dA-Dकखगघ]\s*\)|^\s*[a-dA-Dकखगघ]\s*[.)]")
+# A question object inside JSON text
+JSON_QUESTION_PATTERN = re.compile(r'^\s*\[?\s*\{\s*"Question"')
+# Hindi "which of these statements are correct?" marker ending a statement question
+QUESTION_MARKER = "इनमें से कौन"
+
 def clean_json_response(formatted_data):
     """
     Cleans and extracts valid JSON array content from the response.
+    Complete objects are recovered from truncated responses without another API call,
+    and the {"questions": [...]} envelope of structured outputs is unwrapped.
     """
-    formatted_data = formatted_data.strip("`").strip()
+    records = extract_records(formatted_data, "mcq")
+    if records is None:
+        print("No valid JSON detected in response.")
+    return records
 
-    # Use regex to extract JSON content
-    json_match = re.search(r'(\[\s*\{[\s\S]*?\}\s*\])', formatted_data, re.UNICODE)
+def is_question_record(record):
+    """
+    Checks that a parsed object has the MCQ shape: a non-empty "Question" string
+    and an "Options" list of strings ("Subpoints", if present, a list of strings).
+    """
+    return not validate_mcq_record(record)
 
-    if json_match:
-        json_content = json_match.group(1).strip()
-        try:
-            return json.loads(json_content)  # ✅ Properly parse JSON into Python object
-        except json.JSONDecodeError as e:
-            print(f"JSON Parsing Error: {e}")
-            return None
-    else:
-        print("No valid JSON detected in response.")
-        return None
-    
-def get_single_question_data(extracted_text, max_retries=3, max_tokens=500):
+def question_text(record):
     """
-    Queries OpenAI to retrieve structured questions, options, answers, and explanations from extracted text.
+    The question text of an MCQ record with its "Subpoints" (the numbered
+    statements of a statement-list question) appended on their own lines,
+    so the statements reach the slide.
+    """
+    subpoints = [subpoint for subpoint in record.get("Subpoints") or [] if subpoint]
+    if not subpoints:
+        return record["Question"]
+    return "\n".join([record["Question"]] + subpoints)
 
-    Args:
-        extracted_text (str): The text extracted from an image.
-        max_retries (int): Maximum number of retries for API calls.
-        max_tokens (int): Maximum number of tokens to be returned in the API response.
+def parse_question_records(response_text):
+    """
+    Parses a vision response that already is a JSON array of MCQ records.
 
     Returns:
-        dict: Structured data with keys "Question", "Options".
+        dict: {"Question": [...], "Options": [...]} when every record conforms to
+        the MCQ shape, otherwise None so the caller can fall back to
+        get_single_question_data.
     """
-    all_data = {
-        "Question": [],
-        "Options": [],
+    if not response_text:
+        return None
+    records = clean_json_response(response_text)
+
+    if not isinstance(records, list) or not records:
+        return None
+    if not all(is_question_record(record) for record in records):
+        return None
 
+    return {
+        "Question": [question_text(record) for record in records],
+        "Options": [record["Options"] for record in records],
     }
-    offset = 0
-
-    while offset < len(extracted_text):
-        prompt = (
-            "Extract all text **exactly as it appears** in the image. Do NOT modify, summarize, or create new text. Maintain original line breaks and formatting." 
-
-            "If the text contains multiple-choice questions (MCQs), structure them in **this exact JSON format**:"
-            "Extract all the proper questions from the following OCR text, starting from the specified offset position. "
-            "Return only the extracted questions and their details in a JSON array. Strictly adhere to the exact format specified below, "
-            "and do not include any additional text, notes, interpretations, or unrelated content. Only output structured JSON in this format:\n\n"
-            "Structure the following Hindi questions into JSON format while maintaining exact formatting:"
-        "\n\nRULES:"
-        "\n1. HANDLE BOTH QUESTION TYPES:"
-        "\n   Simple Questions Example:"
-        '   {"Question": "SRY जीन कहाँ पाया जा सकता है?","Options": ["(a) केवल पुरुषों में।","(b) केवल महिलाओं में।"]}'
-        "\n   Complex Questions Example:"
-        '   {"Question": "पेरिस में भारत द्वारा सह-अध्यक्षता किए गए एआई एक्शन समिट 2025 का उद्देश्य है:\\n1. केवल एआई सुरक्षा पर ध्यान केंद्रित करना।\\n2. एआई शासन..."}'
-        "\n2. FORMATTING RULES:"        
-        "\n   - Keep all line breaks using \\n"
-        "\n   - Preserve both Hindi and English scientific terms"
-        "\n   - Maintain exact option formatting with bullets/dots"
-        "\n   - Keep all brackets and parentheses"
-        "\n3. STRICT JSON STRUCTURE:"
-        "["
-        "  {"
-        '    "Question": "Question text here",'
+    
+def build_question_prompt(text):
+    """
+    Builds the structuring prompt for one chunk of OCR text.
+    The strict schema of STRUCTURED_OUTPUTS has no "Subpoints" field, so in that
+    mode the examples keep the numbered statements inside the question text.
+    """
+    if STRUCTURED_OUTPUTS:
+        subpoints_rule = "\n   - Keep numbered statements inside the \"Question\" text, each on its own line"
+        subpoints_format = ""
+        subpoints_example = ""
+    else:
+        subpoints_rule = ""
+        subpoints_format = (
             "\n\"Subpoints\": ["
-                "\n\"1. First subpoint text.\","
-                "\n\"2. Second subpoint text.\","
-                "\n\"3. Third subpoint text.\""
-                "\n],"
-        '    "Options": ['
-        '      "(a) Option text",'
-        '      "(b) Option text",'
-        '      "(c) Option text",'
-        '      "(d) Option text"'
-        "    ]"
-        "  }"
-        "]"
-        "\n\nPROCESS THIS TEXT:"
-            "[\n"
-            "  {\n"
-            "    \"Question\": \"Complete question text here as it appears in the OCR content.\",\n"
+            "\n\"1. First subpoint text.\","
+            "\n\"2. Second subpoint text.\","
+            "\n\"3. Third subpoint text.\""
+            "\n],"
+        )
+        subpoints_example = (
             "\n    \"Subpoints\": ["
-                            "\n       \"1. First subpoint text.\","
-                            "\n       \"2. Second subpoint text.\","
-                            "\n       \"3. Third subpoint text.\""
-                            "\n    ],"
-            "    \"Options\": [\"Option A text\", \"Option B text\", \"Option C text\", \"Option D text\"],\n"
-            "  },\n"
-            "  {\n"
-            "    \"Question\": \"Next complete question text here as it appears in the OCR content.\",\n"
-            "    \"Options\": [\" text\", \" text\", \" text\", \" text\"],\n"
-            "  }\n"
-            "]\n\n"
-            "Make sure each question includes:\n"
-            "- The full question text under the \"Question\" key.\n"
-            "- Exactly four options under the \"Options\" key, listed in order as they appear, each option enclosed in quotation marks and separated by commas.\n"
-            f"Here is the text starting from position {offset}:\n\n{extracted_text[offset:]}"
+            "\n       \"1. First subpoint text.\","
+            "\n       \"2. Second subpoint text.\","
+            "\n       \"3. Third subpoint text.\""
+            "\n    ],"
         )
+    return (
+        "Extract all text **exactly as it appears** in the image. Do NOT modify, summarize, or create new text. Maintain original line breaks and formatting." 
+
+        "If the text contains multiple-choice questions (MCQs), structure them in **this exact JSON format**:"
+        "Extract all the proper questions from the following OCR text. "
+        "Return only the extracted questions and their details in a JSON array. Strictly adhere to the exact format specified below, "
+        "and do not include any additional text, notes, interpretations, or unrelated content. Only output structured JSON in this format:\n\n"
+        "Structure the following Hindi questions into JSON format while maintaining exact formatting:"
+    "\n\nRULES:"
+    "\n1. HANDLE BOTH QUESTION TYPES:"
+    "\n   Simple Questions Example:"
+    '   {"Question": "SRY जीन कहाँ पाया जा सकता है?","Options": ["(a) केवल पुरुषों में।","(b) केवल महिलाओं में।"]}'
+    "\n   Complex Questions Example:"
+    '   {"Question": "पेरिस में भारत द्वारा सह-अध्यक्षता किए गए एआई एक्शन समिट 2025 का उद्देश्य है:\\n1. केवल एआई सुरक्षा पर ध्यान केंद्रित करना।\\n2. एआई शासन..."}'
+    "\n2. FORMATTING RULES:"        
+    "\n   - Keep all line breaks using \\n"
+    "\n   - Preserve both Hindi and English scientific terms"
+    "\n   - Maintain exact option formatting with bullets/dots"
+    "\n   - Keep all brackets and parentheses"
+    f"{subpoints_rule}"
+    "\n3. STRICT JSON STRUCTURE:"
+    "["
+    "  {"
+    '    "Question": "Question text here",'
+    f"{subpoints_format}"
+    '    "Options": ['
+    '      "(a) Option text",'
+    '      "(b) Option text",'
+    '      "(c) Option text",'
+    '      "(d) Option text"'
+    "    ]"
+    "  }"
+    "]"
+    "\n\nPROCESS THIS TEXT:"
+        "[\n"
+        "  {\n"
+        "    \"Question\": \"Complete question text here as it appears in the OCR content.\",\n"
+        f"{subpoints_example}"
+        "    \"Options\": [\"Option A text\", \"Option B text\", \"Option C text\", \"Option D text\"]\n"
+        "  },\n"
+        "  {\n"
+        "    \"Question\": \"Next complete question text here as it appears in the OCR content.\",\n"
+        "    \"Options\": [\" text\", \" text\", \" text\", \" text\"]\n"
+        "  }\n"
+        "]\n\n"
+        "Make sure each question includes:\n"
+        "- The full question text under the \"Question\" key.\n"
+        "- Exactly four options under the \"Options\" key, listed in order as they appear, each option enclosed in quotation marks and separated by commas.\n"
+        f"Here is the text:\n\n{text}"
+    )
 
-        attempts = 0
-        while attempts < max_retries:
-            try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that strictly returns JSON."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens
-                )
-
-                formatted_data = response.choices[0].message['content']
-                print(formatted_data)
-                cleaned_data = clean_json_response(formatted_data)
-                if not cleaned_data:
-                    print("No valid JSON detected in response.")
-                    continue
-
-                if isinstance(cleaned_data, str):
-                    single_question_data = json.loads(cleaned_data)
+def split_into_question_chunks(text, max_chars=MAX_CHUNK_CHARS):
+    """
+    Splits OCR text into chunks that never cut a question in half.
+
+    A line starting a numbered question (1. / Q1) / प्रश्न 1) or a JSON question
+    object begins a new question, but numbered lines are only treated as a new
+    question once the current one has shown its options ((a) / a) / क)), so the
+    numbered sub-points inside a question stay with it. Whole questions are then
+    packed into chunks of at most max_chars (a single longer question becomes
+    its own chunk).
+
+    Args:
+        text (str): The OCR or vision text.
+        max_chars (int): Target maximum chunk length.
+
+    Returns:
+        list: Chunks in their original order.
+    """
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+
+    boundaries = [0]
+    seen_options = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        if position and (JSON_QUESTION_PATTERN.match(line) or (seen_options and QUESTION_START_PATTERN.match(line))):
+            boundaries.append(position)
+            seen_options = False
+        if OPTION_PATTERN.search(line) or QUESTION_MARKER in line:
+            seen_options = True
+        position += len(line)
+    boundaries.append(len(text))
+
+    chunks = []
+    current = ""
+    for begin, end in zip(boundaries, boundaries[1:]):
+        question = text[begin:end]
+        if current and len(current) + len(question) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += question
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def question_chunk_payload(chunk, max_tokens=None):
+    """
+    Request payload (without the model) for structuring one chunk of OCR text.
+    Without an explicit max_tokens the output budget is sized from the chunk.
+    """
+    if max_tokens is None:
+        max_tokens = output_token_budget(chunk, "mcq")
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that strictly returns JSON."},
+            {"role": "user", "content": build_question_prompt(chunk)}
+        ],
+        "max_tokens": max_tokens,
+    }
+    if STRUCTURED_OUTPUTS:
+        payload["response_format"] = response_format("mcq")
+    return payload
+
+def check_question_reply(response):
+    """
+    Parses and validates a structuring reply.
+
+    Returns:
+        tuple: (records with "Question" and "Options" keys, None) when every record
+        matches the MCQ schema, otherwise (None, reason for escalating the model).
+    """
+    formatted_data = response["choices"][0]["message"]["content"]
+    print(formatted_data)
+    cleaned_data = clean_json_response(formatted_data)
+    if cleaned_data is None:
+        print("No valid JSON detected in response.")
+        return None, "no valid JSON"
+
+    if isinstance(cleaned_data, str):
+        single_question_data = json.loads(cleaned_data)
+    else:
+        single_question_data = cleaned_data  # Already parsed
+
+    invalid = [record for record in single_question_data if not is_question_record(record)]
+    if invalid:
+        print(f"{len(invalid)} record(s) do not match the MCQ schema: {validate_mcq_record(invalid[0])}")
+        return None, "schema validation failed"
+
+    return [
+        {"Question": question_text(question_data), "Options": question_data["Options"]}
+        for question_data in single_question_data
+    ], None
+
+def structure_question_chunk(chunk, max_retries=3, max_tokens=None):
+    """
+    Sends one chunk of OCR text to OpenAI and returns the parsed question records.
+    Without an explicit max_tokens the output budget is sized from the chunk, and
+    a reply cut off at the budget is continued rather than retried from scratch.
+    With STRUCTURED_OUTPUTS the reply is constrained to the MCQ record schema,
+    and every record is validated locally before it is accepted.
+
+    The chunk goes to the first model of the "structure_mcq" route and only
+    escalates to the next (stronger) model when its reply fails validation.
+
+    Returns:
+        list: Records with "Question" and "Options" keys (empty on failure).
+    """
+    payload = question_chunk_payload(chunk, max_tokens)
+    router = get_model_router()
+    tier = 0
+
+    attempts = 0
+    while attempts < max_retries:
+        try:
+            response = chat_completion_with_continuation(**dict(payload, model=router.model("structure_mcq", tier)))
+
+            records, failure = check_question_reply(response)
+            if failure is not None:
+                next_tier = router.escalate("structure_mcq", tier, failure)
+                if next_tier is None:
+                    attempts += 1
                 else:
-                    single_question_data = cleaned_data  # Already parsed
+                    tier = next_tier
+                continue
 
-                #single_question_data = json.loads(cleaned_data)
+            router.record("structure_mcq", tier)
+            return records
 
-                # Append question data to all_data
-                for question_data in single_question_data:
-                    all_data["Question"].append(question_data["Question"])
-                    all_data["Options"].append(question_data["Options"])
+        except CircuitOpenError as e:
+            print(f"Skipping chunk: {e}")
+            break
+
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error in chunk, attempt {attempts + 1}: {e}")
+            attempts += 1
+            if attempts < max_retries:
+                time.sleep(backoff_delay(attempts))
+
+    router.record("structure_mcq", tier)
+    print(f"Failed after {max_retries} attempts for chunk starting: {chunk[:60]!r}")
+    return []
+
+async def async_structure_question_chunk(chunk, max_retries=3, max_tokens=None):
+    """
+    asyncio counterpart of structure_question_chunk: the requests are awaited
+    through the process-wide AsyncLLMClient.
+    """
+    payload = question_chunk_payload(chunk, max_tokens)
+    router = get_model_router()
+    tier = 0
 
+    attempts = 0
+    while attempts < max_retries:
+        try:
+            response = await async_chat_completion_with_continuation(
+                **dict(payload, model=router.model("structure_mcq", tier))
+            )
 
-                # Update offset based on processed text length
-                offset += len(formatted_data)
-                break
+            records, failure = check_question_reply(response)
+            if failure is not None:
+                next_tier = router.escalate("structure_mcq", tier, failure)
+                if next_tier is None:
+                    attempts += 1
+                else:
+                    tier = next_tier
+                continue
 
-            except (json.JSONDecodeError, Exception) as e:
-                print(f"Error at offset {offset}, attempt {attempts + 1}: {e}")
-                attempts += 1
+            router.record("structure_mcq", tier)
+            return records
 
-        if attempts == max_retries:
-            print(f"Failed after {max_retries} attempts at offset {offset}. Exiting.")
+        except CircuitOpenError as e:
+            print(f"Skipping chunk: {e}")
             break
 
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error in chunk, attempt {attempts + 1}: {e}")
+            attempts += 1
+            if attempts < max_retries:
+                await asyncio.sleep(backoff_delay(attempts))
+
+    router.record("structure_mcq", tier)
+    print(f"Failed after {max_retries} attempts for chunk starting: {chunk[:60]!r}")
+    return []
+
+def get_single_question_data(extracted_text, max_retries=3, max_tokens=None, max_chunk_chars=MAX_CHUNK_CHARS,
+                             max_workers=MAX_PARALLEL_CHUNKS):
+    """
+    Queries OpenAI to retrieve structured questions, options, answers, and explanations from extracted text.
+
+    Long texts are split on question boundaries and the chunks are structured
+    concurrently, so the total time follows the slowest chunk rather than the
+    sum of all chunks. Results are merged in the original order.
+
+    Args:
+        extracted_text (str): The text extracted from an image.
+        max_retries (int): Maximum number of retries for API calls.
+        max_tokens (int): Maximum number of tokens to be returned in the API response
+            (None sizes it per chunk from the input length).
+        max_chunk_chars (int): Maximum characters of OCR text per request.
+        max_workers (int): Maximum number of chunks structured at the same time.
+
+    Returns:
+        dict: Structured data with keys "Question", "Options".
+    """
+    chunks = split_into_question_chunks(extracted_text, max_chunk_chars)
+    if len(chunks) <= 1:
+        chunk_results = [structure_question_chunk(chunk, max_retries, max_tokens) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            chunk_results = list(executor.map(
+                lambda chunk: structure_question_chunk(chunk, max_retries, max_tokens), chunks
+            ))
+    return merge_chunk_results(chunk_results)
+
+async def async_get_single_question_data(extracted_text, max_retries=3, max_tokens=None,
+                                         max_chunk_chars=MAX_CHUNK_CHARS, max_workers=MAX_PARALLEL_CHUNKS):
+    """
+    asyncio counterpart of get_single_question_data: the chunks are structured
+    concurrently on the event loop, at most max_workers at a time.
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def structure(chunk):
+        async with semaphore:
+            return await async_structure_question_chunk(chunk, max_retries, max_tokens)
+
+    chunks = split_into_question_chunks(extracted_text, max_chunk_chars)
+    return merge_chunk_results(await asyncio.gather(*(structure(chunk) for chunk in chunks)))
+
+def merge_chunk_results(chunk_results):
+    """
+    Merges the records of each chunk into {"Question": [...], "Options": [...]}, keeping the chunk order.
+    """
+    all_data = {
+        "Question": [],
+        "Options": [],
+
+    }
+
+    # Append question data to all_data, keeping the chunk order
+    for records in chunk_results:
+        for question_data in records:
+            all_data["Question"].append(question_data["Question"])
+            all_data["Options"].append(question_data["Options"])
+
     return all_data
\ No newline at end of file
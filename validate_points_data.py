@@ -1,58 +1,66 @@
-import re
-import openai
 import json
+import time
+import asyncio
 from config import GROUP_CHAT_ID, openai
+from record_schemas import STRUCTURED_OUTPUTS, extract_records, response_format, validate_points_record
+from rate_limiter import backoff_delay
+from model_routing import get_model_router
+from circuit_breaker import CircuitOpenError
+from token_budget import async_chat_completion_with_continuation, chat_completion_with_continuation, output_token_budget
 
 def clean_json_response(formatted_data):
     """
     Cleans and extracts valid JSON array content from the response.
     Handles:
       - Extra backticks (`json ...`)
-      - JSON inside strings
-      - Extracting JSON using regex as a fallback
+      - Brackets inside string values
+      - Trailing commas and arrays left open by truncation; complete objects
+        are recovered without another API call
+      - The {"slides": [...]} envelope of structured outputs
     """
     if not formatted_data:
         print("❌ Empty input received!")
         return None
-    
-    # Remove leading/trailing backticks (`json ...`)
-    formatted_data = re.sub(r"^(`{1,3}json)?|(`{1,3})$", "", formatted_data.strip()).strip()
-
-    # First attempt: Try to parse JSON directly
-    try:
-        parsed_data = json.loads(formatted_data)
-        if isinstance(parsed_data, list):  # Ensure it's a list
-            return parsed_data
-    except json.JSONDecodeError:
-        pass  # If JSON decoding fails, continue to regex method
-
-    # Fallback: Use regex to extract the JSON array
-    json_match = re.search(r'(\[\s*\{[\s\S]*?\}\s*\])', formatted_data, re.UNICODE)
-    
-    if json_match:
-        json_content = json_match.group(1).strip()
-        try:
-            return json.loads(json_content)  # ✅ Properly parse JSON into Python object
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON Parsing Error: {e}")
-            return None
-    else:
+
+    records = extract_records(formatted_data, "points")
+    if records is None:
         print("❌ No valid JSON detected in response.")
-        return None
-    
-def get_bullet_points_data(extracted_text, max_retries=3, max_tokens=500):
+    return records
+
+def is_points_record(record):
     """
-    Queries OpenAI to retrieve structured bullet points from extracted text.
+    Checks that a parsed object has the points shape: an optional "title" string
+    and a "points" list of strings.
+    """
+    return not validate_points_record(record)
 
-    Args:
-        extracted_text (str): The text extracted from an image.
-        max_retries (int): Maximum number of retries for API calls.
-        max_tokens (int): Maximum number of tokens to be returned in the API response.
+def parse_points_records(response_text):
+    """
+    Parses a vision response that already is a JSON array of points records.
 
     Returns:
-        list: A structured list of bullet points.
+        list: The records when every one conforms to the points shape,
+        otherwise None so the caller can fall back to get_bullet_points_data.
     """
-    all_data = []
+    if not response_text:
+        return None
+    records = clean_json_response(response_text)
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list) or not records:
+        return None
+    if not all(is_points_record(record) for record in records):
+        return None
+    return records
+    
+def points_payload(extracted_text, max_tokens=None):
+    """
+    Request payload (without the model) for structuring extracted text into
+    bullet point records. Without an explicit max_tokens the output budget is
+    sized from the input length.
+    """
+    if max_tokens is None:
+        max_tokens = output_token_budget(extracted_text, "points")
 
     prompt = (
         "Extract all **key bullet points** exactly as they appear in the image."
@@ -79,49 +87,155 @@ def get_bullet_points_data(extracted_text, max_retries=3, max_tokens=500):
         f"\n\n{extracted_text}"
     )
 
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that strictly returns JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+    }
+    if STRUCTURED_OUTPUTS:
+        payload["response_format"] = response_format("points")
+    return payload
+
+def check_points_reply(response):
+    """
+    Parses and validates a structuring reply.
+
+    Returns:
+        tuple: (list of points records, None) when every record matches the
+        points schema, otherwise (None, reason for escalating the model).
+    """
+    formatted_data = response["choices"][0]["message"]["content"]
+    print(f"📢 OpenAI Response: {formatted_data}")  # Debugging output
+
+    cleaned_data = clean_json_response(formatted_data)
+    if cleaned_data is None:
+        print("No valid JSON detected in response.")
+        return None, "no valid JSON"
+
+    # If response is a string, convert it to JSON
+    if isinstance(cleaned_data, str):
+        structured_data = json.loads(cleaned_data)
+    elif isinstance(cleaned_data, dict):  
+        structured_data = [cleaned_data]  # Convert single dict to list
+    elif isinstance(cleaned_data, list):
+        structured_data = cleaned_data
+    else:
+        structured_data = cleaned_data  # Already parsed JSON
+
+    invalid = [record for record in structured_data if not is_points_record(record)]
+    if invalid:
+        print(f"❌ {len(invalid)} record(s) do not match the points schema: {validate_points_record(invalid[0])}")
+        return None, "schema validation failed"
+    return structured_data, None
+
+def get_bullet_points_data(extracted_text, max_retries=3, max_tokens=None):
+    """
+    Queries OpenAI to retrieve structured bullet points from extracted text.
+
+    Args:
+        extracted_text (str): The text extracted from an image.
+        max_retries (int): Maximum number of retries for API calls.
+        max_tokens (int): Maximum number of tokens to be returned in the API response
+            (None sizes it from the input length; cut-off replies are continued).
+            With STRUCTURED_OUTPUTS the reply is constrained to the points record
+            schema and validated locally before it is accepted.
+
+    The text goes to the first model of the "structure_points" route and only
+    escalates to the next (stronger) model when its reply fails validation.
+
+    Returns:
+        list: A structured list of bullet points.
+    """
+    all_data = []
+    payload = points_payload(extracted_text, max_tokens)
+    router = get_model_router()
+    tier = 0
+
     attempts = 0
     while attempts < max_retries:
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that strictly returns JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens
-            )
+            response = chat_completion_with_continuation(**dict(payload, model=router.model("structure_points", tier)))
 
             if "choices" not in response or not response["choices"]:
                 print("❌ OpenAI API response is empty or incorrect!")
                 attempts += 1
                 continue
 
-            formatted_data = response["choices"][0]["message"]["content"]
-            print(f"📢 OpenAI Response: {formatted_data}")  # Debugging output
+            structured_data, failure = check_points_reply(response)
+            if failure is not None:
+                next_tier = router.escalate("structure_points", tier, failure)
+                if next_tier is None:
+                    attempts += 1
+                else:
+                    tier = next_tier
+                continue
+
+            all_data.extend(structured_data)  # Append extracted points
+            break  # Exit loop on success
+
+        except CircuitOpenError as e:
+            print(f"❌ Skipping structuring: {e}")
+            break
 
-            cleaned_data = clean_json_response(formatted_data)
-            if not cleaned_data:
-                print("No valid JSON detected in response.")
-                attempts+=1
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error on attempt {attempts + 1}: {e}")
+            attempts += 1
+            if attempts < max_retries:
+                time.sleep(backoff_delay(attempts))
+
+    router.record("structure_points", tier)
+    if attempts == max_retries:
+        print(f"Failed after {max_retries} attempts. Exiting.")
+
+    return all_data
+
+async def async_get_bullet_points_data(extracted_text, max_retries=3, max_tokens=None):
+    """
+    asyncio counterpart of get_bullet_points_data: the requests are awaited
+    through the process-wide AsyncLLMClient.
+    """
+    all_data = []
+    payload = points_payload(extracted_text, max_tokens)
+    router = get_model_router()
+    tier = 0
+
+    attempts = 0
+    while attempts < max_retries:
+        try:
+            response = await async_chat_completion_with_continuation(
+                **dict(payload, model=router.model("structure_points", tier))
+            )
+
+            if "choices" not in response or not response["choices"]:
+                print("❌ OpenAI API response is empty or incorrect!")
+                attempts += 1
                 continue
 
-            # If response is a string, convert it to JSON
-            if isinstance(cleaned_data, str):
-                structured_data = json.loads(cleaned_data)
-            elif isinstance(cleaned_data, dict):  
-                structured_data = [cleaned_data]  # Convert single dict to list
-            elif isinstance(cleaned_data, list):
-                structured_data = cleaned_data
-            else:
-                structured_data = cleaned_data  # Already parsed JSON
+            structured_data, failure = check_points_reply(response)
+            if failure is not None:
+                next_tier = router.escalate("structure_points", tier, failure)
+                if next_tier is None:
+                    attempts += 1
+                else:
+                    tier = next_tier
+                continue
 
             all_data.extend(structured_data)  # Append extracted points
             break  # Exit loop on success
 
+        except CircuitOpenError as e:
+            print(f"❌ Skipping structuring: {e}")
+            break
+
         except (json.JSONDecodeError, Exception) as e:
             print(f"Error on attempt {attempts + 1}: {e}")
             attempts += 1
+            if attempts < max_retries:
+                await asyncio.sleep(backoff_delay(attempts))
 
+    router.record("structure_points", tier)
     if attempts == max_retries:
         print(f"Failed after {max_retries} attempts. Exiting.")
 
@@ -0,0 +1,143 @@
+import json
+import asyncio
+from circuit_breaker import CircuitOpenError
+
+# Defaults for packing several images into one vision request
+MAX_IMAGES_PER_BATCH = 6
+MAX_BATCH_BYTES = 3 * 1024 * 1024  # Base64 payload budget per request
+IMAGE_TOKEN_ESTIMATE = 800  # Rough prompt tokens per 1080px image (high detail)
+MAX_BATCH_IMAGE_TOKENS = 6000
+
+
+def batch_instructions(count):
+    """
+    Extra instructions appended to a handler's prompt when several images are sent at once.
+    """
+    return (
+        f"\n\n### **Multiple Images:**"
+        f"\nYou will receive {count} images, each preceded by a label \"Image <number>\"."
+        "\nApply the rules above to every image separately."
+        "\nReturn ONLY one JSON object of this form, with one entry per image, in order:"
+        "\n{\"images\": [{\"image\": 1, \"items\": [ ...JSON array for image 1... ]},"
+        " {\"image\": 2, \"items\": [ ... ]}]}"
+        "\nUse an empty \"items\" array for an image without usable content."
+    )
+
+
+def plan_batches(sizes, max_images=MAX_IMAGES_PER_BATCH, max_bytes=MAX_BATCH_BYTES,
+                 max_image_tokens=MAX_BATCH_IMAGE_TOKENS, tokens_per_image=IMAGE_TOKEN_ESTIMATE):
+    """
+    Groups image indexes into batches that stay within the image count, byte and token budgets.
+    An image larger than the byte budget gets a batch of its own.
+
+    :param sizes: Encoded size in bytes of each image, in order
+    :return: List of lists of indexes into sizes
+    """
+    max_images = max(1, min(max_images, max_image_tokens // tokens_per_image or 1))
+    batches = []
+    current, current_bytes = [], 0
+    for index, size in enumerate(sizes):
+        if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batched_response(response_text, count):
+    """
+    Splits a batched vision response into one JSON text per image.
+
+    :return: List of `count` JSON array strings, in image order
+    :raises ValueError: If the response does not attribute results to every image
+    """
+    text = (response_text or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.lower().startswith("json"):
+            text = text[4:].strip()
+    data = json.loads(text)
+
+    entries = data.get("images") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError("Batched response has no \"images\" list.")
+
+    results = [None] * count
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.get("image", position + 1)
+        if isinstance(number, int) and 1 <= number <= count and isinstance(entry.get("items"), list):
+            results[number - 1] = json.dumps(entry["items"], ensure_ascii=False)
+
+    missing = [index + 1 for index, result in enumerate(results) if result is None]
+    if missing:
+        raise ValueError(f"Batched response is missing images {missing}.")
+    return results
+
+
+def extract_in_batches(images, call_batch, call_single, **budget):
+    """
+    Extracts text from many images with as few vision requests as possible.
+
+    Images are packed into batches by plan_batches. A batch that fails (API error or
+    response without per-image attribution) is split in two and each half retried;
+    a single image falls back to call_single.
+
+    :param images: List of encoded images (bytes)
+    :param call_batch: Callable(list of images) -> response text in the batched format
+    :param call_single: Callable(image) -> response text for one image
+    :return: One response text (or None) per image, in order
+    """
+    results = [None] * len(images)
+
+    def run(indexes):
+        if len(indexes) == 1:
+            results[indexes[0]] = call_single(images[indexes[0]])
+            return
+        try:
+            texts = parse_batched_response(call_batch([images[i] for i in indexes]), len(indexes))
+        except CircuitOpenError:
+            raise  # Smaller batches would fail the same way
+        except Exception as e:
+            print(f"Batch of {len(indexes)} images failed ({e}), splitting it in two.")
+            middle = len(indexes) // 2
+            run(indexes[:middle])
+            run(indexes[middle:])
+            return
+        for index, text in zip(indexes, texts):
+            results[index] = text
+
+    for batch in plan_batches([len(image) for image in images], **budget):
+        run(batch)
+    return results
+
+
+async def async_extract_in_batches(images, call_batch, call_single, **budget):
+    """
+    asyncio counterpart of extract_in_batches; call_batch and call_single are
+    coroutine functions. The batches are sent concurrently.
+    """
+    results = [None] * len(images)
+
+    async def run(indexes):
+        if len(indexes) == 1:
+            results[indexes[0]] = await call_single(images[indexes[0]])
+            return
+        try:
+            texts = parse_batched_response(await call_batch([images[i] for i in indexes]), len(indexes))
+        except CircuitOpenError:
+            raise  # Smaller batches would fail the same way
+        except Exception as e:
+            print(f"Batch of {len(indexes)} images failed ({e}), splitting it in two.")
+            middle = len(indexes) // 2
+            await asyncio.gather(run(indexes[:middle]), run(indexes[middle:]))
+            return
+        for index, text in zip(indexes, texts):
+            results[index] = text
+
+    await asyncio.gather(*(run(batch) for batch in plan_batches([len(image) for image in images], **budget)))
+    return results